@@ -0,0 +1,65 @@
+"""
+Compares building a grammar from source for every context with building it once and binding every context to it.
+
+Usage:
+    python -m benchmarks.bench_bind
+"""
+
+from benchmarks import grammars
+from txtgen.interpreter import make
+
+from typing import Callable, List
+
+import time
+
+
+REPEAT = 3
+N_CONTEXTS = 20
+
+
+def best(fn: Callable[[], None]) -> float:
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    contexts: List[dict] = [
+        {"name": f"tenant{i}", "plan": "pro" if i % 2 else "free", "a": "x", "b": "x"}
+        for i in range(N_CONTEXTS)
+    ]
+
+    print(
+        f"{N_CONTEXTS} contexts\n"
+        f"{'grammar':<20} {'make (ms)':>10} {'bind (ms)':>10} {'speedup':>8}"
+    )
+
+    for label, src in [
+        ("tenant/100", grammars.tenant(100)),
+        ("tenant/1000", grammars.tenant(1_000)),
+        ("mixed/200", grammars.mixed(200)),
+    ]:
+
+        def build() -> None:
+            for ctx in contexts:
+                make(src, ctx)
+
+        def bind() -> None:
+            # Binding is cached: a fresh grammar measures the first binding of every context.
+            grammar = make(src)
+            for ctx in contexts:
+                grammar.bind(ctx)
+
+        built, bound = best(build), best(bind)
+        print(
+            f"{label:<20} {built * 1e3:>10.1f} {bound * 1e3:>10.1f} "
+            f"{built / bound:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
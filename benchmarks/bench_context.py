@@ -0,0 +1,40 @@
+"""
+Measures runtime placeholder generation against a large context list, with and without reusing resolved keys.
+
+Usage:
+    python -m benchmarks.bench_context
+"""
+from txtgen.context import Context
+from txtgen.interpreter import make
+
+import timeit
+
+
+N_GENERATIONS = 2_000
+
+
+def main() -> None:
+    grammar = make('(grammar (entity greeting "Hello" $people.name "!"))')
+
+    print(f"{'values':>8} {'cold (us)':>10} {'cached (us)':>12}")
+    for n_values in [10, 1_000, 10_000, 100_000]:
+        ctx_dict = {"people": {"name": [f"name{i}" for i in range(n_values)]}}
+        ctx = Context(ctx_dict)
+
+        def cold() -> None:
+            ctx.invalidate()
+            grammar.generate("greeting", ctx)
+
+        cold_time = timeit.timeit(cold, number=N_GENERATIONS)
+        cached_time = timeit.timeit(
+            lambda: grammar.generate("greeting", ctx), number=N_GENERATIONS
+        )
+
+        print(
+            f"{n_values:>8} {cold_time * 1e6 / N_GENERATIONS:>10.1f} "
+            f"{cached_time * 1e6 / N_GENERATIONS:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
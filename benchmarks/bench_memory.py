@@ -0,0 +1,80 @@
+"""
+Measures the memory held by optimized grammars, per node.
+
+Usage:
+    python -m benchmarks.bench_memory
+"""
+from benchmarks import grammars
+from txtgen import nodes
+from txtgen.interpreter import make
+
+from typing import Iterator, List
+
+import gc
+import tracemalloc
+
+
+SIZES = [1_000, 10_000, 50_000]
+
+CTX = {"name": ["John", "Mary", "Jack", "Alice"], "a": "x", "b": ["x", "y"]}
+
+
+def _attributes(node: nodes.Node) -> Iterator[object]:
+    if hasattr(node, "__dict__"):
+        yield from vars(node).values()
+
+    for cls in type(node).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if hasattr(node, slot):
+                yield getattr(node, slot)
+
+
+def count_nodes(root: nodes.Node) -> int:
+    """
+    Counts the distinct node objects reachable from a root node.
+    Args:
+        root (nodes.Node): The root node.
+
+    Returns:
+        The number of nodes.
+    """
+    seen = set()
+    stack: List[object] = [root]
+
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, nodes.Node) and id(item) not in seen:
+            seen.add(id(item))
+            stack.extend(_attributes(item))
+
+    return len(seen)
+
+
+def main() -> None:
+    print(f"{'entities':>10} {'nodes':>10} {'memory (MiB)':>13} {'bytes/node':>11}")
+
+    for n_entities in SIZES:
+        src = grammars.mixed(n_entities)
+
+        gc.collect()
+        tracemalloc.start()
+        grammar = make(src, bind_ctx=CTX)
+        gc.collect()
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        n_nodes = count_nodes(grammar)
+        print(
+            f"{n_entities:>10} {n_nodes:>10} {held / 2 ** 20:>13.1f} "
+            f"{held / n_nodes:>11.1f}"
+        )
+        del grammar
+
+
+if __name__ == "__main__":
+    main()
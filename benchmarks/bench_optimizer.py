@@ -0,0 +1,71 @@
+"""
+Compares the table-driven visitor dispatch of the optimizer with the reflection-based dispatch it replaced, which
+derived the visitor name of every node from its class name with two regular expressions.
+
+Usage:
+    python -m benchmarks.bench_optimizer
+"""
+
+from benchmarks import grammars
+from txtgen import nodes
+from txtgen.optimizer import Optimizer
+from txtgen.parser import DescentParser
+
+from typing import Optional
+
+import re
+import time
+
+
+REPEAT = 5
+
+
+def camelcase(name: str) -> str:
+    s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
+    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
+
+
+class ReflectionOptimizer(Optimizer):
+    """
+    Resolves the visitor of every node by name, as the optimizer used to.
+    """
+
+    def visit(self, node: nodes.Node) -> Optional[nodes.Node]:
+        visit_name = f"visit_{camelcase(node.type)}"
+        if hasattr(self, visit_name):
+            return getattr(self, visit_name)(node)
+        return node
+
+
+def best_walk(optimizer_class: type, src: str) -> float:
+    times = []
+    for _ in range(REPEAT):
+        grammar = DescentParser(src).grammar()
+        optimizer = optimizer_class(grammar.entities, grammar.macros)
+
+        start = time.perf_counter()
+        optimizer.walk(grammar)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    print(f"{'grammar':<20} {'reflection (ms)':>16} {'table (ms)':>11} {'speedup':>8}")
+
+    for label, src in [
+        ("mixed/5000", grammars.mixed(5_000)),
+        ("wide_any/100000", grammars.wide_any(100_000)),
+        ("deep_nesting/200", grammars.deep_nesting(200)),
+    ]:
+        reflection = best_walk(ReflectionOptimizer, src)
+        table = best_walk(Optimizer, src)
+
+        print(
+            f"{label:<20} {reflection * 1e3:>16.1f} {table * 1e3:>11.1f} "
+            f"{reflection / table:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
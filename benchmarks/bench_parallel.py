@@ -0,0 +1,47 @@
+"""
+Measures how parallel generation scales with the number of worker processes.
+
+Usage:
+    python -m benchmarks.bench_parallel
+"""
+from benchmarks import grammars
+from txtgen.interpreter import make
+from txtgen.parallel import generate_parallel
+from txtgen.vm import compile_grammar
+
+import os
+import time
+
+
+N_GENERATIONS = 200_000
+
+CTX = {"name": ["John", "Mary", "Jack", "Alice"], "a": "x", "b": ["x", "y"]}
+
+
+def main() -> None:
+    program = compile_grammar(make(grammars.mixed(50), bind_ctx=CTX))
+    entity = grammars.name(49)
+
+    n_cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, 16, 32, 64, n_cpus} & set(range(1, n_cpus + 1)))
+
+    print(f"{'workers':>8} {'time (s)':>9} {'gen/s':>10} {'speedup':>8}")
+    baseline = None
+
+    for workers in worker_counts:
+        start = time.perf_counter()
+        for _ in generate_parallel(
+            program, entity, N_GENERATIONS, seed=0, workers=workers, shard_size=2000
+        ):
+            pass
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+
+        print(
+            f"{workers:>8} {elapsed:>9.2f} {N_GENERATIONS / elapsed:>10.0f} "
+            f"{baseline / elapsed:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
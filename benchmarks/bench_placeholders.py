@@ -0,0 +1,127 @@
+"""
+Compares runtime placeholder substitution with the node-based substitution it replaced, which allocated a LiteralNode,
+a ListNode and a second LiteralNode for the leading space on every substitution.
+
+Usage:
+    python -m benchmarks.bench_placeholders
+"""
+
+from benchmarks import grammars
+from txtgen import nodes
+from txtgen.context import Context
+from txtgen.interpreter import make
+from txtgen.optimizer import get_children
+
+from typing import Any, Callable, Dict, Iterator, List
+
+import contextlib
+import random
+import time
+
+
+N_GENERATIONS = 20_000
+REPEAT = 5
+
+
+class NodePlaceholderNode(nodes.PlaceholderNode):
+    """
+    Substitutes values through temporary nodes, as placeholders used to.
+    """
+
+    __slots__ = ()
+
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = nodes.DEFAULT_RNG
+    ) -> str:
+        assert ctx is not None
+        val = ctx.get(self.key)
+        if not val:
+            return ""
+
+        table = ctx.get_table(self.key)
+        pick = val[table.sample(rng)] if table is not None else rng.choice(val)
+
+        return nodes.sub_punctuation(nodes.LiteralNode(pick)).generate()
+
+
+def with_node_placeholders(grammar: nodes.Grammar) -> nodes.Grammar:
+    stack: List[nodes.Node] = list(grammar.entities.values())
+    seen = set()
+
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+
+        seen.add(id(node))
+        if type(node) is nodes.PlaceholderNode:
+            node.__class__ = NodePlaceholderNode
+        stack.extend(child for child in get_children(node) if child is not None)
+
+    return grammar
+
+
+@contextlib.contextmanager
+def count_nodes(counter: Dict[str, int]) -> Iterator[None]:
+    init = nodes.Node.__init__
+
+    def counting_init(self: nodes.Node) -> None:
+        counter["nodes"] += 1
+
+    nodes.Node.__init__ = counting_init  # type: ignore
+    try:
+        yield
+    finally:
+        nodes.Node.__init__ = init  # type: ignore
+
+
+def run(grammar: nodes.Grammar, entity: str, ctx: Context) -> Callable[[], Any]:
+    return lambda: grammar.generate_many(
+        entity, N_GENERATIONS, ctx, rng=random.Random(0)
+    )
+
+
+def main() -> None:
+    keys = ["first", "second", "third", "fourth", "fifth"]
+    placeholders = " ".join(f"${keys[i % 5]}" for i in range(50))
+    wide = f"(grammar (entity {grammars.name(0)} {placeholders}))"
+    wide_ctx = {key: ["a", "b", ",", "word", "!"] for key in keys}
+
+    print(
+        f"{'grammar':<16} {'placeholders':<12} {'time (ms)':>10} {'nodes/generation':>17}"
+    )
+    for label, src, ctx_dict in [
+        ("large_context", grammars.large_context(1_000), grammars.context(1_000)),
+        ("wide", wide, wide_ctx),
+    ]:
+        ctx = Context(ctx_dict)
+        results = []
+
+        for kind, grammar in [
+            ("nodes", with_node_placeholders(make(src))),
+            ("spaced", make(src)),
+        ]:
+            generate = run(grammar, grammars.name(0), ctx)
+            generate()
+
+            times = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                generate()
+                times.append(time.perf_counter() - start)
+
+            counter = {"nodes": 0}
+            with count_nodes(counter):
+                generate()
+
+            results.append(min(times))
+            print(
+                f"{label:<16} {kind:<12} {min(times) * 1e3:>10.1f} "
+                f"{counter['nodes'] / N_GENERATIONS:>17.1f}"
+            )
+
+        print(f"{label:<16} {'speedup':<12} {results[0] / results[1]:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
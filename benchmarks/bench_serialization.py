@@ -0,0 +1,45 @@
+"""
+Compares building a grammar from source with loading its serialized form.
+
+Usage:
+    python -m benchmarks.bench_serialization
+"""
+
+from benchmarks import grammars
+from txtgen.interpreter import make
+from txtgen.serialization import dumps, loads
+
+import time
+
+
+SIZES = [100, 1000, 5000]
+
+
+def main() -> None:
+    print(
+        f"{'entities':>10} {'source (KiB)':>14} {'artifact (KiB)':>16} "
+        f"{'make (ms)':>10} {'load (ms)':>10} {'speedup':>8}"
+    )
+
+    for n_entities in SIZES:
+        src = grammars.mixed(n_entities)
+
+        start = time.perf_counter()
+        grammar = make(src)
+        make_time = time.perf_counter() - start
+
+        data = dumps(grammar, source=src)
+
+        start = time.perf_counter()
+        loads(data, source=src)
+        load_time = time.perf_counter() - start
+
+        print(
+            f"{n_entities:>10} {len(src) / 1024:>14.1f} {len(data) / 1024:>16.1f} "
+            f"{make_time * 1e3:>10.1f} {load_time * 1e3:>10.1f} "
+            f"{make_time / load_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Compares writing generations to a file one string at a time with the buffered streaming dump.
+
+Usage:
+    python -m benchmarks.bench_stream
+"""
+from benchmarks import grammars
+from txtgen.interpreter import make
+from txtgen.stream import dump
+
+import os
+import tempfile
+import time
+
+
+N_GENERATIONS = 20_000
+
+CTX = {"name": ["John", "Mary", "Jack", "Alice"], "a": "x", "b": ["x", "y"]}
+
+
+def main() -> None:
+    grammar = make(grammars.mixed(50), bind_ctx=CTX)
+    entity = grammars.name(49)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "out.txt")
+
+        start = time.perf_counter()
+        with open(path, "w") as outfile:
+            for _ in range(N_GENERATIONS):
+                outfile.write(grammar.generate(entity) + "\n")
+        naive = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dump(grammar, entity, N_GENERATIONS, path)
+        streamed = time.perf_counter() - start
+
+    print(f"{'method':>10} {'us/generation':>14}")
+    print(f"{'generate':>10} {naive * 1e6 / N_GENERATIONS:>14.1f}")
+    print(f"{'dump':>10} {streamed * 1e6 / N_GENERATIONS:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
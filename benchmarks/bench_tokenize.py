@@ -0,0 +1,38 @@
+"""
+Times the tokenizer on synthetic grammars of increasing size.
+
+Usage:
+    python -m benchmarks.bench_tokenize
+"""
+
+from benchmarks import grammars
+from txtgen.tokenizer import tokenize
+
+import timeit
+
+
+SIZES = [100, 1_000, 10_000, 50_000]
+
+
+def main() -> None:
+    print(
+        f"{'entities':>10} {'source (KiB)':>14} {'tokens':>10} {'time (ms)':>12} {'ns/char':>10}"
+    )
+
+    for n_entities in SIZES:
+        src = grammars.mixed(n_entities)
+        n_tokens = sum(1 for _ in tokenize(src))
+
+        runs = 3
+        elapsed = (
+            timeit.timeit(lambda: sum(1 for _ in tokenize(src)), number=runs) / runs
+        )
+
+        print(
+            f"{n_entities:>10} {len(src) / 1024:>14.1f} {n_tokens:>10} "
+            f"{elapsed * 1000:>12.1f} {elapsed * 1e9 / len(src):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
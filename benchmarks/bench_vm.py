@@ -0,0 +1,46 @@
+"""
+Compares the tree walker with the bytecode VM on the same optimized grammar.
+
+Usage:
+    python -m benchmarks.bench_vm
+"""
+
+from benchmarks import grammars
+from txtgen.interpreter import make
+from txtgen.vm import compile_grammar
+
+import timeit
+
+
+N_GENERATIONS = 20_000
+
+CTX = {"name": ["John", "Mary", "Jack", "Alice"], "a": "x", "b": ["x", "y"]}
+
+
+def main() -> None:
+    src = grammars.mixed(50)
+    entity = grammars.name(49)
+
+    print(f"{'context':>8} {'tree (us)':>10} {'vm (us)':>10} {'speedup':>8}")
+
+    for label, grammar, ctx in [
+        ("bound", make(src, bind_ctx=CTX), None),
+        ("runtime", make(src), CTX),
+    ]:
+        program = compile_grammar(grammar)
+
+        tree_time = timeit.timeit(
+            lambda: grammar.generate(entity, ctx), number=N_GENERATIONS
+        )
+        vm_time = timeit.timeit(
+            lambda: program.generate(entity, ctx), number=N_GENERATIONS
+        )
+
+        print(
+            f"{label:>8} {tree_time * 1e6 / N_GENERATIONS:>10.1f} "
+            f"{vm_time * 1e6 / N_GENERATIONS:>10.1f} {tree_time / vm_time:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares loading a large word list into the context with memory-mapping it as a WordList: setup time, memory held by
+the context, and generation time.
+
+Usage:
+    python -m benchmarks.bench_word_list
+"""
+
+from txtgen.context import Context, WordList
+from txtgen.interpreter import make
+
+from typing import Any, Callable, Tuple
+
+import gc
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+
+N_WORDS = 2_000_000
+N_GENERATIONS = 100_000
+
+
+def traced(fn: Callable[[], Any]) -> Tuple[Any, float, int]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def load(path: str) -> list:
+    with open(path, encoding="utf-8") as infile:
+        return infile.read().splitlines()
+
+
+def main() -> None:
+    grammar = make('(grammar (entity greeting "Hello" $city "!"))')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cities.txt")
+        with open(path, "w", encoding="utf-8") as outfile:
+            outfile.writelines(f"city{i}\n" for i in range(N_WORDS))
+
+        start = time.perf_counter()
+        WordList.build_index(path)
+        print(
+            f"{N_WORDS} words, {os.path.getsize(path) / 2 ** 20:.1f} MiB, "
+            f"index built in {time.perf_counter() - start:.2f}s\n"
+        )
+
+        print(
+            f"{'source':<10} {'setup (s)':>10} {'held (MiB)':>11} {'generate (us)':>14}"
+        )
+        for label, source in [("list", load), ("WordList", WordList)]:
+            words, elapsed, size = traced(lambda: source(path))
+            ctx = Context({"city": words})
+
+            generate = timeit.timeit(
+                lambda: grammar.generate("greeting", ctx), number=N_GENERATIONS
+            )
+            print(
+                f"{label:<10} {elapsed:>10.2f} {size / 2 ** 20:>11.1f} "
+                f"{generate * 1e6 / N_GENERATIONS:>14.2f}"
+            )
+            del words, ctx
+
+
+if __name__ == "__main__":
+    main()
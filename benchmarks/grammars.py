@@ -0,0 +1,179 @@
+"""
+Synthetic grammar sources used by the benchmarks.
+"""
+
+
+def name(index: int) -> str:
+    """
+    Encodes an index as a valid symbol name (symbols cannot contain digits).
+    Args:
+        index (int): The index to encode.
+
+    Returns:
+        The symbol name.
+    """
+    letters = []
+    while True:
+        index, remainder = divmod(index, 26)
+        letters.append(chr(ord("a") + remainder))
+        if index == 0:
+            return "e_" + "".join(reversed(letters))
+
+
+def mixed(n_entities: int) -> str:
+    """
+    Builds a grammar exercising every language construct.
+    Args:
+        n_entities (int): The number of entities to define.
+
+    Returns:
+        The grammar source.
+    """
+    entities = ['(entity e_a "root")'] + [
+        f'(entity {name(i)}<sentence> ("word{i}" $name [{name(i - 1)}] '
+        f'(any "a" "an" "the") (repeat 2 "very") (if $a=$b "yes" "no")))'
+        for i in range(1, n_entities)
+    ]
+
+    return "\n".join(
+        ["(grammar", '    (macro sentence (body) body ".")', *entities, ")"]
+    )
+
+
+def wide_any(n_choices: int) -> str:
+    """
+    Builds a grammar picking from a single, wide `any`.
+    Args:
+        n_choices (int): The number of choices.
+
+    Returns:
+        The grammar source.
+    """
+    choices = " ".join(f'"word{i}"' for i in range(n_choices))
+    return f'(grammar (entity {name(0)} "pick" (any {choices}) "."))'
+
+
+def deep_nesting(depth: int) -> str:
+    """
+    Builds a grammar whose single entity nests `any`, lists and optionals `depth` times.
+    Args:
+        depth (int): The nesting depth.
+
+    Returns:
+        The grammar source.
+    """
+    expression = '"leaf"'
+    for i in range(depth):
+        expression = f'(any ("level{i}" [{expression}]) "stop{i}")'
+
+    return f"(grammar (entity {name(0)} {expression}))"
+
+
+def heavy_macros(n_macros: int) -> str:
+    """
+    Builds a grammar with as many macros as entities, every entity applying a macro.
+    Args:
+        n_macros (int): The number of macros.
+
+    Returns:
+        The grammar source.
+    """
+    macros = [
+        f'(macro m_{name(i)} (body) "before{i}" body (any body "instead{i}") "after{i}")'
+        for i in range(n_macros)
+    ]
+    entities = [f'(entity {name(0)} "root")'] + [
+        f'(entity {name(i)}<m_{name(i)}> ("word{i}" [{name(i - 1)}] (repeat 2 "x")))'
+        for i in range(1, n_macros)
+    ]
+
+    return "\n".join(["(grammar", *macros, *entities, ")"])
+
+
+def shared_macro(n_entities: int) -> str:
+    """
+    Builds a grammar whose entities all apply the same macro, with a large body.
+    Args:
+        n_entities (int): The number of entities applying the macro.
+
+    Returns:
+        The grammar source.
+    """
+    clauses = " ".join(
+        f'(any "clause{i}" "variant{i}" ["maybe{i}"]) (repeat 2 "filler{i}")'
+        for i in range(20)
+    )
+    macro = f'(macro paragraph (subject) "About" subject ":" {clauses} "-" subject ".")'
+    entities = [f'(entity {name(0)} "root")'] + [
+        f'(entity {name(i)}<paragraph> ("word{i}" [{name(i - 1)}]))'
+        for i in range(1, n_entities)
+    ]
+
+    return "\n".join(["(grammar", f"    {macro}", *entities, ")"])
+
+
+def tenant(n_entities: int) -> str:
+    """
+    Builds a grammar of context-free entities, and a single root entity personalizing them with the context.
+    Args:
+        n_entities (int): The number of context-free entities.
+
+    Returns:
+        The grammar source.
+    """
+    entities = [
+        f'(entity {name(i)} "word{i}" (any "a" "an" "the") [(repeat 2 "very")] '
+        f'(any "x{i}" "y{i}" "z{i}"))'
+        for i in range(n_entities)
+    ]
+    body = " ".join(name(i) for i in range(0, n_entities, max(1, n_entities // 20)))
+    root = (
+        f'(entity root "Dear" $name "," {body} (if $plan="pro" "Thanks!" "Upgrade?"))'
+    )
+
+    return "\n".join(["(grammar", *entities, root, ")"])
+
+
+def large_context(n_values: int) -> str:
+    """
+    Builds a grammar made of placeholders, to be bound to `context(n_values)`.
+    Args:
+        n_values (int): The number of values of every context key.
+
+    Returns:
+        The grammar source.
+    """
+    return (
+        f'(grammar (entity {name(0)} "Dear" $person.name "of" $person.city "," '
+        '(if $person.name=$person.friend "hello again" "nice to meet you") "."))'
+    )
+
+
+def context(n_values: int) -> dict:
+    """
+    Builds a nested context with `n_values` values per key.
+    Args:
+        n_values (int): The number of values of every key.
+
+    Returns:
+        The context dictionary.
+    """
+    return {
+        "person": {
+            "name": [f"name{i}" for i in range(n_values)],
+            "city": [f"city{i}" for i in range(n_values)],
+            "friend": "name0",
+        }
+    }
+
+
+def big_repeat(n_repeat: int) -> str:
+    """
+    Builds a grammar repeating a random choice `n_repeat` times.
+    Args:
+        n_repeat (int): The repeat count.
+
+    Returns:
+        The grammar source.
+    """
+    return f'(grammar (entity {name(0)} (repeat {n_repeat} (any "tick" "tock" [","]))))'
@@ -0,0 +1,297 @@
+"""
+Times every stage of the pipeline - tokenize, parse, optimize and generate - on synthetic grammars of increasing size,
+records their peak memory, and compares the results against a saved baseline.
+
+Usage:
+    python -m benchmarks.suite [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+
+Exits with status 1 if any stage regressed by more than the threshold compared to the baseline.
+"""
+
+from benchmarks import grammars
+from txtgen import __version__
+from txtgen.context import Context
+from txtgen.optimizer import optimize
+from txtgen.parser import DescentParser
+from txtgen.tokenizer import Token, tokenize
+
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import argparse
+import datetime
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+
+# Generations timed per run of the generate stage, unless the workload overrides it.
+N_GENERATIONS = 1_000
+
+
+class Workload(NamedTuple):
+    family: str
+    size: int
+    src: str
+    ctx: Optional[dict]
+    entity: str
+    generations: int = N_GENERATIONS
+
+    @property
+    def key(self) -> str:
+        return f"{self.family}/{self.size}"
+
+
+def workloads(quick: bool = False) -> Iterator[Workload]:
+    """
+    Builds the benchmarked grammars.
+    Args:
+        quick (bool): Only build the smallest size of every family.
+
+    Returns:
+        An iterator over the workloads.
+    """
+    families: Dict[str, List[int]] = {
+        "mixed": [100, 1_000, 5_000],
+        "wide_any": [100, 10_000, 100_000],
+        "deep_nesting": [10, 100, 200],
+        "heavy_macros": [100, 1_000, 5_000],
+        "shared_macro": [100, 1_000, 5_000],
+        "large_context": [100, 10_000, 100_000],
+        "big_repeat": [10, 1_000, 10_000],
+    }
+    ctx = {"name": ["John", "Mary", "Jack", "Alice"], "a": "x", "b": ["x", "y"]}
+
+    for family, sizes in families.items():
+        for size in sizes[:1] if quick else sizes:
+            if family == "mixed":
+                yield Workload(
+                    family, size, grammars.mixed(size), ctx, grammars.name(size - 1)
+                )
+            elif family in {"heavy_macros", "shared_macro"}:
+                yield Workload(
+                    family,
+                    size,
+                    getattr(grammars, family)(size),
+                    None,
+                    grammars.name(size - 1),
+                )
+            elif family == "large_context":
+                src = grammars.large_context(size)
+                yield Workload(
+                    family, size, src, grammars.context(size), grammars.name(0)
+                )
+            elif family == "big_repeat":
+                # Every generation draws `size` times: keep the total work comparable to the other families.
+                src = grammars.big_repeat(size)
+                yield Workload(family, size, src, None, grammars.name(0), 100)
+            else:
+                src = getattr(grammars, family)(size)
+                yield Workload(family, size, src, None, grammars.name(0))
+
+
+class _PretokenizedParser(DescentParser):
+    """
+    Parses an already tokenized source, so that parsing can be timed on its own.
+    """
+
+    def __init__(self, tokens: List[Token]) -> None:
+        self._token_list = tokens
+        super().__init__("")
+
+    def _initialize(self) -> None:
+        super()._initialize()
+        self.tokens = iter(self._token_list)
+
+
+def stages(workload: Workload) -> Dict[str, Callable[[], Callable[[], Any]]]:
+    """
+    Builds the stages of a workload. Every stage is a setup function returning the function to time, so that each run
+    starts from fresh inputs (the optimizer mutates the grammar it is given).
+    Args:
+        workload (Workload): The workload.
+
+    Returns:
+        The setup function of every stage.
+    """
+    tokens = list(tokenize(workload.src))
+    ctx = Context(workload.ctx) if workload.ctx else None
+    grammar = optimize(_PretokenizedParser(tokens).grammar(), ctx)
+
+    def generate() -> None:
+        rng = random.Random(0)
+        for _ in range(workload.generations):
+            grammar.generate(workload.entity, rng=rng)
+
+    def setup_optimize() -> Callable[[], Any]:
+        parsed = _PretokenizedParser(tokens).grammar()
+        return lambda: optimize(parsed, Context(workload.ctx) if workload.ctx else None)
+
+    return {
+        "tokenize": lambda: lambda: sum(1 for _ in tokenize(workload.src)),
+        "parse": lambda: _PretokenizedParser(tokens).grammar,
+        "optimize": setup_optimize,
+        "generate": lambda: generate,
+    }
+
+
+def measure(setup: Callable[[], Callable[[], Any]], repeat: int) -> Dict[str, float]:
+    """
+    Times a stage and records its peak memory.
+    Args:
+        setup (Callable): Returns the function to measure.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        The best and median run times in seconds, and the peak memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        fn = setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    # Tracing slows allocations down, so memory is measured on a separate, untimed run.
+    fn = setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_s": min(times),
+        "median_s": statistics.median(times),
+        "peak_bytes": peak,
+    }
+
+
+def run(repeat: int, quick: bool = False, only: str = None) -> Dict[str, Any]:
+    """
+    Runs the suite.
+    Args:
+        repeat (int): The number of timed runs per stage.
+        quick (bool): Only run the smallest size of every family.
+        only (Optional[str]): Only run the families whose name contains this string.
+
+    Returns:
+        The results, ready to be serialized to JSON.
+    """
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    print(
+        f"{'workload':<24} {'stage':<10} {'best (ms)':>10} {'median (ms)':>12} {'peak (KiB)':>11}"
+    )
+    for workload in workloads(quick):
+        if only and only not in workload.family:
+            continue
+
+        results[workload.key] = {}
+        for stage, setup in stages(workload).items():
+            result = measure(setup, repeat)
+            if stage == "generate":
+                result["generations"] = workload.generations
+            results[workload.key][stage] = result
+            print(
+                f"{workload.key:<24} {stage:<10} {result['best_s'] * 1e3:>10.2f} "
+                f"{result['median_s'] * 1e3:>12.2f} {result['peak_bytes'] / 1024:>11.1f}"
+            )
+
+    return {
+        "meta": {
+            "txtgen": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> List[str]:
+    """
+    Compares results against a baseline. Only the workloads and stages present in both are compared.
+    Args:
+        current (Dict[str, Any]): The current results.
+        baseline (Dict[str, Any]): The baseline results.
+        threshold (float): The tolerated relative slowdown (or memory growth), e.g. 0.2 for 20%.
+
+    Returns:
+        A description of every regression.
+    """
+    regressions = []
+
+    print(f"\n{'workload':<24} {'stage':<10} {'time':>8} {'memory':>8}")
+    for key, stage_results in current["results"].items():
+        for stage, result in stage_results.items():
+            try:
+                reference = baseline["results"][key][stage]
+            except KeyError:
+                continue
+
+            time_ratio = result["best_s"] / max(reference["best_s"], 1e-9)
+            memory_ratio = result["peak_bytes"] / max(reference["peak_bytes"], 1)
+            print(f"{key:<24} {stage:<10} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x")
+
+            if time_ratio > 1 + threshold:
+                regressions.append(f"{key} {stage}: {time_ratio:.2f}x slower")
+            if memory_ratio > 1 + threshold:
+                regressions.append(f"{key} {stage}: {memory_ratio:.2f}x more memory")
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results against this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="tolerated regression (default: 0.2)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timed runs per stage (default: 5)"
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="only run the smallest size of every family",
+    )
+    parser.add_argument(
+        "--only", help="only run the families whose name contains this string"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.quick, args.only)
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            regressions = compare(results, json.load(infile), args.threshold)
+
+        if regressions:
+            print(
+                "\nRegressions:\n"
+                + "\n".join(f"  {regression}" for regression in regressions)
+            )
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
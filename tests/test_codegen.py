@@ -0,0 +1,176 @@
+from txtgen import nodes
+from txtgen.codegen import (
+    MAX_DEPTH,
+    CompiledGrammar,
+    SourceCompiler,
+    compile_grammar,
+    generate_source,
+    load_module,
+    write_module,
+)
+from txtgen.context import Weighted
+from txtgen.interpreter import make
+from txtgen.parallel import generate_parallel
+
+import pickle
+import random
+
+import pytest
+
+
+GRAMMAR = """
+(grammar
+    (macro sentence (body) body ".")
+    (entity greeting<sentence> ((any 3 "Hello" "Hi" "Hey") ["there"] "," $name))
+    (entity farewell "Goodbye" [(any "my" "dear")] (repeat 2 "old") friend "!")
+    (entity friend (any "pal" "buddy" (if $a=$b "mate" "chum")))
+    (entity story greeting farewell)
+)
+"""
+
+CTX = {"name": ["John", "Mary", "Jack"], "a": ["x", "y"], "b": "x"}
+
+
+@pytest.mark.parametrize(
+    "node,expected",
+    [
+        (nodes.LiteralNode("a"), "'a'"),
+        (None, "''"),
+        (
+            nodes.ListNode([nodes.LiteralNode("a"), nodes.LiteralNode("")]),
+            "'a'",
+        ),
+        (
+            nodes.ListNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+            "'a' + 'b'",
+        ),
+        (
+            nodes.OptionalNode(nodes.LiteralNode("a")),
+            "('a' if rng.choice(_BRANCHES) else '')",
+        ),
+        (
+            nodes.RepeatNode(2, nodes.LiteralNode("a")),
+            "''.join(['a' for _ in range(2)])",
+        ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+            "rng.choice(_a0)",
+        ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1]),
+            "_a0[_t1(rng)]",
+        ),
+        (nodes.PlaceholderNode("a"), "_p0(ctx, rng)"),
+    ],
+)
+def test_expression(node: nodes.Node, expected: str) -> None:
+    assert expected == SourceCompiler().expression(node)
+
+
+def test_expression_raises_on_unresolved_reference() -> None:
+    with pytest.raises(TypeError):
+        SourceCompiler().expression(nodes.ReferenceNode("a"))
+
+
+def test_compile_shared_node_once() -> None:
+    shared = nodes.ListNode([nodes.LiteralNode("a"), nodes.OptionalNode(None)])
+    grammar = nodes.Grammar({"root": nodes.EntityNode("root", [shared, shared])}, {})
+
+    source = generate_source(grammar)
+    assert 2 == source.count("def ")
+    assert "aa" == CompiledGrammar(source).generate("root")
+
+
+def test_compile_deep_nesting() -> None:
+    node: nodes.Node = nodes.LiteralNode("a")
+    for _ in range(MAX_DEPTH * 10):
+        node = nodes.OptionalNode(node)
+    grammar = nodes.Grammar({"deep": nodes.EntityNode("deep", [node])}, {})
+
+    expected = grammar.generate_many("deep", 50, rng=3)
+    assert expected == compile_grammar(grammar).generate_many("deep", 50, rng=3)
+
+
+def test_compile_recursive_entity() -> None:
+    compiled = compile_grammar(make('(grammar (entity loop "a" [loop]))'))
+
+    for _ in range(100):
+        assert set(compiled.generate("loop").split()) == {"a"}
+
+
+@pytest.mark.parametrize("entity", ["greeting", "farewell", "friend", "story"])
+def test_compiled_matches_tree_walker(entity: str) -> None:
+    grammar = make(GRAMMAR)
+    compiled = compile_grammar(grammar)
+
+    expected = grammar.generate_many(entity, 200, CTX, rng=random.Random(1234))
+    assert expected == compiled.generate_many(entity, 200, CTX, rng=1234)
+
+
+def test_compiled_matches_tree_walker_bound_context() -> None:
+    ctx = {"name": ["John", "Mary", "Jack"], "a": Weighted({"x": 3, "y": 1}), "b": "x"}
+    grammar = make(GRAMMAR, ctx)
+    compiled = compile_grammar(grammar)
+
+    expected = grammar.generate_many("story", 200, rng=7)
+    assert expected == compiled.generate_many("story", 200, rng=7)
+
+
+def test_compiled_unique_matches_tree_walker() -> None:
+    src = '(grammar (entity a "pick" (unique (any "x" "y" "z") ["!"]) (any "a" "b")))'
+
+    expected = make(src).generate_many("a", 20, rng=6)
+    assert expected == compile_grammar(make(src)).generate_many("a", 20, rng=6)
+
+
+def test_compiled_write_many_matches_generate_many() -> None:
+    compiled = compile_grammar(make(GRAMMAR))
+    expected = compiled.generate_many("story", 30, CTX, rng=8)
+
+    out: list = []
+    compiled.write_many("story", 30, out.append, CTX, rng=8, separator="|")
+    assert "".join(f"{value}|" for value in expected) == "".join(out)
+
+    out = []
+    compiled.emit("story", out.append, CTX, rng=8)
+    assert expected[0] == "".join(out)
+    assert expected == list(compiled.generate_many("story", 30, CTX, lazy=True, rng=8))
+
+
+def test_compiled_inherits_grammar_rng() -> None:
+    expected = make(GRAMMAR, rng=7).generate_many("story", 20, CTX)
+    assert expected == compile_grammar(make(GRAMMAR, rng=7)).generate_many(
+        "story", 20, CTX
+    )
+
+
+def test_compiled_pickle() -> None:
+    compiled = compile_grammar(make(GRAMMAR))
+    loaded = pickle.loads(pickle.dumps(compiled))
+
+    assert compiled.source == loaded.source
+    expected = compiled.generate_many("story", 20, CTX, rng=5)
+    assert expected == loaded.generate_many("story", 20, CTX, rng=5)
+
+
+def test_compiled_generate_parallel() -> None:
+    compiled = compile_grammar(make(GRAMMAR))
+
+    expected = list(
+        generate_parallel(make(GRAMMAR), "story", 50, CTX, seed=2, shard_size=10)
+    )
+    assert expected == list(
+        generate_parallel(compiled, "story", 50, CTX, seed=2, workers=2, shard_size=10)
+    )
+
+
+def test_write_load_module(tmp_path) -> None:
+    path = str(tmp_path / "story.py")
+    grammar = make(GRAMMAR)
+
+    write_module(grammar, path)
+    loaded = load_module(path, rng=4)
+
+    assert generate_source(grammar) == loaded.source
+    expected = grammar.generate_many("story", 20, CTX, rng=4)
+    assert expected == loaded.generate_many("story", 20, CTX)
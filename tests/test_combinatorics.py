@@ -0,0 +1,228 @@
+from txtgen import nodes
+from txtgen.combinatorics import OutputSpace
+from txtgen.context import Weighted, WordList
+from txtgen.interpreter import make
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "src,expected",
+    [
+        ('(grammar (entity a "x"))', 1),
+        ('(grammar (entity a (any "x" "y" "z")))', 3),
+        ('(grammar (entity a ["x"]))', 2),
+        ('(grammar (entity a (any "x" "y") ["z"]))', 4),
+        ('(grammar (entity a (repeat 3 (any "x" "y"))))', 8),
+        ('(grammar (entity a (any 5 "x" 1 "x")))', 2),
+        (
+            '(grammar (entity a (any b c)) (entity b "x" ["y"]) (entity c (any b "z")))',
+            5,
+        ),
+        ('(grammar (macro m (x) x "," x) (entity a<m> ((any "x" "y"))))', 4),
+        ('(grammar (entity a (repeat 100 (any "x" "y" "z"))))', 3**100),
+    ],
+)
+def test_grammar_count(src: str, expected: int) -> None:
+    assert expected == make(src).count("a")
+
+
+def test_grammar_count_bound_context() -> None:
+    grammar = make(
+        '(grammar (entity a $name (if $a=$b "same" "different")))',
+        bind_ctx={"name": ["John", "Mary", "Jack"], "a": "x", "b": "x"},
+    )
+    assert 3 == grammar.count("a")
+    assert ["John same", "Mary same", "Jack same"] == [
+        grammar.unrank("a", i) for i in range(3)
+    ]
+
+
+@pytest.mark.parametrize(
+    "weights,expected",
+    [
+        ({"a": 1, "b": 0}, ["x a"]),
+        ({"a": 1, "b": 0, "c": 2}, ["x a", "x c"]),
+    ],
+)
+def test_grammar_count_bound_zero_weights(weights: dict, expected: list) -> None:
+    grammar = make('(grammar (entity e "x" $n))', bind_ctx={"n": Weighted(weights)})
+
+    # Values that are never generated are neither counted nor enumerated.
+    assert set(expected) == set(grammar.generate_many("e", 50, rng=1))
+    assert len(expected) == grammar.count("e")
+    assert expected == list(grammar.enumerate("e"))
+    assert expected == sorted(grammar.generate_unique("e", len(expected), rng=1))
+
+
+def test_grammar_count_word_list(tmp_path) -> None:
+    path = tmp_path / "names.txt"
+    path.write_text("John\nMary\n")
+    grammar = make("(grammar (entity a $name $name))", {"name": WordList(str(path))})
+
+    assert 4 == grammar.count("a")
+    assert ["John John", "John Mary", "Mary John", "Mary Mary"] == list(
+        grammar.enumerate("a")
+    )
+
+
+@pytest.mark.parametrize(
+    "src",
+    [
+        '(grammar (entity a "x" [a]))',
+        '(grammar (entity a (any "x" b)) (entity b "y" a))',
+        "(grammar (entity a $name))",
+        '(grammar (entity a (if $a=$b "x" "y")))',
+    ],
+)
+def test_grammar_count_raises_on_unbounded_output(src: str) -> None:
+    with pytest.raises(ValueError):
+        make(src).count("a")
+
+
+def test_grammar_unrank_order() -> None:
+    grammar = make('(grammar (entity a (any "x" "y") ["z"] (repeat 2 (any "p" "q"))))')
+
+    assert [
+        "x p p",
+        "x p q",
+        "x q p",
+        "x q q",
+        "x z p p",
+        "x z p q",
+        "x z q p",
+        "x z q q",
+        "y p p",
+        "y p q",
+        "y q p",
+        "y q q",
+        "y z p p",
+        "y z p q",
+        "y z q p",
+        "y z q q",
+    ] == [grammar.unrank("a", i) for i in range(grammar.count("a"))]
+
+
+def test_grammar_unrank_covers_generated_output() -> None:
+    src = """
+    (grammar
+        (macro sentence (body) body ".")
+        (entity greeting<sentence> ((any 3 "Hello" "Hi" "Hey") ["there"] "," friend))
+        (entity friend (any "pal" "buddy" (repeat 2 "old") (any "my" "dear")))
+    )
+    """
+    grammar = make(src)
+
+    derivations = {
+        grammar.unrank("greeting", i) for i in range(grammar.count("greeting"))
+    }
+    assert 30 == len(derivations)
+    assert derivations == set(grammar.generate_many("greeting", 1000, rng=1))
+
+
+@pytest.mark.parametrize("index", [-1, 4])
+def test_grammar_unrank_out_of_range(index: int) -> None:
+    grammar = make('(grammar (entity a (any "x" "y") ["z"]))')
+
+    with pytest.raises(IndexError):
+        grammar.unrank("a", index)
+
+
+def test_grammar_unrank_large_index() -> None:
+    grammar = make('(grammar (entity a (repeat 1000 (any "x" "y"))))')
+    index = int("01" * 500, 2)
+
+    assert 2**1000 == grammar.count("a")
+    assert " ".join("xy" * 500) == grammar.unrank("a", index)
+
+
+def test_output_space_deep_graph() -> None:
+    node: nodes.Node = nodes.LiteralNode("leaf")
+    for _ in range(10_000):
+        node = nodes.OptionalNode(node)
+
+    space = OutputSpace()
+    assert 10_001 == space.count(node)
+    assert "leaf" == space.unrank(node, 10_000)
+    assert "" == space.unrank(node, 5)
+
+
+def test_output_space_raises_on_unknown_node() -> None:
+    class CustomNode(nodes.Node):
+        pass
+
+    with pytest.raises(TypeError):
+        OutputSpace().count(nodes.ListNode([CustomNode()]))
+
+
+def test_grammar_generate_unique() -> None:
+    grammar = make('(grammar (entity a (repeat 3 (any "x" "y" "z" "w"))))')
+
+    values = grammar.generate_unique("a", 64, rng=3)
+    assert 64 == len(set(values))
+    assert values == grammar.generate_unique("a", 64, rng=3)
+    assert values[:10] == list(grammar.generate_unique("a", 10, lazy=True, rng=3))
+    assert values[:10] != grammar.generate_unique("a", 10, rng=4)
+
+
+def test_grammar_generate_unique_skips_duplicate_text() -> None:
+    grammar = make('(grammar (entity a (any "x" "x" "y") ["z"]))')
+
+    assert {"x", "y", "x z", "y z"} == set(grammar.generate_unique("a", 4, rng=0))
+    with pytest.raises(ValueError):
+        grammar.generate_unique("a", 5, rng=0)
+
+
+def test_grammar_generate_unique_raises_on_small_output_space() -> None:
+    grammar = make('(grammar (entity a (any "x" "y")))')
+
+    assert [] == grammar.generate_unique("a", 0)
+    with pytest.raises(ValueError):
+        grammar.generate_unique("a", 3)
+
+
+def test_grammar_unique_function() -> None:
+    grammar = make('(grammar (entity a "pick" (unique (any "x" "y" "z") ["!"])))')
+    values = grammar.generate_many("a", 12, rng=5)
+
+    for start in (0, 6):
+        assert {"pick x", "pick y", "pick z", "pick x!", "pick y!", "pick z!"} == set(
+            values[start : start + 6]
+        )
+
+
+def test_grammar_enumerate() -> None:
+    grammar = make(
+        '(grammar (entity a (any "x" "y") $name ["z"]))',
+        bind_ctx={"name": ["John", "Mary"]},
+    )
+    enumeration = grammar.enumerate("a")
+
+    assert iter(enumeration) is enumeration
+    assert [
+        "x John",
+        "x John z",
+        "x Mary",
+        "x Mary z",
+        "y John",
+        "y John z",
+        "y Mary",
+        "y Mary z",
+    ] == list(enumeration)
+
+
+@pytest.mark.parametrize("start", [0, 1, 5, 7, 8, 100])
+def test_grammar_enumerate_from_offset(start: int) -> None:
+    grammar = make('(grammar (entity a (repeat 3 ["x"])))')
+    expected = [grammar.unrank("a", i) for i in range(grammar.count("a"))]
+
+    assert expected[start:] == list(grammar.enumerate("a", start))
+
+
+@pytest.mark.parametrize(
+    "src,start",
+    [('(grammar (entity a "x" [a]))', 0), ('(grammar (entity a "x"))', -1)],
+)
+def test_grammar_enumerate_raises(src: str, start: int) -> None:
+    with pytest.raises(ValueError):
+        make(src).enumerate("a", start)
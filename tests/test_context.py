@@ -1,4 +1,8 @@
-from txtgen.context import Context
+from txtgen.context import Context, Weighted, WordList, as_context, context_key
+from txtgen.sampling import AliasTable
+
+import pickle
+import random
 
 import pytest
 
@@ -13,11 +17,11 @@ def test_get_flat_values():
         {"hello": "world", "a": 42, "b": True, "c": 42.42, "rdm": ["a", "s", "d", "f"]}
     )
 
-    assert ["world"] == c.get("hello")
-    assert ["42"] == c.get("a")
-    assert ["True"] == c.get("b")
-    assert ["42.42"] == c.get("c")
-    assert ["a", "s", "d", "f"] == c.get("rdm")
+    assert ("world",) == c.get("hello")
+    assert ("42",) == c.get("a")
+    assert ("True",) == c.get("b")
+    assert ("42.42",) == c.get("c")
+    assert ("a", "s", "d", "f") == c.get("rdm")
 
     with pytest.raises(KeyError):
         c.get("unknown")
@@ -26,7 +30,137 @@ def test_get_flat_values():
 def test_get_nested_values():
     c = Context({"a": {"b": {"c": [18, 19], "a": "world"}, "a": "hello"}})
 
-    assert ["hello"] == c.get("a.a")
-    assert ["world"] == c.get("a.b.a")
-    assert ["{'c': [18, 19], 'a': 'world'}"] == c.get("a.b")
-    assert ["18", "19"] == c.get("a.b.c")
+    assert ("hello",) == c.get("a.a")
+    assert ("world",) == c.get("a.b.a")
+    assert ("{'c': [18, 19], 'a': 'world'}",) == c.get("a.b")
+    assert ("18", "19") == c.get("a.b.c")
+
+
+def test_get_caches_resolved_keys():
+    c = Context({"a": {"b": [1, 2]}})
+
+    values = c.get("a.b")
+    assert values is c.get("a.b")
+
+    # In-place mutations are not seen until the cache is invalidated.
+    c.ctx["a"]["b"].append(3)
+    assert ("1", "2") == c.get("a.b")
+
+    c.invalidate()
+    assert ("1", "2", "3") == c.get("a.b")
+
+
+def test_replacing_dict_invalidates_cache():
+    c = Context({"a": "hello"})
+    assert ("hello",) == c.get("a")
+
+    c.ctx = {"a": ["hello", "world"]}
+    assert ("hello", "world") == c.get("a")
+
+    c.ctx = {}
+    with pytest.raises(KeyError):
+        c.get("a")
+
+
+def test_get_weighted_values():
+    c = Context({"a": Weighted({"x": 3, 4: 1}), "b": ["x", "y"]})
+
+    assert ("x", "4") == c.get("a")
+    assert AliasTable([3, 1]) == c.get_table("a")
+    assert c.get_table("b") is None
+
+    with pytest.raises(KeyError):
+        c.get_table("unknown")
+
+
+def test_as_context():
+    c = Context({"a": "b"})
+    assert c is as_context(c)
+    assert ("b",) == as_context({"a": "b"}).get("a")
+    assert as_context({}) is None
+    assert as_context(None) is None
+
+
+@pytest.mark.parametrize(
+    "left, right, equal",
+    [
+        ({"a": "b"}, {"a": "b"}, True),
+        ({"a": "b"}, Context({"a": "b"}), True),
+        ({"a": ["x", {"b": 1}], "c": "d"}, {"c": "d", "a": ["x", {"b": 1}]}, True),
+        ({"a": Weighted({"x": 3})}, {"a": Weighted({"x": 3})}, True),
+        ({"a": "b"}, {"a": "c"}, False),
+        ({"a": 1}, {"a": True}, False),
+        ({"a": 1}, {"a": 1.0}, False),
+        ({"a": ["x"]}, {"a": "x"}, False),
+        ({"a": Weighted({"x": 3})}, {"a": Weighted({"x": 3.0})}, False),
+        ({"a": {1, 2}}, {"a": {1, 2}}, True),
+        ({"a": 1}, {"a": "1"}, True),
+        ({"a": ["p", "q"]}, {"a": ("p", "q")}, False),
+        ({"a": {"k": 1, "j": 2}}, {"a": {"j": 2, "k": 1}}, False),
+        ({"a": {"k": 1}}, {"a": {"k": "1"}}, False),
+    ],
+)
+def test_context_key(left, right, equal: bool) -> None:
+    assert equal == (context_key(left) == context_key(right))
+
+
+def test_context_key_empty():
+    assert context_key({}) is None
+    assert context_key(None) is None
+
+
+@pytest.fixture
+def word_file(tmp_path) -> str:
+    path = tmp_path / "words.txt"
+    path.write_bytes("John\nMary\r\n\nZoë\nJack".encode("utf-8"))
+    return str(path)
+
+
+def test_word_list(word_file: str) -> None:
+    words = WordList(word_file)
+
+    assert 5 == len(words)
+    assert ["John", "Mary", "", "Zoë", "Jack"] == list(words)
+    assert "Jack" == words[-1]
+    assert ["Mary", "Zoë"] == words[1:4:2]
+
+    with pytest.raises(IndexError):
+        words[5]
+
+
+@pytest.mark.parametrize("content", [b"", b"\n", b"a\n", b"a\nb", b"a\nb\n"])
+def test_word_list_line_breaks(tmp_path, content: bytes) -> None:
+    path = tmp_path / "words.txt"
+    path.write_bytes(content)
+
+    assert content.decode().splitlines() == list(WordList(str(path)))
+
+
+def test_word_list_index(word_file: str, tmp_path) -> None:
+    index_path = WordList.build_index(word_file, str(tmp_path / "words.index"))
+
+    assert WordList(word_file, index_path) == WordList(word_file, index_path)
+    assert WordList(word_file, index_path) != WordList(word_file)
+
+    with open(word_file, "ab") as outfile:
+        outfile.write(b"\nAlice")
+
+    with pytest.raises(ValueError):
+        WordList(word_file, index_path)
+
+
+def test_word_list_pickle(word_file: str) -> None:
+    words = WordList(word_file)
+    loaded = pickle.loads(pickle.dumps(words))
+
+    assert words == loaded
+    assert list(words) == list(loaded)
+
+
+def test_get_word_list(word_file: str) -> None:
+    words = WordList(word_file)
+    c = Context({"a": {"b": words}})
+
+    assert words is c.get("a.b")
+    assert c.get_table("a.b") is None
+    assert context_key({"a": WordList(word_file)}) == context_key({"a": words})
@@ -0,0 +1,51 @@
+from txtgen.interpreter import make
+
+import random
+
+import pytest
+
+GRAMMAR = """
+(grammar
+    (entity greeting (any "Hello" "Hi" "Hey") ["there"] "," name "!")
+    (entity name (any "John" "Mary" "Jack" "Alice" "Paul"))
+)
+"""
+
+
+def test_make_generates() -> None:
+    grammar = make(GRAMMAR)
+    assert grammar.generate("greeting").endswith("!")
+
+
+def test_make_binds_context() -> None:
+    grammar = make(
+        '(grammar (entity greeting "Hello" $name))', bind_ctx={"name": "Eve"}
+    )
+    assert "Hello Eve" == grammar.generate("greeting")
+
+
+def test_make_with_seed_is_reproducible() -> None:
+    first = make(GRAMMAR, rng=1).generate_many("greeting", 30)
+    second = make(GRAMMAR, rng=1).generate_many("greeting", 30)
+
+    assert first == second
+    assert len(set(first)) > 1
+
+
+def test_make_with_generator() -> None:
+    rng = random.Random(5)
+    grammar = make(GRAMMAR, rng=rng)
+
+    assert rng is grammar.rng
+    assert make(GRAMMAR).rng is None
+
+
+def test_make_lazy() -> None:
+    src = GRAMMAR.replace("(grammar", '(grammar (entity broken "a" missing)')
+    grammar = make(src, rng=1, lazy=True)
+
+    assert make(GRAMMAR, rng=1).generate_many("greeting", 30) == grammar.generate_many(
+        "greeting", 30
+    )
+    with pytest.raises(NameError):
+        grammar.generate("broken")
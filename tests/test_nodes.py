@@ -1,12 +1,15 @@
 from txtgen import nodes
 from txtgen.constants import PUNCTUATION
-from txtgen.context import Context
+from txtgen.context import Context, Weighted, WordList
+from txtgen.sampling import AliasTable
 
+from collections import Counter
 from typing import Optional, Set
 
 from unittest import mock
 
 import pytest
+import random
 
 
 @pytest.mark.parametrize(
@@ -25,6 +28,95 @@ def test_sub_punctuation(
     assert nodes.sub_punctuation(input_node) == expected_output
 
 
+@pytest.mark.parametrize(
+    "value",
+    ["hello", "", " ", "hello world", "a.", *PUNCTUATION],
+)
+def test_spaced(value: str) -> None:
+    assert nodes.sub_punctuation(nodes.LiteralNode(value)).generate() == nodes.spaced(
+        value
+    )
+
+
+@pytest.mark.parametrize(
+    "node",
+    [
+        nodes.Grammar({}, {}),
+        nodes.ConditionNode((None, None), nodes.LiteralNode("a")),
+        nodes.LiteralNode("a"),
+        nodes.PlaceholderNode("a"),
+        nodes.ReferenceNode("a"),
+        nodes.ParameterNode("a"),
+        nodes.MacroNode("a", [], []),
+        nodes.MacroReferenceNode("a"),
+        nodes.EntityNode("a", []),
+        nodes.AnyNode([]),
+        nodes.OptionalNode(None),
+        nodes.ListNode([]),
+        nodes.RepeatNode(1, nodes.LiteralNode("a")),
+    ],
+)
+def test_nodes_are_slotted(node: nodes.Node) -> None:
+    assert not hasattr(node, "__dict__")
+    assert type(node).__name__ == node.type
+
+    with pytest.raises(AttributeError):
+        node.some_attribute = "value"  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "fragments",
+    [
+        [],
+        [" ", "  "],
+        [" hello", " world"],
+        ["  ", " hello", "  ", ",", " world ", " ", "\n"],
+        ["a", "", "b "],
+        [" a b ", " c"],
+    ],
+)
+def test_stripped_writer(fragments: list) -> None:
+    out: list = []
+    write = nodes.StrippedWriter(out.append)
+
+    for fragment in fragments:
+        write(fragment)
+
+    assert "".join(fragments).strip() == "".join(out)
+
+
+@pytest.mark.parametrize(
+    "node",
+    [
+        nodes.LiteralNode("a"),
+        nodes.PlaceholderNode("p"),
+        nodes.ParameterNode("a", nodes.AnyNode([nodes.LiteralNode(x) for x in "abc"])),
+        nodes.ParameterNode("a"),
+        nodes.EntityNode(
+            "e", [nodes.LiteralNode("a"), None, nodes.PlaceholderNode("p")]
+        ),
+        nodes.ListNode(
+            [nodes.OptionalNode(nodes.LiteralNode("a")), nodes.LiteralNode("b")]
+        ),
+        nodes.AnyNode([nodes.LiteralNode(x) for x in "abcdef"]),
+        nodes.RepeatNode(5, nodes.OptionalNode(nodes.PlaceholderNode("p"))),
+        nodes.ConditionNode(
+            (nodes.PlaceholderNode("p"), nodes.LiteralNode(" x")),
+            nodes.LiteralNode("yes"),
+            nodes.LiteralNode("no"),
+        ),
+    ],
+)
+def test_node_emit_matches_generate(node: nodes.Node) -> None:
+    ctx = Context({"p": ["x", "y", "z"]})
+    generate_rng, emit_rng = random.Random(3), random.Random(3)
+
+    for _ in range(50):
+        out: list = []
+        node.emit(out.append, ctx, emit_rng)
+        assert node.generate(ctx, generate_rng) == "".join(out)
+
+
 @pytest.mark.parametrize(
     "input_node,input_ctx,expected_node",
     [
@@ -97,6 +189,110 @@ def test_grammar_node_generate():
     assert grammar.generate("some_entity", {"a": "sdf"}) == "a sdf"
 
 
+@pytest.mark.parametrize(
+    "source,expected_type",
+    [
+        (None, type(nodes.DEFAULT_RNG)),
+        (42, random.Random),
+        ("seed", random.Random),
+        (random.Random(1), random.Random),
+    ],
+)
+def test_make_rng(source: nodes.RandomSource, expected_type: type) -> None:
+    assert isinstance(nodes.make_rng(source), expected_type)
+
+
+def test_make_rng_returns_given_generator() -> None:
+    rng = random.Random(1)
+    assert rng is nodes.make_rng(rng)
+    assert nodes.DEFAULT_RNG is nodes.make_rng(None)
+    assert nodes.DEFAULT_RNG is nodes.make_rng(nodes.DEFAULT_RNG)
+
+
+def test_grammar_node_generate_is_reproducible():
+    grammar = nodes.Grammar(
+        {
+            "some_entity": nodes.EntityNode(
+                "some_entity",
+                [
+                    nodes.AnyNode([nodes.LiteralNode(str(i)) for i in range(100)]),
+                    nodes.OptionalNode(nodes.PlaceholderNode("a")),
+                ],
+            )
+        },
+        {},
+    )
+    ctx = {"a": [str(i) for i in range(100)]}
+
+    seeded = [grammar.generate("some_entity", ctx, rng=1234) for _ in range(10)]
+    assert len(set(seeded)) == 1
+
+    rng_a, rng_b = random.Random(99), random.Random(99)
+    stream_a = [grammar.generate("some_entity", ctx, rng=rng_a) for _ in range(50)]
+    stream_b = [grammar.generate("some_entity", ctx, rng=rng_b) for _ in range(50)]
+    assert stream_a == stream_b
+    assert len(set(stream_a)) > 1
+
+    grammar.rng = random.Random(99)
+    assert stream_a == grammar.generate_many("some_entity", 50, ctx)
+    assert stream_a == grammar.generate_many("some_entity", 50, ctx, rng=99)
+
+
+def test_grammar_node_write_many():
+    grammar = nodes.Grammar(
+        {
+            "some_entity": nodes.EntityNode(
+                "some_entity",
+                [
+                    nodes.AnyNode([nodes.LiteralNode(" a"), nodes.LiteralNode(" b ")]),
+                    nodes.PlaceholderNode("a"),
+                ],
+            )
+        },
+        {},
+    )
+    ctx = {"a": ["c", "d", "e"]}
+    expected = grammar.generate_many("some_entity", 20, ctx, rng=5)
+
+    out: list = []
+    grammar.write_many("some_entity", 20, out.append, ctx, rng=5)
+    assert "".join(f"{value}\n" for value in expected) == "".join(out)
+
+    out = []
+    grammar.emit("some_entity", out.append, ctx, rng=5)
+    assert expected[0] == "".join(out)
+
+
+def test_grammar_node_generate_many():
+    grammar = nodes.Grammar(
+        {
+            "some_entity": nodes.EntityNode(
+                "some_entity",
+                [nodes.LiteralNode("a"), nodes.PlaceholderNode("a")],
+            )
+        },
+        {},
+    )
+
+    generations = grammar.generate_many("some_entity", 50, {"a": ["b", "c"]})
+    assert isinstance(generations, list)
+    assert 50 == len(generations)
+    assert set(generations) <= {"a b", "a c"}
+
+    lazy_generations = grammar.generate_many("some_entity", 3, {"a": "b"}, lazy=True)
+    assert not isinstance(lazy_generations, list)
+    assert ["a b"] * 3 == list(lazy_generations)
+
+    assert [] == grammar.generate_many("some_entity", 0)
+
+    ctx = Context({"a": ["b"]})
+    assert ["a b"] * 2 == grammar.generate_many("some_entity", 2, ctx)
+    assert "a b" == grammar.generate("some_entity", ctx)
+
+    with pytest.raises(KeyError):
+        grammar.generate_many("unknown", 1, lazy=True)
+
+
 @pytest.mark.parametrize(
     "node_a,node_b,should_eq",
     [
@@ -319,6 +515,15 @@ def test_placeholder_node_generate(
         assert expected_output == node.generate(ctx=Context(ctx))
 
 
+def test_placeholder_node_generate_allocates_no_nodes() -> None:
+    ctx = Context({"a": ["hello", "world", "!"]})
+    node = nodes.PlaceholderNode("a")
+
+    with mock.patch.object(nodes.Node, "__init__", side_effect=AssertionError):
+        for _ in range(100):
+            assert node.generate(ctx) in {" hello", " world", "!"}
+
+
 @pytest.mark.parametrize(
     "node_a,node_b,should_eq",
     [
@@ -566,6 +771,82 @@ def test_any_node_generate(node: nodes.AnyNode, ctx: dict, value_set: Set[str])
         assert node.generate(ctx=Context(ctx)) in value_set
 
 
+def test_any_node_generate_weighted() -> None:
+    node = nodes.AnyNode(
+        [nodes.LiteralNode("a"), nodes.LiteralNode("b"), nodes.LiteralNode("c")],
+        [3, 1, 0],
+    )
+    rng = random.Random(12)
+    counts = Counter(node.generate(rng=rng) for _ in range(20000))
+
+    assert "c" not in counts
+    assert 0.72 < counts["a"] / 20000 < 0.78
+
+
+def test_placeholder_node_generate_weighted() -> None:
+    ctx = Context({"a": Weighted({"x": 1, "y": 0})})
+    for _ in range(100):
+        assert " x" == nodes.PlaceholderNode("a").generate(ctx)
+
+
+@pytest.mark.parametrize(
+    "node_a,node_b,should_eq",
+    [
+        (nodes.ValueTableNode(["a", "b"]), nodes.ValueTableNode(["a", "b"]), True),
+        (nodes.ValueTableNode(["a", "b"]), nodes.ValueTableNode(["ab"]), False),
+        (nodes.ValueTableNode(["a", "b"]), nodes.ValueTableNode(["b", "a"]), False),
+        (
+            nodes.ValueTableNode(["a", "b"]),
+            nodes.ValueTableNode(["a", "b"], AliasTable([1, 2])),
+            False,
+        ),
+    ],
+)
+def test_value_table_node_eq(
+    node_a: nodes.Node, node_b: nodes.Node, should_eq: bool
+) -> None:
+    assert should_eq == (node_a == node_b)
+
+
+def test_value_table_node_spaces_values() -> None:
+    node = nodes.ValueTableNode(["John", "!", "", "Mary Jane"])
+
+    assert 4 == len(node)
+    assert [" John", "!", " ", " Mary Jane"] == [node[i] for i in range(len(node))]
+
+
+@pytest.mark.parametrize("table", [None, AliasTable([3, 1, 0, 2])])
+def test_value_table_node_generates_like_any_node(
+    table: Optional[AliasTable],
+) -> None:
+    values = ["a", "b", ".", "d"]
+    any_node = nodes.AnyNode(
+        [nodes.sub_punctuation(nodes.LiteralNode(value)) for value in values],
+        list(table.weights) if table is not None else None,
+        table,
+    )
+    node = nodes.ValueTableNode(values, table)
+
+    expected = [any_node.generate(rng=random.Random(i)) for i in range(200)]
+    assert expected == [node.generate(rng=random.Random(i)) for i in range(200)]
+
+
+def test_word_list_node_generate(tmp_path) -> None:
+    path = tmp_path / "words.txt"
+    path.write_text("John\nMary\n!\nJack\n")
+    words = WordList(str(path))
+
+    node = nodes.WordListNode(words)
+    table = nodes.ValueTableNode(list(words))
+    placeholder = nodes.PlaceholderNode("name")
+    ctx = Context({"name": words})
+
+    expected = [node.generate(rng=random.Random(i)) for i in range(100)]
+    assert {" John", " Mary", "!", " Jack"} == set(expected)
+    assert expected == [table.generate(rng=random.Random(i)) for i in range(100)]
+    assert expected == [placeholder.generate(ctx, random.Random(i)) for i in range(100)]
+
+
 @pytest.mark.parametrize(
     "node_a,node_b,should_eq",
     [
@@ -593,7 +874,7 @@ def test_optional_node_generate():
 
     for i in range(1000):
         with mock.patch.object(
-            node.expression, "generate", return_value=node.expression.generate()
+            nodes.LiteralNode, "generate", return_value=node.expression.generate()
         ) as mock_gen:
             val = node.generate()
             if val == "":
@@ -708,3 +989,54 @@ def test_repeat_node_generate(
     node: nodes.RepeatNode, ctx: dict, expected_output: str
 ) -> None:
     assert expected_output == node.generate(ctx=Context(ctx))
+
+
+@pytest.mark.parametrize(
+    "node_a,node_b,should_eq",
+    [
+        (
+            nodes.UniqueNode([nodes.LiteralNode("a")]),
+            nodes.UniqueNode([nodes.LiteralNode("a")]),
+            True,
+        ),
+        (
+            nodes.UniqueNode([nodes.LiteralNode("a")]),
+            nodes.UniqueNode([nodes.LiteralNode("b")]),
+            False,
+        ),
+        (
+            nodes.UniqueNode([nodes.LiteralNode("a")]),
+            nodes.ListNode([nodes.LiteralNode("a")]),
+            False,
+        ),
+    ],
+)
+def test_unique_node_eq(
+    node_a: nodes.Node, node_b: nodes.Node, should_eq: bool
+) -> None:
+    assert should_eq == (node_a == node_b)
+
+
+def test_unique_node_generate() -> None:
+    node = nodes.UniqueNode(
+        [
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+            nodes.OptionalNode(nodes.LiteralNode("c")),
+            nodes.AnyNode([nodes.LiteralNode("x"), nodes.LiteralNode("y")]),
+        ]
+    )
+    rng = random.Random(4)
+    derivations = {"ax", "ay", "acx", "acy", "bx", "by", "bcx", "bcy"}
+
+    # Every round generates each derivation exactly once, in a new order.
+    rounds = [[node.generate(rng=rng) for _ in range(8)] for _ in range(3)]
+    for values in rounds:
+        assert derivations == set(values)
+    assert rounds[0] != rounds[1] or rounds[1] != rounds[2]
+
+
+def test_unique_node_generate_raises_on_unbounded_body() -> None:
+    node = nodes.UniqueNode([nodes.PlaceholderNode("a")])
+
+    with pytest.raises(ValueError):
+        node.generate(Context({"a": ["x", "y"]}))
@@ -1,9 +1,27 @@
 from txtgen import nodes
-from txtgen.context import Context
-from txtgen.optimizer import Optimizer
+from txtgen.context import Context, Weighted, WordList
+from txtgen.interpreter import make
+from txtgen.optimizer import (
+    BindingTemplate,
+    ConstantFolder,
+    MAX_KEY_WIDTH,
+    Interner,
+    LazyEntities,
+    MacroTemplate,
+    Optimizer,
+    Pass,
+    get_children,
+    prune,
+    visits,
+)
+from txtgen.parser import DescentParser
+from txtgen.sampling import AliasTable
 
 from typing import Dict, Optional
 
+import pickle
+import random
+
 import pytest
 
 
@@ -15,6 +33,14 @@ import pytest
             nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
             nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
         ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [2, 2]),
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+        ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1]),
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1]),
+        ),
     ],
 )
 def test_optimizer_visit_any_node(node: nodes.Node, expected: nodes.Node) -> None:
@@ -22,6 +48,79 @@ def test_optimizer_visit_any_node(node: nodes.Node, expected: nodes.Node) -> Non
     assert expected == o.visit_any_node(node)
 
 
+def test_optimizer_visit_any_node_precomputes_table() -> None:
+    node = nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1])
+    optimized = Optimizer({}, {}).visit_any_node(node)
+
+    assert isinstance(optimized, nodes.AnyNode)
+    assert AliasTable([3, 1]) == optimized.table
+
+
+def test_optimizer_walk_keeps_weights_aligned() -> None:
+    node = nodes.AnyNode(
+        [
+            nodes.ConditionNode(
+                (nodes.PlaceholderNode("a"), nodes.PlaceholderNode("b")),
+                nodes.LiteralNode("a"),
+            ),
+            nodes.LiteralNode("b"),
+            nodes.LiteralNode("c"),
+        ],
+        [5, 2, 1],
+    )
+    optimized = Optimizer({}, {}, ctx=Context({"a": "x", "b": "y"})).walk(node)
+
+    assert isinstance(optimized, nodes.AnyNode)
+    assert [2, 1] == optimized.weights
+
+
+@pytest.mark.parametrize(
+    "weights,expected",
+    [
+        ([5, 0, 0], None),
+        ([5, 0, 1], nodes.sub_punctuation(nodes.LiteralNode("c"))),
+        (
+            [5, 2, 2],
+            nodes.AnyNode(
+                [
+                    nodes.sub_punctuation(nodes.LiteralNode("b")),
+                    nodes.sub_punctuation(nodes.LiteralNode("c")),
+                ]
+            ),
+        ),
+        (
+            [5, 3, 1],
+            nodes.AnyNode(
+                [
+                    nodes.sub_punctuation(nodes.LiteralNode("b")),
+                    nodes.sub_punctuation(nodes.LiteralNode("c")),
+                ],
+                [3, 1],
+            ),
+        ),
+    ],
+)
+def test_optimizer_walk_reweights_any_node_after_removing_branches(
+    weights: list, expected: Optional[nodes.Node]
+) -> None:
+    node = nodes.AnyNode(
+        [
+            nodes.ConditionNode(
+                (nodes.PlaceholderNode("a"), nodes.PlaceholderNode("b")),
+                nodes.LiteralNode("a"),
+            ),
+            nodes.LiteralNode("b"),
+            nodes.LiteralNode("c"),
+        ],
+        weights,
+    )
+    optimized = Optimizer({}, {}, ctx=Context({"a": "x", "b": "y"})).walk(node)
+
+    assert expected == optimized
+    if isinstance(optimized, nodes.AnyNode) and optimized.weights is not None:
+        assert AliasTable(optimized.weights) == optimized.table
+
+
 @pytest.mark.parametrize(
     "node,ctx,expected",
     [
@@ -144,6 +243,73 @@ def test_optimizer_visit_entity_node_with_macro() -> None:
     assert expected_entity == o.visit_entity_node(entity_1)
 
 
+def test_optimizer_visit_entity_node_with_macro_wrong_arguments() -> None:
+    o = Optimizer({}, {"m": nodes.MacroNode("m", [nodes.ParameterNode("a")], [])})
+    entity = nodes.EntityNode("e", [], macro=nodes.MacroReferenceNode("m"))
+
+    with pytest.raises(SyntaxError):
+        o.visit_entity_node(entity)
+
+
+def test_macro_template_expand() -> None:
+    a, b = nodes.ParameterNode("a"), nodes.ParameterNode("b")
+    constant = nodes.AnyNode([nodes.LiteralNode("x"), nodes.LiteralNode("y")])
+    referenced = nodes.EntityNode("referenced", [nodes.LiteralNode("z")])
+    spine = nodes.ListNode([constant, nodes.OptionalNode(a)])
+    macro = nodes.MacroNode("m", [a, b], [spine, referenced, b, a, constant])
+    template = MacroTemplate(macro)
+
+    first = template.expand([nodes.LiteralNode("1"), nodes.LiteralNode("2")])
+    second = template.expand([nodes.LiteralNode("3"), None])
+
+    assert [
+        nodes.ListNode(
+            [
+                constant,
+                nodes.OptionalNode(nodes.ParameterNode("a", nodes.LiteralNode("1"))),
+            ]
+        ),
+        referenced,
+        nodes.ParameterNode("b", nodes.LiteralNode("2")),
+        nodes.ParameterNode("a", nodes.LiteralNode("1")),
+        constant,
+    ] == first
+    assert nodes.ParameterNode("b", None) == second[2]
+
+    # Only the nodes leading to a parameter are copied.
+    assert first[1] is referenced and first[4] is constant
+    assert first[0].children[0] is constant
+    assert first[0] is not spine and first[0] is not second[0]
+    assert first[3] is first[0].children[1].expression
+
+    # The macro itself is left untouched.
+    assert a.value is None and b.value is None
+    assert spine.children[1].expression is a
+
+
+def test_macro_template_expand_copies_unique_nodes() -> None:
+    grammar = make(
+        """
+        (grammar
+            (macro m (body) body (unique (any "a" "b" "c" "d")))
+            (entity one<m> ("x"))
+            (entity two<m> ("y"))
+        )
+        """
+    )
+    one, two = grammar.entities["one"], grammar.entities["two"]
+    assert one.children[-1] is not two.children[-1]
+
+    # Every entity draws every value once per round.
+    rng = random.Random(3)
+    draws: Dict[str, list] = {"one": [], "two": []}
+    for _ in range(4):
+        for name in draws:
+            draws[name].append(grammar.generate(name, rng=rng).split()[-1])
+
+    assert sorted(draws["one"]) == sorted(draws["two"]) == ["a", "b", "c", "d"]
+
+
 @pytest.mark.parametrize(
     "node,entities,expected,want_err",
     [
@@ -199,17 +365,9 @@ def test_optimizer_visit_literal_node(
         (
             nodes.PlaceholderNode("a"),
             Context({"a": ["hello", "world"]}),
-            nodes.AnyNode(
-                [
-                    nodes.ListNode(
-                        [nodes.LiteralNode(" "), nodes.LiteralNode("hello")]
-                    ),
-                    nodes.ListNode(
-                        [nodes.LiteralNode(" "), nodes.LiteralNode("world")]
-                    ),
-                ]
-            ),
+            nodes.ValueTableNode(["hello", "world"]),
         ),
+        (nodes.PlaceholderNode("a"), Context({"a": []}), None),
         (nodes.PlaceholderNode("a"), None, nodes.PlaceholderNode("a")),
         (
             nodes.PlaceholderNode("a"),
@@ -221,6 +379,11 @@ def test_optimizer_visit_literal_node(
             Context({"a": "hello"}),
             nodes.ListNode([nodes.LiteralNode(" "), nodes.LiteralNode("hello")]),
         ),
+        (
+            nodes.PlaceholderNode("a"),
+            Context({"a": Weighted({"hello": 3, "world": 1})}),
+            nodes.ValueTableNode(["hello", "world"], AliasTable([3, 1])),
+        ),
     ],
 )
 def test_optimizer_visit_placeholder_node(
@@ -230,4 +393,586 @@ def test_optimizer_visit_placeholder_node(
     assert expected == o.visit_placeholder_node(node)
 
 
-# TODO: Tests for the walk() method.
+def test_optimizer_shares_value_tables() -> None:
+    grammar = make(
+        '(grammar (entity a "x" $name) (entity b $name "," $name))',
+        {"name": ["John", "Mary", "Jack"]},
+    )
+
+    table = grammar.entities["a"].children[1]
+    assert isinstance(table, nodes.ValueTableNode)
+    assert grammar.entities["b"].children[0] is table
+    assert grammar.entities["b"].children[2] is table
+
+
+def test_optimizer_binds_word_lists(tmp_path) -> None:
+    path = tmp_path / "names.txt"
+    path.write_text("John\nMary\nJack\n")
+    words = WordList(str(path))
+
+    o = Optimizer({}, {}, ctx=Context({"name": words}))
+    assert nodes.WordListNode(words) == o.visit_placeholder_node(
+        nodes.PlaceholderNode("name")
+    )
+
+
+def test_optimizer_walk_deep_tree() -> None:
+    node: nodes.Node = nodes.LiteralNode("leaf")
+    for _ in range(5000):
+        node = nodes.OptionalNode(nodes.ListNode([node, nodes.LiteralNode("")]))
+
+    optimized = Optimizer({}, {}).walk(node)
+
+    depth = 0
+    while isinstance(optimized, nodes.OptionalNode):
+        assert isinstance(optimized.expression, nodes.ListNode)
+        assert 1 == len(optimized.expression.children)
+        optimized = optimized.expression.children[0]
+        depth += 1
+
+    assert 5000 == depth
+    assert (
+        nodes.ListNode([nodes.LiteralNode(" "), nodes.LiteralNode("leaf")]) == optimized
+    )
+
+
+def test_pass_dispatch() -> None:
+    class Upper(Pass):
+        @staticmethod
+        @visits(nodes.LiteralNode)
+        def visit_literal(node: nodes.LiteralNode) -> nodes.Node:
+            return nodes.LiteralNode(node.value.upper())
+
+        @visits(nodes.OptionalNode, nodes.RepeatNode)
+        def visit_wrapper(self, node: nodes.Node) -> Optional[nodes.Node]:
+            return get_children(node)[0]
+
+    class Lower(Upper):
+        @staticmethod
+        def visit_literal(node: nodes.LiteralNode) -> nodes.Node:
+            return nodes.LiteralNode(node.value.lower())
+
+    class Quote(nodes.LiteralNode):
+        pass
+
+    assert {
+        nodes.LiteralNode: "visit_literal",
+        nodes.OptionalNode: "visit_wrapper",
+        nodes.RepeatNode: "visit_wrapper",
+    } == Upper.dispatch
+    assert Upper.dispatch == Lower.dispatch
+
+    def graph() -> nodes.Node:
+        return nodes.ListNode(
+            [
+                nodes.OptionalNode(nodes.LiteralNode("a")),
+                nodes.RepeatNode(2, Quote("b")),
+                nodes.AnyNode([nodes.LiteralNode("C")]),
+            ]
+        )
+
+    expected = [nodes.LiteralNode("A"), nodes.LiteralNode("B")]
+    upper = Upper().walk(graph())
+    assert expected + [nodes.AnyNode([nodes.LiteralNode("C")])] == upper.children
+
+    expected = [nodes.LiteralNode("a"), nodes.LiteralNode("b")]
+    lower = Lower().walk(graph())
+    assert expected + [nodes.AnyNode([nodes.LiteralNode("c")])] == lower.children
+
+
+def test_optimizer_walk_visits_shared_nodes_once() -> None:
+    visited = []
+
+    class CountingOptimizer(Optimizer):
+        def visit_entity_node(self, node: nodes.EntityNode) -> nodes.EntityNode:
+            visited.append(node.name)
+            return super().visit_entity_node(node)
+
+    # Every entity references the previous one twice: an unmemoized walk would visit the root 2 ** 40 times.
+    entity = nodes.EntityNode("e0", [nodes.LiteralNode("a")])
+    for i in range(1, 40):
+        entity = nodes.EntityNode(f"e{i}", [entity, entity])
+
+    assert entity is CountingOptimizer({}, {}).walk(entity)
+    assert [f"e{i}" for i in range(40)] == visited
+
+
+def test_optimizer_walk_recursive_entity() -> None:
+    entity = nodes.EntityNode("loop", [nodes.LiteralNode("a")])
+    entity.children.append(nodes.OptionalNode(entity))
+
+    optimized = Optimizer({}, {}).walk(entity)
+
+    assert entity is optimized
+    assert optimized.children[1].expression is entity
+    assert nodes.ListNode([nodes.LiteralNode(" "), nodes.LiteralNode("a")]) == (
+        optimized.children[0]
+    )
+
+
+def L(value: str) -> nodes.LiteralNode:
+    return nodes.LiteralNode(value)
+
+
+@pytest.mark.parametrize(
+    "node,expected",
+    [
+        (nodes.ListNode([]), L("")),
+        (nodes.ListNode([L(" "), L("a")]), L(" a")),
+        (
+            nodes.ListNode([nodes.ListNode([L(" "), L("a")]), L(""), L("!")]),
+            L(" a!"),
+        ),
+        (
+            nodes.ListNode([L("a"), nodes.OptionalNode(L("b")), L("c"), L("d")]),
+            nodes.ListNode([L("a"), nodes.OptionalNode(L("b")), L("cd")]),
+        ),
+        (nodes.ParameterNode("x", nodes.ListNode([L(" "), L("a")])), L(" a")),
+        (nodes.ParameterNode("x", None), L("")),
+        (nodes.ConditionNode((L("a"), L("a")), L("yes"), L("no")), L("yes")),
+        (nodes.ConditionNode((L("a"), L("b")), L("yes"), L("no")), L("no")),
+        (nodes.ConditionNode((L("a"), L("b")), L("yes"), None), L("")),
+        (nodes.RepeatNode(3, L("ab")), L("ababab")),
+        (
+            nodes.AnyNode([nodes.ListNode([L(" "), L("a")]), L("b")]),
+            nodes.AnyNode([L(" a"), L("b")]),
+        ),
+        (
+            nodes.OptionalNode(nodes.ListNode([L(" "), L("a")])),
+            nodes.OptionalNode(L(" a")),
+        ),
+        (
+            nodes.RepeatNode(2, nodes.AnyNode([L("a"), L("b")])),
+            nodes.RepeatNode(2, nodes.AnyNode([L("a"), L("b")])),
+        ),
+    ],
+)
+def test_constant_folder_fold(node: nodes.Node, expected: nodes.Node) -> None:
+    assert expected == ConstantFolder().walk(node)
+
+
+def test_constant_folder_inlines_constant_entities() -> None:
+    constant = nodes.EntityNode("constant", [nodes.ListNode([L(" "), L("a")])])
+    empty = nodes.EntityNode("empty", [])
+    variable = nodes.EntityNode("variable", [nodes.AnyNode([L("b"), L("c")])])
+    root = nodes.EntityNode("root", [constant, empty, variable, L("!")])
+
+    folded = ConstantFolder().walk(root)
+
+    assert folded is root
+    assert [L(" a")] == constant.children
+    assert [L(" a"), variable, L("!")] == root.children
+
+
+@pytest.mark.parametrize(
+    "src",
+    [
+        '(grammar (entity a "x" [","] (any "y" (repeat 2 "z")) (if $n=$n "w") "."))',
+        '(grammar (macro m (x) x "," x) (entity a<m> ((any "a" "b") "c")) (entity b a a))',
+        '(grammar (entity a (any 2 b 1 c)) (entity b "x" "y") (entity c [a]))',
+    ],
+)
+def test_constant_folder_preserves_generation(src: str) -> None:
+    ctx = {"n": "x"}
+    grammar = DescentParser(src).grammar()
+    unfolded = Optimizer(grammar.entities, grammar.macros, Context(ctx)).walk(grammar)
+    folded = make(src, ctx)
+
+    for entity in unfolded.entities:
+        expected = unfolded.generate_many(entity, 50, ctx, rng=5)
+        assert expected == folded.generate_many(entity, 50, ctx, rng=5)
+
+
+def test_constant_folder_reduces_node_count() -> None:
+    def count(node: nodes.Node, seen: set) -> int:
+        if node is None or id(node) in seen:
+            return 0
+        seen.add(id(node))
+        return 1 + sum(count(child, seen) for child in get_children(node))
+
+    src = '(grammar (entity a "x" "y" (repeat 3 "z") [(any "a" "b" "c")] "."))'
+    grammar = DescentParser(src).grammar()
+    unfolded = Optimizer(grammar.entities, grammar.macros).walk(grammar)
+
+    assert 8 == count(make(src).entities["a"], set())
+    assert count(make(src).entities["a"], set()) < count(unfolded.entities["a"], set())
+
+
+def test_constant_folder_keeps_shared_lists() -> None:
+    src = '(grammar (entity a (repeat 100 (repeat 100 (repeat 10 (any "a" "b"))))))'
+    grammar = make(src)
+
+    # Every repeat is a list referencing the same body: flattening it would hold 100 * 100 * 10 children.
+    seen, children = set(), 0
+    stack = [grammar.entities["a"]]
+    while stack:
+        node = stack.pop()
+        if node is not None and id(node) not in seen:
+            seen.add(id(node))
+            children += len(get_children(node))
+            stack.extend(get_children(node))
+
+    assert len(seen) < 10 and children < 1_000
+    assert 100 * 100 * 10 == len(grammar.generate("a", rng=1).split())
+
+
+@pytest.mark.parametrize(
+    "left,right,shared",
+    [
+        (L("a"), L("a"), True),
+        (L("a"), L("b"), False),
+        (nodes.PlaceholderNode("a"), nodes.PlaceholderNode("a"), True),
+        (nodes.PlaceholderNode("a"), L("a"), False),
+        (nodes.AnyNode([L("a"), L("b")]), nodes.AnyNode([L("a"), L("b")]), True),
+        (nodes.AnyNode([L("a"), L("b")]), nodes.AnyNode([L("b"), L("a")]), False),
+        (nodes.AnyNode([L("a"), L("b")]), nodes.ListNode([L("a"), L("b")]), False),
+        (
+            nodes.AnyNode([L("a"), L("b")], [1, 2]),
+            nodes.AnyNode([L("a"), L("b")], [1, 2]),
+            True,
+        ),
+        (
+            nodes.AnyNode([L("a"), L("b")], [1, 2]),
+            nodes.AnyNode([L("a"), L("b")]),
+            False,
+        ),
+        (
+            nodes.AnyNode([L("a"), L("b")], [1, 2]),
+            nodes.AnyNode([L("a"), L("b")], [1.0, 2.0]),
+            False,
+        ),
+        (nodes.OptionalNode(L("a")), nodes.OptionalNode(L("a")), True),
+        (nodes.RepeatNode(2, L("a")), nodes.RepeatNode(2, L("a")), True),
+        (nodes.RepeatNode(2, L("a")), nodes.RepeatNode(3, L("a")), False),
+        (
+            nodes.ConditionNode((nodes.PlaceholderNode("a"), L("b")), L("c"), None),
+            nodes.ConditionNode((nodes.PlaceholderNode("a"), L("b")), L("c"), None),
+            True,
+        ),
+        (
+            nodes.ConditionNode((nodes.PlaceholderNode("a"), L("b")), L("c"), None),
+            nodes.ConditionNode((nodes.PlaceholderNode("a"), L("b")), None, L("c")),
+            False,
+        ),
+        (nodes.EntityNode("e", [L("a")]), nodes.EntityNode("e", [L("a")]), False),
+    ],
+)
+def test_interner_intern(left: nodes.Node, right: nodes.Node, shared: bool) -> None:
+    interner = Interner()
+    root = nodes.ListNode([left, right])
+
+    interned = interner.walk(root)
+
+    assert root == interned
+    assert shared == (interned.children[0] is interned.children[1])
+
+
+def test_interner_wide_lists() -> None:
+    width = MAX_KEY_WIDTH * 10
+    left = nodes.ListNode([nodes.LiteralNode(str(i)) for i in range(width)])
+    right = nodes.ListNode([nodes.LiteralNode(str(i)) for i in range(width)])
+    other = nodes.ListNode([nodes.LiteralNode(str(-i)) for i in range(width)])
+    interner = Interner()
+
+    interned = interner.walk(nodes.ListNode([left, right, other]))
+
+    assert interned.children[0] is interned.children[1]
+    assert interned.children[0] is not interned.children[2]
+    assert all(len(key) <= MAX_KEY_WIDTH + 3 for key in interner._canonical)
+
+
+def test_interner_wide_lists_digest_collision(monkeypatch) -> None:
+    monkeypatch.setattr(Interner, "digest", staticmethod(lambda children: (0, 0)))
+    left = nodes.ListNode([nodes.LiteralNode("a")] * (MAX_KEY_WIDTH + 1))
+    right = nodes.ListNode([nodes.LiteralNode("b")] * (MAX_KEY_WIDTH + 1))
+
+    interned = Interner().walk(nodes.ListNode([left, right]))
+
+    assert interned.children[0] is not interned.children[1]
+    assert [left, right] == interned.children
+
+
+def test_interner_shares_subtrees_across_entities() -> None:
+    src = (
+        "(grammar "
+        + " ".join(
+            f'(entity {name} (any "a" "an" "the") [(any "x" "y")] {name}b) (entity {name}b "z")'
+            for name in ["one", "two", "three"]
+        )
+        + ")"
+    )
+    grammar = make(src)
+
+    first = grammar.entities["one"].children
+    for name in ["two", "three"]:
+        assert grammar.entities[name] is not grammar.entities["one"]
+        for child, other in zip(first, grammar.entities[name].children):
+            assert child is other
+
+
+BIND_GRAMMAR = """
+(grammar
+    (macro sentence (body) body ".")
+    (entity greeting<sentence> ((any "Hello" "Hi") $name (if $a=$b "same" "different")))
+    (entity friend (any "pal" (if $a="x" "mate" "chum")) [friend])
+    (entity plain (any "a" "b") "c")
+    (entity nested plain greeting)
+    (entity picked (unique (any "x" "y" "z")) $name)
+)
+"""
+
+
+@pytest.mark.parametrize(
+    "ctx",
+    [
+        {"name": "John", "a": "x", "b": "x"},
+        {"name": "Mary", "a": "y", "b": "x"},
+        {"name": Weighted({"Jack": 3, "Alice": 1}), "a": 1, "b": "1"},
+        {"name": ["Zoë", "Jim"], "a": "y", "b": "y", "unused": "z"},
+    ],
+)
+@pytest.mark.parametrize("entity", ["greeting", "friend", "plain", "nested", "picked"])
+def test_binding_template_generates_like_bound_build(ctx: dict, entity: str) -> None:
+    bound = BindingTemplate(make(BIND_GRAMMAR)).bind(Context(ctx))
+    expected = make(BIND_GRAMMAR, ctx)
+
+    assert expected.generate_many(
+        entity, 50, rng=random.Random(1)
+    ) == bound.generate_many(entity, 50, rng=random.Random(1))
+
+
+def test_binding_template_shares_context_free_nodes() -> None:
+    grammar = make(BIND_GRAMMAR)
+    before = {
+        name: [id(child) for child in get_children(entity)]
+        for name, entity in grammar.entities.items()
+    }
+
+    bound = BindingTemplate(grammar).bind(Context({"name": "John", "a": "x", "b": "x"}))
+
+    assert bound.entities["plain"] is grammar.entities["plain"]
+    assert bound.entities["nested"] is not grammar.entities["nested"]
+    assert bound.entities["nested"].children[0] is grammar.entities["plain"]
+    assert (
+        bound.entities["picked"].children[0]
+        is not grammar.entities["picked"].children[0]
+    )
+
+    # The template grammar is left as it was.
+    for name, entity in grammar.entities.items():
+        assert before[name] == [id(child) for child in get_children(entity)]
+
+
+def test_grammar_bind() -> None:
+    grammar = make(BIND_GRAMMAR)
+    bound = grammar.bind({"name": ["John", "Mary"], "a": "x", "b": "y"})
+
+    assert bound is grammar.bind({"b": "y", "a": "x", "name": ["John", "Mary"]})
+    assert bound is not grammar.bind({"name": ["John", "Mary"], "a": "x", "b": "x"})
+    assert bound is not grammar.bind({"name": ["John", "Mary"], "a": "x", "b": True})
+    assert grammar is grammar.bind({})
+
+    assert {
+        "Hello John same.",
+        "Hi John same.",
+        "Hello Mary same.",
+        "Hi Mary same.",
+    } == set(
+        grammar.bind({"name": ["John", "Mary"], "a": 1, "b": 1}).generate_many(
+            "greeting", 50, rng=0
+        )
+    )
+    assert {"Hello John different.", "Hi John different."} == set(
+        grammar.bind({"name": "John", "a": "x", "b": "y"}).generate_many(
+            "greeting", 50, rng=0
+        )
+    )
+
+
+def test_grammar_bind_keys_contexts_by_generated_text() -> None:
+    grammar = make("(grammar (entity a $x))")
+
+    for ctx in [
+        {"x": ["p", "q"]},
+        {"x": ("p", "q")},
+        {"x": {"k": 1, "j": 2}},
+        {"x": {"j": 2, "k": 1}},
+    ]:
+        expected = make("(grammar (entity a $x))", ctx).generate_many("a", 20, rng=1)
+        assert expected == grammar.bind(ctx).generate_many("a", 20, rng=1)
+
+
+def test_grammar_bind_cache_evicts_least_recently_used(monkeypatch) -> None:
+    monkeypatch.setattr(nodes, "BIND_CACHE_SIZE", 2)
+    grammar = make(BIND_GRAMMAR)
+
+    first = grammar.bind({"name": "a"})
+    second = grammar.bind({"name": "b"})
+    assert first is grammar.bind({"name": "a"})
+
+    grammar.bind({"name": "c"})
+    assert first is grammar.bind({"name": "a"})
+    assert second is not grammar.bind({"name": "b"})
+
+
+LAZY_GRAMMAR = """
+(grammar
+    (macro sentence (body) body ".")
+    (macro shout (body) body "!")
+    (entity greeting<sentence> ((any "Hello" "Hi") ["there"] friend))
+    (entity friend (any "pal" "buddy" $name) [friend])
+    (entity farewell<shout> ("Bye" plain))
+    (entity plain "plain" "words")
+    (entity broken "word" missing)
+)
+"""
+
+
+@pytest.mark.parametrize("ctx", [None, {"name": ["John", "Mary"]}])
+@pytest.mark.parametrize("entity", ["greeting", "friend", "farewell", "plain"])
+def test_lazy_entities_generate_like_optimized(
+    ctx: Optional[dict], entity: str
+) -> None:
+    expected = make(LAZY_GRAMMAR.replace("missing", "plain"), ctx)
+    lazy = make(LAZY_GRAMMAR, ctx, lazy=True)
+
+    gen_ctx = None if ctx else {"name": "Jack"}
+    assert expected.generate_many(
+        entity, 50, gen_ctx, rng=random.Random(1)
+    ) == lazy.generate_many(entity, 50, gen_ctx, rng=random.Random(1))
+
+
+def test_lazy_entities_optimize_on_first_use() -> None:
+    grammar = make(LAZY_GRAMMAR, lazy=True)
+    entities = grammar.entities
+    assert isinstance(entities, LazyEntities)
+
+    assert grammar.generate("greeting", {"name": "Jack"}, rng=0).endswith(".")
+    assert entities.peek("greeting").macro is None
+    assert entities.peek("friend").children[0].type == "AnyNode"
+
+    # Entities and macros that were not reached are left as parsed.
+    assert nodes.LiteralNode("plain") == entities.peek("plain").children[0]
+    assert entities.peek("farewell").macro is not None
+    assert nodes.ReferenceNode("body") == grammar.macros["shout"].children[0]
+
+    with pytest.raises(NameError):
+        grammar.generate("broken")
+
+
+@pytest.mark.parametrize(
+    "src,error",
+    [
+        ('(grammar (entity a "x" missing) (entity b "y"))', NameError),
+        ('(grammar (entity a<nomacro> ("x")) (entity b "y"))', KeyError),
+        (
+            '(grammar (macro m (p q) p q) (entity a<m> ("x")) (entity b "y"))',
+            SyntaxError,
+        ),
+        ('(grammar (entity a c) (entity c "x" missing) (entity b "y"))', NameError),
+    ],
+)
+def test_lazy_entities_raise_again_after_failed_optimization(
+    src: str, error: type
+) -> None:
+    grammar = make(src, lazy=True)
+
+    for _ in range(2):
+        with pytest.raises(error):
+            grammar.generate("a")
+
+    assert "y" == grammar.generate("b")
+
+
+def test_lazy_entities_raise_for_entities_reaching_failed_ones() -> None:
+    grammar = make(
+        '(grammar (entity a "x" missing) (entity b "y" a) (entity c b))', lazy=True
+    )
+
+    for entity in ["c", "b", "c", "a"]:
+        with pytest.raises(NameError):
+            grammar.generate(entity)
+
+
+def test_lazy_entities_release_passes() -> None:
+    grammar = make(LAZY_GRAMMAR.replace("missing", "plain"), lazy=True)
+    entities = grammar.entities
+    assert isinstance(entities, LazyEntities)
+
+    expected = make(LAZY_GRAMMAR.replace("missing", "plain"))
+    for name in ["greeting", "farewell", "friend", "plain"]:
+        assert expected.generate(name, {"name": "Jack"}, rng=2) == grammar.generate(
+            name, {"name": "Jack"}, rng=2
+        )
+        assert entities._optimizer is not None
+
+    # The passes are dropped with their tables once the last entity is optimized.
+    assert expected.generate("broken", rng=2) == grammar.generate("broken", rng=2)
+    assert entities._optimizer is None
+    assert entities._folder is None and entities._interner is None
+
+
+def test_lazy_entities_mapping() -> None:
+    entities = make(LAZY_GRAMMAR, lazy=True).entities
+
+    assert ["greeting", "friend", "farewell", "plain", "broken"] == list(entities)
+    assert 5 == len(entities)
+    assert "plain" in entities
+    assert entities["plain"] is entities["plain"]
+
+    del entities["broken"]
+    assert "broken" not in entities
+
+    entities["other"] = nodes.EntityNode("other", [nodes.LiteralNode(" other")])
+    assert " other" == entities["other"].generate()
+
+    copied = pickle.loads(pickle.dumps(entities))
+    assert isinstance(copied, dict)
+    assert list(entities) == list(copied)
+    assert entities["plain"] == copied["plain"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_prune(lazy: bool) -> None:
+    src = LAZY_GRAMMAR.replace("missing", "plain")
+    expected = make(src).generate_many("farewell", 20, rng=3)
+    grammar = make(src, lazy=lazy)
+
+    pruned = prune(grammar, ["farewell"])
+    assert pruned is grammar
+
+    if lazy:
+        # Pruning neither optimizes the kept entities nor their macros.
+        assert ["farewell", "plain"] == list(grammar.entities)
+        assert ["shout"] == list(grammar.macros)
+    else:
+        # The constant entity was inlined, and the macro expanded.
+        assert ["farewell"] == list(grammar.entities)
+        assert [] == list(grammar.macros)
+
+    assert expected == grammar.generate_many("farewell", 20, rng=3)
+
+
+def test_prune_keeps_referenced_entities() -> None:
+    grammar = make(LAZY_GRAMMAR.replace("missing", "plain"), lazy=True)
+    prune(grammar, ["greeting", "broken"])
+
+    assert ["greeting", "friend", "plain", "broken"] == list(grammar.entities)
+    assert ["sentence"] == list(grammar.macros)
+
+
+def test_prune_raises_on_undefined_root() -> None:
+    with pytest.raises(NameError):
+        prune(make(LAZY_GRAMMAR, lazy=True), ["greeting", "undefined"])
+
+
+def test_grammar_prune_resets_caches() -> None:
+    grammar = make(BIND_GRAMMAR)
+    bound = grammar.bind({"name": "John", "a": "x", "b": "x"})
+    assert "plain" in bound.entities
+
+    grammar.prune(["nested"])
+    assert {"plain", "nested", "greeting"} == set(grammar.entities)
+    rebound = grammar.bind({"name": "John", "a": "x", "b": "x"})
+    assert rebound is not bound
+    assert "friend" not in rebound.entities
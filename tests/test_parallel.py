@@ -0,0 +1,89 @@
+from txtgen.context import WordList
+from txtgen.interpreter import make
+from txtgen.parallel import generate_parallel, shard_seed
+from txtgen.vm import compile_grammar
+
+import pytest
+
+
+GRAMMAR = """
+(grammar
+    (entity greeting (any "Hello" "Hi" "Hey") ["there"] "," $name "!")
+)
+"""
+
+CTX = {"name": ["John", "Mary", "Jack", "Alice", "Paul", "Eric"]}
+
+
+def test_shard_seed_is_deterministic() -> None:
+    assert shard_seed(1, 2) == shard_seed(1, 2)
+    assert shard_seed(1, 2) != shard_seed(1, 3)
+    assert shard_seed(1, 2) != shard_seed(2, 2)
+
+
+def test_generate_parallel_matches_sequential_shards() -> None:
+    grammar = make(GRAMMAR)
+
+    expected = [
+        *grammar.generate_many("greeting", 10, CTX, rng=shard_seed(7, 0)),
+        *grammar.generate_many("greeting", 10, CTX, rng=shard_seed(7, 1)),
+        *grammar.generate_many("greeting", 5, CTX, rng=shard_seed(7, 2)),
+    ]
+
+    generated = generate_parallel(
+        grammar, "greeting", 25, CTX, seed=7, workers=2, shard_size=10
+    )
+    assert expected == list(generated)
+
+
+def test_generate_parallel_does_not_depend_on_worker_count() -> None:
+    grammar = make(GRAMMAR)
+
+    def run(workers: int, ordered: bool) -> list:
+        return list(
+            generate_parallel(
+                grammar,
+                "greeting",
+                95,
+                CTX,
+                seed=3,
+                workers=workers,
+                shard_size=7,
+                ordered=ordered,
+            )
+        )
+
+    single = run(1, ordered=True)
+    assert 95 == len(single)
+    assert single == run(3, ordered=True)
+    assert sorted(single) == sorted(run(3, ordered=False))
+
+
+def test_generate_parallel_with_program() -> None:
+    grammar = make(GRAMMAR)
+    program = compile_grammar(grammar)
+
+    from_grammar = generate_parallel(grammar, "greeting", 20, CTX, seed=1, workers=2)
+    from_program = generate_parallel(program, "greeting", 20, CTX, seed=1, workers=2)
+    assert list(from_grammar) == list(from_program)
+
+
+def test_generate_parallel_empty() -> None:
+    assert [] == list(generate_parallel(make(GRAMMAR), "greeting", 0, CTX, workers=1))
+
+
+def test_generate_parallel_rejects_invalid_shard_size() -> None:
+    with pytest.raises(ValueError):
+        generate_parallel(make(GRAMMAR), "greeting", 10, CTX, shard_size=0)
+
+
+def test_generate_parallel_word_list_context(tmp_path) -> None:
+    path = tmp_path / "names.txt"
+    path.write_text("\n".join(CTX["name"]))
+    ctx = {"name": WordList(str(path))}
+    grammar = make(GRAMMAR)
+
+    expected = generate_parallel(grammar, "greeting", 25, CTX, seed=3, workers=2)
+    assert list(expected) == list(
+        generate_parallel(grammar, "greeting", 25, ctx, seed=3, workers=2)
+    )
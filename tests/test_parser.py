@@ -43,6 +43,30 @@ import pytest
             ),
         ),
         ('(repeat 4 "hello")', nodes.RepeatNode(4, nodes.LiteralNode("hello"))),
+        (
+            "(any 3 a b 0 c)",
+            nodes.AnyNode(
+                [
+                    nodes.ReferenceNode("a"),
+                    nodes.ReferenceNode("b"),
+                    nodes.ReferenceNode("c"),
+                ],
+                [3, 1, 0],
+            ),
+        ),
+        (
+            "(any 1 a 1 b)",
+            nodes.AnyNode([nodes.ReferenceNode("a"), nodes.ReferenceNode("b")]),
+        ),
+        (
+            '(unique (any a b) "c")',
+            nodes.UniqueNode(
+                [
+                    nodes.AnyNode([nodes.ReferenceNode("a"), nodes.ReferenceNode("b")]),
+                    nodes.LiteralNode("c"),
+                ]
+            ),
+        ),
     ],
 )
 def test_parser_expression(text: str, expected_expression: Expression) -> None:
@@ -158,3 +182,9 @@ def test_parser_grammar(
     else:
         grammar = p.grammar()
         assert expected_grammar == grammar
+
+
+@pytest.mark.parametrize("text", ["(any 0 a 0 b)", "(any 3)"])
+def test_parser_weighted_any_errors(text: str) -> None:
+    with pytest.raises(SyntaxError):
+        DescentParser(text).expression()
@@ -0,0 +1,86 @@
+from txtgen.sampling import AliasTable, FeistelPermutation
+
+from collections import Counter
+from fractions import Fraction
+from typing import List
+
+import random
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [[1], [1, 1], [3, 1], [0, 5, 0, 2], [7, 1, 1, 1, 100], [10 ** 12, 1]],
+)
+def test_alias_table_exact_mass(weights: List[int]) -> None:
+    table = AliasTable(weights)
+    n, total = len(weights), sum(weights)
+
+    # Every draw of randrange(n * total) lands in exactly one column: count the mass each index receives.
+    mass = [Fraction(0)] * n
+    for column in range(n):
+        threshold = table.thresholds[column]
+        mass[column] += Fraction(threshold, n * total)
+        mass[table.aliases[column]] += Fraction(total - threshold, n * total)
+
+    assert [Fraction(weight, total) for weight in weights] == mass
+
+
+@pytest.mark.parametrize("weights", [[0.5, 0.25, 0.25], [3, 1.5], [0.1] * 10])
+def test_alias_table_float_distribution(weights: List[float]) -> None:
+    table = AliasTable(weights)
+    rng = random.Random(3)
+    n_samples = 50000
+
+    counts = Counter(table.sample(rng) for _ in range(n_samples))
+    for index, weight in enumerate(weights):
+        assert abs(counts[index] / n_samples - weight / sum(weights)) < 0.01
+
+
+def test_alias_table_never_samples_zero_weight() -> None:
+    table = AliasTable([0, 1, 0, 1])
+    rng = random.Random(5)
+    assert {1, 3} == {table.sample(rng) for _ in range(1000)}
+
+
+@pytest.mark.parametrize("weights", [[], [1, -1], [0, 0]])
+def test_alias_table_errors(weights: list) -> None:
+    with pytest.raises(ValueError):
+        AliasTable(weights)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 17, 64, 1000, 4097])
+def test_feistel_permutation_is_a_permutation(n: int) -> None:
+    permutation = FeistelPermutation(n, random.Random(n))
+
+    assert n == len(permutation)
+    assert list(range(n)) == sorted(permutation)
+
+
+def test_feistel_permutation_depends_on_rng() -> None:
+    first = list(FeistelPermutation(1000, random.Random(1)))
+
+    assert first == list(FeistelPermutation(1000, random.Random(1)))
+    assert first != list(FeistelPermutation(1000, random.Random(2)))
+    assert first != list(range(1000))
+
+
+def test_feistel_permutation_large_domain() -> None:
+    n = 3**200
+    permutation = FeistelPermutation(n, random.Random(0))
+    images = [permutation[i] for i in range(100)]
+
+    assert all(0 <= image < n for image in images)
+    assert 100 == len(set(images))
+
+
+@pytest.mark.parametrize("index", [-1, 10])
+def test_feistel_permutation_index_out_of_range(index: int) -> None:
+    with pytest.raises(IndexError):
+        FeistelPermutation(10, random.Random(0))[index]
+
+
+def test_feistel_permutation_raises_on_empty_range() -> None:
+    with pytest.raises(ValueError):
+        FeistelPermutation(0, random.Random(0))
@@ -0,0 +1,145 @@
+from txtgen import nodes
+from txtgen.context import Weighted, WordList
+from txtgen.interpreter import make
+from txtgen.serialization import HEADER, dumps, loads
+
+import random
+
+import pytest
+
+
+GRAMMAR = """
+(grammar
+    (macro sentence (body) body ".")
+    (entity greeting<sentence> ((any 3 "Hello" "Hi" "Hey") ["there"] "," $name))
+    (entity farewell "Goodbye" [(any "my" "dear")] (repeat 2 "old") friend "!")
+    (entity friend (any "pal" "buddy" (if $a=$b "mate" "chum")))
+    (entity story greeting farewell)
+)
+"""
+
+
+def test_loads_round_trip() -> None:
+    grammar = make(GRAMMAR)
+    loaded = loads(dumps(grammar))
+
+    assert grammar == loaded
+    assert grammar.macros.keys() == loaded.macros.keys()
+
+
+@pytest.mark.parametrize("entity", ["greeting", "farewell", "friend", "story"])
+def test_loads_generates_like_source(entity: str) -> None:
+    grammar = make(GRAMMAR)
+    loaded = loads(dumps(grammar))
+    ctx = {"name": ["John", "Mary", "Zoë"], "a": ["x", "y"], "b": "x"}
+
+    expected = grammar.generate_many(entity, 100, ctx, rng=random.Random(3))
+    assert expected == loaded.generate_many(entity, 100, ctx, rng=random.Random(3))
+
+
+def test_loads_preserves_shared_nodes() -> None:
+    shared = nodes.LiteralNode("a")
+    leaf = nodes.EntityNode("leaf", [shared, shared])
+    root = nodes.EntityNode("root", [leaf, nodes.OptionalNode(leaf)])
+    root.children.append(nodes.OptionalNode(root))
+
+    loaded = loads(dumps(nodes.Grammar({"leaf": leaf, "root": root}, {})))
+    loaded_leaf, loaded_root = loaded.entities["leaf"], loaded.entities["root"]
+
+    assert loaded_leaf.children[0] is loaded_leaf.children[1]
+    assert loaded_root.children[0] is loaded_leaf
+    assert loaded_root.children[1].expression is loaded_leaf
+    assert loaded_root.children[2].expression is loaded_root
+
+
+def test_loads_weights() -> None:
+    any_node = nodes.AnyNode(
+        [nodes.LiteralNode("a"), nodes.LiteralNode("b"), nodes.LiteralNode("c")],
+        [0.5, 10**30, 1],
+    )
+    grammar = nodes.Grammar({"e": nodes.EntityNode("e", [any_node])}, {})
+
+    loaded = loads(dumps(grammar)).entities["e"].children[0]
+    assert [0.5, 1e30, 1.0] == loaded.weights
+
+
+def test_loads_checks_source() -> None:
+    data = dumps(make(GRAMMAR), source=GRAMMAR)
+
+    assert make(GRAMMAR) == loads(data, source=GRAMMAR)
+    with pytest.raises(ValueError):
+        loads(data, source=GRAMMAR + " ")
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda data: data[:10],
+        lambda data: b"NOPE" + data[4:],
+        lambda data: data[:4] + b"\xff\x00" + data[6:],
+        lambda data: data[:-1] + bytes([data[-1] ^ 1]),
+        lambda data: data[:-1],
+    ],
+)
+def test_loads_rejects_invalid_artifacts(corrupt) -> None:
+    data = dumps(make(GRAMMAR))
+    assert len(data) > HEADER.size
+
+    with pytest.raises(ValueError):
+        loads(corrupt(data))
+
+
+def test_grammar_dump_load(tmp_path) -> None:
+    path = str(tmp_path / "grammar.txtgc")
+    grammar = make(GRAMMAR)
+
+    grammar.dump(path, source=GRAMMAR)
+    loaded = nodes.Grammar.load(path, source=GRAMMAR, rng=4)
+
+    assert grammar == loaded
+    ctx = {"a": "x", "b": "y"}
+    expected = grammar.generate_many("farewell", 20, ctx, rng=4)
+    assert expected == loaded.generate_many("farewell", 20, ctx)
+
+
+def test_dumps_raises_on_unknown_node() -> None:
+    class CustomNode(nodes.Node):
+        pass
+
+    grammar = nodes.Grammar({"e": nodes.EntityNode("e", [CustomNode()])}, {})
+    with pytest.raises(TypeError):
+        dumps(grammar)
+
+
+def test_loads_unique() -> None:
+    src = '(grammar (entity a "pick" (unique (any "x" "y" "z") ["!"])))'
+    grammar = make(src)
+    grammar.generate("a", rng=1)
+    loaded = loads(dumps(grammar))
+
+    assert grammar == loaded
+    assert make(src).generate_many("a", 12, rng=2) == loaded.generate_many(
+        "a", 12, rng=2
+    )
+
+
+def test_loads_value_tables() -> None:
+    ctx = {"name": ["John", "Mary", "!"], "a": Weighted({"x": 3, "y": 1}), "b": "x"}
+    grammar = make(GRAMMAR, ctx)
+    loaded = loads(dumps(grammar))
+
+    assert grammar == loaded
+    for entity in ["greeting", "friend", "story"]:
+        expected = grammar.generate_many(entity, 50, rng=random.Random(5))
+        assert expected == loaded.generate_many(entity, 50, rng=random.Random(5))
+
+
+def test_loads_word_lists(tmp_path) -> None:
+    path = tmp_path / "names.txt"
+    path.write_text("John\nMary\nZoë\n")
+    grammar = make(GRAMMAR, {"name": WordList(str(path)), "a": "x", "b": "y"})
+    loaded = loads(dumps(grammar))
+
+    assert grammar == loaded
+    expected = grammar.generate_many("greeting", 50, rng=random.Random(5))
+    assert expected == loaded.generate_many("greeting", 50, rng=random.Random(5))
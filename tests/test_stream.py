@@ -0,0 +1,66 @@
+from txtgen.interpreter import make
+from txtgen.stream import dump, writer_for
+from txtgen.vm import compile_grammar
+
+import io
+
+import pytest
+
+
+GRAMMAR = """
+(grammar
+    (entity greeting (any "Hello" "Hi" "Hey") ["there"] "," $name "!")
+)
+"""
+
+CTX = {"name": ["John", "Mary", "Jack", "Zoë"]}
+
+
+def test_writer_for_text_stream() -> None:
+    out = io.StringIO()
+    write = writer_for(out)
+    write("hello")
+    write(" zoë")
+    assert "hello zoë" == out.getvalue()
+
+
+def test_writer_for_bytearray() -> None:
+    out = bytearray()
+    write = writer_for(out, encoding="utf-8")
+    write("hello")
+    write(" zoë")
+    assert "hello zoë".encode("utf-8") == out
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_dump_to_text_stream(chunk_size: int) -> None:
+    grammar = make(GRAMMAR)
+    expected = grammar.generate_many("greeting", 50, CTX, rng=11)
+
+    out = io.StringIO()
+    dump(grammar, "greeting", 50, out, CTX, rng=11, chunk_size=chunk_size)
+    assert expected == out.getvalue().splitlines()
+    assert out.getvalue().endswith("!\n")
+
+
+def test_dump_to_bytearray() -> None:
+    program = compile_grammar(make(GRAMMAR))
+    expected = program.generate_many("greeting", 20, CTX, rng=2)
+
+    out = bytearray()
+    dump(program, "greeting", 20, out, CTX, rng=2, chunk_size=3)
+    assert expected == out.decode("utf-8").splitlines()
+
+
+def test_dump_to_file(tmp_path) -> None:
+    grammar = make(GRAMMAR, rng=4)
+    expected = make(GRAMMAR, rng=4).generate_many("greeting", 100, CTX)
+
+    path = tmp_path / "out.txt"
+    dump(grammar, "greeting", 100, str(path), CTX)
+    assert expected == path.read_text(encoding="utf-8").splitlines()
+
+
+def test_dump_rejects_invalid_chunk_size() -> None:
+    with pytest.raises(ValueError):
+        dump(make(GRAMMAR), "greeting", 10, io.StringIO(), CTX, chunk_size=0)
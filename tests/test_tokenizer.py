@@ -70,41 +70,65 @@ def test_validate_alpha(in_str: str, expected: bool):
 @pytest.mark.parametrize(
     "in_str,expected_head,expected_tail",
     [
-        ("hello world", "hello", list(" world")),
-        ("hello_world there", "hello_world", list(" there")),
-        ("hello_world", "hello_world", []),
+        ("hello world", "hello", " world"),
+        ("hello_world there", "hello_world", " there"),
+        ("hello_world", "hello_world", ""),
     ],
 )
 def test_extract_string(in_str: str, expected_head: str, expected_tail: str):
-    head, tail = extract_string(in_str)
+    head, position = extract_string(in_str)
     assert expected_head == head
-    assert expected_tail == tail
+    assert expected_tail == in_str[position:]
 
 
 @pytest.mark.parametrize(
     "in_str,expected_head,expected_tail",
     [
-        ("145hello world", "145", list("hello world")),
-        ("14.38hello world", "14", list(".38hello world")),
+        ("145hello world", "145", "hello world"),
+        ("14.38hello world", "14", ".38hello world"),
     ],
 )
 def test_extract_integer(in_str: str, expected_head: str, expected_tail: str) -> None:
-    head, tail = extract_integer(in_str)
+    head, position = extract_integer(in_str)
     assert expected_head == head
-    assert expected_tail == tail
+    assert expected_tail == in_str[position:]
 
 
 @pytest.mark.parametrize(
     "in_str,expected_head,expected_tail",
     [
-        ('hello world" hello hello', "hello world", list(" hello hello")),
-        ("hello world", "hello world", []),
+        ('hello world" hello hello', "hello world", " hello hello"),
+        ("hello world", "hello world", ""),
     ],
 )
 def test_extract_literal(in_str: str, expected_head: str, expected_tail: str):
-    head, tail = extract_literal(in_str)
+    head, position = extract_literal(in_str)
     assert expected_head == head
-    assert expected_tail == tail
+    assert expected_tail == in_str[position:]
+
+
+@pytest.mark.parametrize(
+    "extract_fn,in_str,start,expected_head,expected_tail",
+    [
+        (extract_string, '$hello "world"', 1, "hello", ' "world"'),
+        (extract_integer, "(repeat 42 a)", 8, "42", " a)"),
+        (extract_literal, '("hello" "world")', 2, "hello", ' "world")'),
+    ],
+)
+def test_extract_from_offset(
+    extract_fn: Any, in_str: str, start: int, expected_head: str, expected_tail: str
+) -> None:
+    head, position = extract_fn(in_str, start)
+    assert expected_head == head
+    assert expected_tail == in_str[position:]
+
+
+@pytest.mark.parametrize(
+    "extract_fn", [extract_string, extract_integer, extract_literal]
+)
+def test_extract_raises_on_eof(extract_fn: Any) -> None:
+    with pytest.raises(SyntaxError):
+        extract_fn("hello", 5)
 
 
 @pytest.mark.parametrize(
@@ -156,6 +180,15 @@ def test_extract_literal(in_str: str, expected_head: str, expected_tail: str):
                 Token(TokenType.ParenClose),
             ],
         ),
+        (
+            "(unique repeat)",
+            [
+                Token(TokenType.ParenOpen),
+                Token(TokenType.Function, Function.Unique),
+                Token(TokenType.Function, Function.Repeat),
+                Token(TokenType.ParenClose),
+            ],
+        ),
         (
             "(145)",
             [
@@ -186,3 +219,14 @@ def test_tokenize_raises_syntax_error():
     ]
 
     assert expected_tokens == tokens
+
+
+def test_tokenize_large_input():
+    entity = '(entity e "hello" $name [world] (any a b) (repeat 3 "x"))\n'
+    n_entities = 5000
+
+    tokens = list(tokenize(f"(grammar\n{entity * n_entities})"))
+
+    # 19 tokens per entity, plus the grammar's own 3 tokens.
+    assert len(tokens) == 19 * n_entities + 3
+    assert tokens[-1] == Token(TokenType.ParenClose)
@@ -0,0 +1,225 @@
+from txtgen import nodes
+from txtgen.interpreter import make
+from txtgen.sampling import AliasTable
+from txtgen.vm import (
+    CALL,
+    EMIT,
+    EVAL,
+    HALT,
+    JUMP,
+    LOOP,
+    MAYBE,
+    PICK,
+    PICK_WEIGHTED,
+    REPEAT,
+    RETURN,
+    Compiler,
+    compile_grammar,
+)
+
+import random
+
+import pytest
+
+GRAMMAR = """
+(grammar
+    (macro sentence (body) body ".")
+    (entity greeting<sentence> ((any "Hello" "Hi" "Hey") ["there"] "," $name))
+    (entity farewell "Goodbye" [(any "my" "dear")] (repeat 2 "old") friend "!")
+    (entity friend (any 3 "pal" "buddy" (if $a=$b "mate" "chum")))
+    (entity story greeting farewell)
+)
+"""
+
+
+@pytest.mark.parametrize(
+    "node,expected_code",
+    [
+        (nodes.LiteralNode("a"), [(EMIT, "a")]),
+        (nodes.LiteralNode(""), []),
+        (
+            nodes.ListNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+            [(EMIT, "a"), (EMIT, "b")],
+        ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")]),
+            [(PICK, (2, 4)), (EMIT, "a"), (JUMP, 6), (EMIT, "b"), (JUMP, 6)],
+        ),
+        (
+            nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1]),
+            [
+                (PICK_WEIGHTED, ((2, 4), AliasTable([3, 1]))),
+                (EMIT, "a"),
+                (JUMP, 6),
+                (EMIT, "b"),
+                (JUMP, 6),
+            ],
+        ),
+        (
+            nodes.OptionalNode(nodes.LiteralNode("a")),
+            [(MAYBE, 3), (EMIT, "a")],
+        ),
+        (
+            nodes.RepeatNode(2, nodes.LiteralNode("a")),
+            [(REPEAT, 2), (EMIT, "a"), (LOOP, 2)],
+        ),
+        (nodes.RepeatNode(1, nodes.LiteralNode("a")), [(EMIT, "a")]),
+        (nodes.RepeatNode(0, nodes.LiteralNode("a")), []),
+        (nodes.ParameterNode("p", nodes.LiteralNode("a")), [(EMIT, "a")]),
+        (nodes.PlaceholderNode("a"), [(EVAL, nodes.PlaceholderNode("a"))]),
+    ],
+)
+def test_compile_node(node: nodes.Node, expected_code: list) -> None:
+    compiler = Compiler()
+    compiler.compile_node(node)
+    assert [(HALT, None)] + expected_code == compiler.code
+
+
+def test_compile_node_precomputes_choice_tables(monkeypatch) -> None:
+    stale = nodes.AnyNode(
+        [nodes.LiteralNode("a"), nodes.LiteralNode("b")], [3, 1], AliasTable([1, 1, 1])
+    )
+    grammar = nodes.Grammar({"e": nodes.EntityNode("e", [stale])}, {})
+
+    program = compile_grammar(grammar)
+    assert [(PICK_WEIGHTED, ((2, 4), AliasTable([3, 1])))] == [
+        instruction for instruction in program.code if instruction[0] == PICK_WEIGHTED
+    ]
+
+    def build_table(*args, **kwargs) -> None:
+        raise AssertionError("choice table built while generating")
+
+    # Batches reuse the tables of the program.
+    monkeypatch.setattr(AliasTable, "__init__", build_table)
+    assert {"a", "b"} >= set(program.generate_many("e", 50, rng=1))
+
+
+def test_compile_node_raises_on_unresolved_reference() -> None:
+    with pytest.raises(TypeError):
+        Compiler().compile_node(nodes.ReferenceNode("a"))
+
+
+def test_compile_shared_entity_once() -> None:
+    shared = nodes.EntityNode("shared", [nodes.LiteralNode("a")])
+    grammar = nodes.Grammar(
+        {
+            "shared": shared,
+            "root": nodes.EntityNode("root", [shared, shared]),
+        },
+        {},
+    )
+
+    program = compile_grammar(grammar)
+    shared_address = program.entry_points["shared"]
+
+    assert program.code[shared_address : shared_address + 2] == [
+        (EMIT, "a"),
+        (RETURN, None),
+    ]
+    root_address = program.entry_points["root"]
+    assert program.code[root_address : root_address + 3] == [
+        (CALL, shared_address),
+        (CALL, shared_address),
+        (RETURN, None),
+    ]
+    assert "aa" == program.generate("root")
+
+
+def test_compile_shared_node_once() -> None:
+    shared = nodes.AnyNode([nodes.LiteralNode("a"), nodes.LiteralNode("b")])
+    grammar = nodes.Grammar({"root": nodes.EntityNode("root", [shared, shared])}, {})
+
+    program = compile_grammar(grammar)
+    assert 1 == sum(1 for op, _ in program.code if op == PICK)
+    assert 2 == sum(1 for op, _ in program.code if op == CALL)
+    assert grammar.generate_many("root", 50, rng=2) == program.generate_many(
+        "root", 50, rng=2
+    )
+
+
+def test_compile_nested_repeats() -> None:
+    src = '(grammar (entity a (repeat 100 (repeat 100 (repeat 10 (any "a" "b"))))))'
+    grammar = make(src)
+
+    program = compile_grammar(grammar)
+    assert len(program) < 1_000
+    assert grammar.generate("a", rng=3) == program.generate("a", rng=3)
+
+
+def test_compile_recursive_entity() -> None:
+    grammar = make('(grammar (entity loop "a" [loop]))')
+    program = compile_grammar(grammar)
+
+    for _ in range(100):
+        assert set(program.generate("loop").split()) == {"a"}
+
+
+@pytest.mark.parametrize("entity", ["greeting", "farewell", "friend", "story"])
+def test_program_matches_tree_walker(entity: str) -> None:
+    grammar = make(GRAMMAR)
+    program = compile_grammar(grammar)
+    ctx = {"name": ["John", "Mary", "Jack"], "a": ["x", "y"], "b": "x"}
+
+    tree_rng, vm_rng = random.Random(1234), random.Random(1234)
+    expected = [grammar.generate(entity, ctx, rng=tree_rng) for _ in range(200)]
+    assert expected == [program.generate(entity, ctx, rng=vm_rng) for _ in range(200)]
+
+
+def test_program_matches_tree_walker_bound_context() -> None:
+    ctx = {"name": ["John", "Mary", "Jack"], "a": "x", "b": "x"}
+    grammar = make(GRAMMAR, ctx)
+    program = compile_grammar(grammar)
+
+    tree_rng, vm_rng = random.Random(7), random.Random(7)
+    expected = [grammar.generate("story", rng=tree_rng) for _ in range(200)]
+    assert expected == [program.generate("story", rng=vm_rng) for _ in range(200)]
+
+
+def test_program_generate_many_matches_generate() -> None:
+    program = compile_grammar(make(GRAMMAR))
+    ctx = {"name": ["John", "Mary", "Jack"], "a": ["x", "y"], "b": "x"}
+
+    rng = random.Random(42)
+    expected = [program.generate("story", ctx, rng=rng) for _ in range(50)]
+
+    assert expected == program.generate_many("story", 50, ctx, rng=42)
+    assert expected == list(program.generate_many("story", 50, ctx, lazy=True, rng=42))
+
+
+def test_program_write_many_matches_generate_many() -> None:
+    program = compile_grammar(make(GRAMMAR))
+    ctx = {"name": ["John", "Mary", "Jack"], "a": ["x", "y"], "b": "x"}
+    expected = program.generate_many("story", 30, ctx, rng=8)
+
+    out: list = []
+    program.write_many("story", 30, out.append, ctx, rng=8, separator="|")
+    assert "".join(f"{value}|" for value in expected) == "".join(out)
+
+    out = []
+    program.emit("story", out.append, ctx, rng=8)
+    assert expected[0] == "".join(out)
+
+
+def test_program_inherits_grammar_rng() -> None:
+    ctx = {"name": ["John", "Mary", "Jack"], "a": ["x", "y"], "b": "x"}
+
+    expected = make(GRAMMAR, rng=7).generate_many("story", 20, ctx)
+    program = compile_grammar(make(GRAMMAR, rng=7))
+    assert expected == program.generate_many("story", 20, ctx)
+
+
+def test_program_disassemble() -> None:
+    program = compile_grammar(make('(grammar (entity a "x" [","]))'))
+    listing = program.disassemble().splitlines()
+
+    assert len(program) == len(listing)
+    assert listing[1].startswith("a:")
+    assert listing[1].endswith("EMIT    ' x'")
+    assert " MAYBE " in listing[2]
+
+
+def test_program_unique_matches_tree_walker() -> None:
+    src = '(grammar (entity a "pick" (unique (any "x" "y" "z") ["!"]) (any "a" "b")))'
+
+    expected = make(src).generate_many("a", 20, rng=6)
+    assert expected == compile_grammar(make(src)).generate_many("a", 20, rng=6)
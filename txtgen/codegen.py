@@ -0,0 +1,492 @@
+from txtgen import nodes
+from txtgen.context import Context, ContextLike, as_context
+from txtgen.nodes import RandomSource, Write, make_rng
+from txtgen.optimizer import get_children
+from txtgen.serialization import dumps
+
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+import importlib.util
+import os
+import random
+
+# Nodes generated through the tree walker: runtime context lookups, stateful sampling and compact value stores.
+# They are embedded in the generated module in the binary grammar format.
+EMBEDDED_NODES = (
+    nodes.ConditionNode,
+    nodes.UniqueNode,
+    nodes.ValueTableNode,
+    nodes.WordListNode,
+)
+
+# Expressions nested deeper than this are moved to their own function, to stay within the limits of the Python
+# compiler on deeply nested grammars.
+MAX_DEPTH = 16
+
+EntityFunction = Callable[[Optional[Context], random.Random], str]
+
+HEADER = '''"""
+Generated by txtgen.codegen from an optimized grammar. Do not edit.
+"""
+
+from txtgen import nodes as _nodes
+from txtgen.sampling import AliasTable as _AliasTable
+from txtgen.serialization import loads as _loads
+
+_BRANCHES = _nodes.OPTIONAL_BRANCHES
+'''
+
+
+class SourceCompiler:
+    """
+    Lowers an optimized generation graph to Python source, with one function per entity. Literals are inlined as
+    constants, `any` nodes pick from a tuple of branch functions (or of strings, if every branch is a literal),
+    optionals are a single conditional expression. The generated functions draw the same random numbers as the tree
+    walker.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self._definitions: List[str] = []
+        self._constants: List[str] = []
+
+        # Name of every compiled function or constant, by id of its node.
+        self._names: Dict[int, str] = {}
+        self._n_names = 0
+
+        self._pending: List[Tuple[str, nodes.Node]] = []
+        self._embedded: List[Tuple[str, nodes.Node]] = []
+
+        # Number of parents of every node, by id: nodes with several parents are compiled once, to a function.
+        self._references: Counter = Counter()
+
+    def _count_references(self, roots: List[nodes.EntityNode]) -> None:
+        seen = set()
+        stack: List[nodes.Node] = list(roots)
+
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+
+            seen.add(id(node))
+            if isinstance(node, EMBEDDED_NODES):
+                continue
+
+            for child in get_children(node):
+                if child is not None:
+                    self._references[id(child)] += 1
+                    stack.append(child)
+
+    def _name(self, prefix: str) -> str:
+        self._n_names += 1
+        return f"_{prefix}{self._n_names - 1}"
+
+    def _function(self, node: nodes.Node) -> str:
+        """
+        Compiles a node to a function, once.
+        Args:
+            node (nodes.Node): The node.
+
+        Returns:
+            The name of the function.
+        """
+        if id(node) not in self._names:
+            name = self._name("e" if isinstance(node, nodes.EntityNode) else "f")
+            self._names[id(node)] = name
+            self._pending.append((name, node))
+
+        return self._names[id(node)]
+
+    def _embed(self, node: nodes.Node) -> str:
+        if id(node) not in self._names:
+            name = self._name("n")
+            self._names[id(node)] = name
+            self._embedded.append((name, node))
+
+        return self._names[id(node)]
+
+    def _callable(self, node: nodes.Node) -> str:
+        """
+        Names a function generating a node, called with `(ctx, rng)`.
+        Args:
+            node (nodes.Node): The node.
+
+        Returns:
+            The name of the function.
+        """
+        if isinstance(node, nodes.PlaceholderNode):
+            if id(node) not in self._names:
+                self._names[id(node)] = self._constant(
+                    "p", f"_nodes.PlaceholderNode({node.key!r}).generate"
+                )
+            return self._names[id(node)]
+
+        if isinstance(node, EMBEDDED_NODES):
+            return self._embed(node)
+
+        return self._function(node)
+
+    def _constant(self, prefix: str, value: str) -> str:
+        name = self._name(prefix)
+        self._constants.append(f"{name} = {value}")
+        return name
+
+    def _join(self, children: Sequence[Optional[nodes.Node]], depth: int) -> str:
+        parts = [
+            part
+            for part in (
+                self.expression(child, depth + 1)
+                for child in children
+                if child is not None
+            )
+            if part != repr("")
+        ]
+
+        if not parts:
+            return repr("")
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            return f"{parts[0]} + {parts[1]}"
+        return f"''.join(({', '.join(parts)}))"
+
+    def expression(self, node: Optional[nodes.Node], depth: int = 0) -> str:
+        """
+        Compiles a node to a Python expression evaluating to its generated text. The expression reads the generation
+        context from `ctx` and draws from `rng`.
+        Args:
+            node (Optional[nodes.Node]): The node to compile.
+            depth (int): The nesting depth of the expression.
+
+        Returns:
+            The expression.
+        """
+        if node is None:
+            return repr("")
+
+        if isinstance(node, nodes.LiteralNode):
+            return repr(node.value)
+
+        if isinstance(node, (nodes.PlaceholderNode,) + EMBEDDED_NODES):
+            return f"{self._callable(node)}(ctx, rng)"
+
+        if not isinstance(
+            node,
+            (
+                nodes.EntityNode,
+                nodes.ListNode,
+                nodes.AnyNode,
+                nodes.OptionalNode,
+                nodes.RepeatNode,
+                nodes.ParameterNode,
+            ),
+        ):
+            raise TypeError(f"cannot compile node of type {node.type}")
+
+        if (
+            isinstance(node, nodes.EntityNode)
+            or self._references[id(node)] > 1
+            or depth > MAX_DEPTH
+        ):
+            return f"{self._function(node)}(ctx, rng)"
+
+        return self.inline(node, depth)
+
+    def inline(self, node: nodes.Node, depth: int) -> str:
+        """
+        Compiles the body of a node to a Python expression.
+        Args:
+            node (nodes.Node): The node to compile.
+            depth (int): The nesting depth of the expression.
+
+        Returns:
+            The expression.
+        """
+        if isinstance(node, (nodes.EntityNode, nodes.ListNode)):
+            return self._join(node.children, depth)
+
+        if isinstance(node, nodes.LiteralNode):
+            return repr(node.value)
+
+        if isinstance(node, nodes.ParameterNode):
+            return self.expression(node.value, depth)
+
+        if isinstance(node, nodes.OptionalNode):
+            # The expression is only evaluated (and only draws) once the branch is picked, as in the tree walker.
+            expression = self.expression(node.expression, depth + 1)
+            return f"({expression} if rng.choice(_BRANCHES) else '')"
+
+        if isinstance(node, nodes.RepeatNode):
+            expression = self.expression(node.expression, depth + 1)
+            return f"''.join([{expression} for _ in range({node.n_repeat})])"
+
+        return self._any(cast(nodes.AnyNode, node))
+
+    def _any(self, node: nodes.AnyNode) -> str:
+        branches = [cast(nodes.Node, child) for child in node.children]
+
+        if all(isinstance(branch, nodes.LiteralNode) for branch in branches):
+            # Every branch is a constant: the text itself is picked.
+            values = tuple(cast(nodes.LiteralNode, branch).value for branch in branches)
+            choices = self._constant("a", repr(values))
+            call = ""
+        else:
+            functions = ", ".join(self._callable(branch) for branch in branches)
+            choices = self._constant("a", f"({functions},)")
+            call = "(ctx, rng)"
+
+        if node.weights is None:
+            return f"rng.choice({choices}){call}"
+
+        table = self._constant("t", f"_AliasTable({list(node.weights)!r}).sample")
+        return f"{choices}[{table}(rng)]{call}"
+
+    def compile(self, grammar: nodes.Grammar) -> str:
+        """
+        Compiles a grammar to the source of a Python module. The module defines `ENTITIES`, the function generating
+        every entity, by name.
+        Args:
+            grammar (nodes.Grammar): The optimized grammar.
+
+        Returns:
+            The module source.
+        """
+        entities = list(grammar.entities.values())
+        self._count_references(entities)
+        entry_points = {
+            name: self._function(entity) for name, entity in grammar.entities.items()
+        }
+
+        # Compiling a function may queue more functions.
+        for name, node in self._pending:
+            self._definitions.append(
+                f"def {name}(ctx, rng):\n    return {self.inline(node, 0)}\n"
+            )
+
+        lines = [HEADER]
+
+        if self._embedded:
+            # The embedded nodes are shipped as a grammar holding one entity per node.
+            embedded = nodes.Grammar(
+                {name: nodes.EntityNode(name, [node]) for name, node in self._embedded},
+                {},
+            )
+            lines.append(f"_EMBEDDED = _loads({dumps(embedded)!r}).entities")
+            lines.extend(
+                f"{name} = _EMBEDDED[{name!r}].children[0].generate"
+                for name, _ in self._embedded
+            )
+            lines.append("")
+
+        lines.extend(self._definitions)
+        lines.extend(self._constants)
+        lines.append(
+            "\nENTITIES = {\n"
+            + "".join(
+                f"    {name!r}: {entry},\n" for name, entry in entry_points.items()
+            )
+            + "}\n"
+        )
+
+        return "\n".join(lines)
+
+
+class CompiledGrammar:
+    """
+    A grammar compiled to a Python module. Generates exactly the same outputs as the grammar it was compiled from.
+    """
+
+    def __init__(
+        self, source: str, rng: RandomSource = None, filename: str = "<txtgen>"
+    ) -> None:
+        """
+        Constructor.
+        Args:
+            source (str): The module source, built by `SourceCompiler`.
+            rng (RandomSource): Default random source of the grammar. Uses the global generator if not set.
+            filename (str): The file name reported in tracebacks.
+        """
+        self.source = source
+        self.rng: Optional[random.Random] = make_rng(rng) if rng is not None else None
+
+        namespace: Dict[str, Any] = {"__name__": "txtgen.codegen.generated"}
+        exec(compile(source, filename, "exec"), namespace)
+        self.entities: Dict[str, EntityFunction] = namespace["ENTITIES"]
+
+    @classmethod
+    def from_module(cls, module: Any, rng: RandomSource = None) -> "CompiledGrammar":
+        """
+        Wraps an imported module written by `write_module`, without compiling its source again.
+        Args:
+            module (Any): The imported module.
+            rng (RandomSource): Default random source of the grammar.
+
+        Returns:
+            The compiled grammar.
+        """
+        compiled = cls.__new__(cls)
+        with open(module.__file__, encoding="utf-8") as infile:
+            compiled.source = infile.read()
+        compiled.rng = make_rng(rng) if rng is not None else None
+        compiled.entities = module.ENTITIES
+        return compiled
+
+    def __reduce__(self) -> Tuple[type, Tuple[str, Optional[random.Random]]]:
+        # Functions cannot be pickled: other processes compile the source again.
+        return CompiledGrammar, (self.source, self.rng)
+
+    def generate(
+        self, entity_name: str, ctx: ContextLike = None, rng: RandomSource = None
+    ) -> str:
+        """
+        Generates a value for a specific entity.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the grammar.
+
+        Returns:
+            The generated entity.
+        """
+        generator = make_rng(rng if rng is not None else self.rng)
+        return self.entities[entity_name](as_context(ctx), generator).strip()
+
+    def generate_many(
+        self,
+        entity_name: str,
+        n: int,
+        ctx: ContextLike = None,
+        lazy: bool = False,
+        rng: RandomSource = None,
+    ) -> Union[List[str], Iterator[str]]:
+        """
+        Generates a batch of values for a specific entity.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            ctx (ContextLike): The generation context.
+            lazy (bool): Return an iterator generating values on demand instead of a list.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the grammar.
+
+        Returns:
+            The generated entities.
+        """
+        function = self.entities[entity_name]
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+
+        generations = (function(new_context, generator).strip() for _ in range(n))
+        return generations if lazy else list(generations)
+
+    def emit(
+        self,
+        entity_name: str,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+    ) -> None:
+        """
+        Streams a value for a specific entity to a writer.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            write (Write): The writer receiving the value.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the grammar.
+        """
+        self.write_many(entity_name, 1, write, ctx, rng, separator="")
+
+    def write_many(
+        self,
+        entity_name: str,
+        n: int,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+        separator: str = "\n",
+    ) -> None:
+        """
+        Streams a batch of values for a specific entity to a writer, each value followed by a separator.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            write (Write): The writer receiving the values.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the grammar.
+            separator (str): Written after every value.
+        """
+        for value in self.generate_many(entity_name, n, ctx, lazy=True, rng=rng):
+            write(value)
+            if separator:
+                write(separator)
+
+
+def generate_source(grammar: nodes.Grammar) -> str:
+    """
+    Compiles an optimized grammar to the source of a Python module.
+    Args:
+        grammar (nodes.Grammar): The grammar to compile.
+
+    Returns:
+        The module source.
+    """
+    return SourceCompiler().compile(grammar)
+
+
+def compile_grammar(grammar: nodes.Grammar) -> CompiledGrammar:
+    """
+    Compiles an optimized grammar to Python functions.
+    Args:
+        grammar (nodes.Grammar): The grammar to compile.
+
+    Returns:
+        The compiled grammar.
+    """
+    return CompiledGrammar(generate_source(grammar), grammar.rng)
+
+
+def write_module(grammar: nodes.Grammar, path: str) -> None:
+    """
+    Compiles an optimized grammar to a Python module file. Importing the module (or loading it with `load_module`)
+    caches its bytecode like any other module, so it loads without being compiled again.
+    Args:
+        grammar (nodes.Grammar): The grammar to compile.
+        path (str): The path of the `.py` file to write.
+    """
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write(generate_source(grammar))
+
+
+def load_module(path: str, rng: RandomSource = None) -> CompiledGrammar:
+    """
+    Loads a module written by `write_module`, through the regular import machinery: its bytecode is cached in
+    `__pycache__`.
+    Args:
+        path (str): The path of the `.py` file.
+        rng (RandomSource): Default random source of the grammar.
+
+    Returns:
+        The compiled grammar.
+    """
+    name = "txtgen_generated_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot load {path}")  # pragma: nocover
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return CompiledGrammar.from_module(module, rng)
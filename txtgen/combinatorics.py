@@ -0,0 +1,199 @@
+from txtgen import nodes
+from txtgen.optimizer import get_children
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class OutputSpace:
+    """
+    Counts and indexes the derivations of an optimized graph.
+
+    A derivation is one outcome of every random choice made while generating a node: which branch of every `any`,
+    whether every optional is taken. Derivations are numbered from 0, in lexicographic order of their choices: the
+    branches of an `any` in the order they are written, an omitted optional before a taken one, the choices of the
+    first child of a list before the choices of the next ones. Distinct derivations may still produce the same text.
+
+    Counts are memoized, so counting and unranking many derivations of the same graph only walks it once.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        # Number of derivations of every counted node, by id.
+        self._counts: Dict[int, int] = {}
+
+        # Cumulative derivation counts of the branches of every unranked AnyNode, by id.
+        self._offsets: Dict[int, List[int]] = {}
+
+        # Keeps the counted nodes alive, so that their ids cannot be reused.
+        self._counted_nodes: List[nodes.Node] = []
+
+    def __reduce__(self) -> Tuple[type, Tuple[()]]:
+        # The memoized counts are keyed by id: copies (and pickles shipped to other processes) start empty.
+        return OutputSpace, ()
+
+    def count(self, node: nodes.Node) -> int:
+        """
+        Counts the derivations of a node.
+        Args:
+            node (nodes.Node): The node.
+
+        Returns:
+            The number of derivations.
+        """
+        counts = self._counts
+        if id(node) in counts:
+            return counts[id(node)]
+
+        # Nodes whose children are being counted: meeting one of them again means the graph is recursive.
+        active: Set[int] = set()
+        stack: List[Tuple[nodes.Node, bool]] = [(node, False)]
+
+        while stack:
+            current, expanded = stack.pop()
+            key = id(current)
+
+            if expanded:
+                active.discard(key)
+                counts[key] = self._combine(current)
+                self._counted_nodes.append(current)
+                continue
+
+            if key in counts:
+                continue
+
+            if key in active:
+                name = getattr(current, "name", current.type)
+                raise ValueError(
+                    f"{name} is recursive: its number of derivations is infinite"
+                )
+
+            if isinstance(current, (nodes.ConditionNode, nodes.PlaceholderNode)):
+                raise ValueError(
+                    f"cannot count the derivations of a {current.type}, which depends on the generation context: "
+                    "bind the context when building the grammar"
+                )
+
+            active.add(key)
+            stack.append((current, True))
+            stack.extend(
+                (child, False)
+                for child in get_children(current)
+                if child is not None and id(child) not in counts
+            )
+
+        return counts[id(node)]
+
+    def _combine(self, node: nodes.Node) -> int:
+        counts = self._counts
+
+        if isinstance(node, nodes.LiteralNode):
+            return 1
+
+        if isinstance(node, nodes.ValueTableNode):
+            return len(node)
+
+        if isinstance(node, nodes.WordListNode):
+            return len(node.words)
+
+        if isinstance(node, (nodes.EntityNode, nodes.ListNode, nodes.UniqueNode)):
+            total = 1
+            for child in node.children:
+                if child is not None:
+                    total *= counts[id(child)]
+            return total
+
+        if isinstance(node, nodes.AnyNode):
+            return sum(counts[id(child)] for child in node.children)
+
+        if isinstance(node, nodes.OptionalNode):
+            if node.expression is None:
+                return 1
+            return 1 + counts[id(node.expression)]
+
+        if isinstance(node, nodes.RepeatNode):
+            return counts[id(node.expression)] ** node.n_repeat
+
+        if isinstance(node, nodes.ParameterNode):
+            return counts[id(node.value)] if node.value is not None else 1
+
+        raise TypeError(f"cannot count the derivations of a {node.type}")
+
+    def _branch_offsets(self, node: nodes.AnyNode) -> List[int]:
+        offsets = self._offsets.get(id(node))
+
+        if offsets is None:
+            offsets = [0]
+            for child in node.children:
+                offsets.append(offsets[-1] + self._counts[id(child)])
+            self._offsets[id(node)] = offsets
+
+        return offsets
+
+    def unrank(self, node: nodes.Node, index: int) -> str:
+        """
+        Builds a derivation of a node from its index, in time proportional to the size of the derivation.
+        Args:
+            node (nodes.Node): The node.
+            index (int): The index of the derivation, between 0 and `count(node) - 1`.
+
+        Returns:
+            The raw (unstripped) text of the derivation.
+        """
+        total = self.count(node)
+        if not 0 <= index < total:
+            raise IndexError(
+                f"derivation index {index} out of range for {total} derivations"
+            )
+
+        counts = self._counts
+        out: List[str] = []
+
+        # Nodes are expanded in generation order: the children of a node are pushed last to first.
+        stack: List[Tuple[Optional[nodes.Node], int]] = [(node, index)]
+
+        while stack:
+            current, index = stack.pop()
+
+            if current is None:
+                continue
+
+            if isinstance(current, nodes.LiteralNode):
+                out.append(current.value)
+
+            elif isinstance(current, (nodes.ValueTableNode, nodes.WordListNode)):
+                out.append(current[index])
+
+            elif isinstance(
+                current, (nodes.EntityNode, nodes.ListNode, nodes.UniqueNode)
+            ):
+                # The first child is the most significant digit of the index.
+                for child in reversed(current.children):
+                    if child is not None:
+                        index, digit = divmod(index, counts[id(child)])
+                        stack.append((child, digit))
+
+            elif isinstance(current, nodes.AnyNode):
+                offsets = self._branch_offsets(current)
+                branch = bisect_right(offsets, index) - 1
+                stack.append((current.children[branch], index - offsets[branch]))
+
+            elif isinstance(current, nodes.OptionalNode):
+                if index:
+                    stack.append((current.expression, index - 1))
+
+            elif isinstance(current, nodes.RepeatNode):
+                expression_count = counts[id(current.expression)]
+                for _ in range(current.n_repeat):
+                    index, digit = divmod(index, expression_count)
+                    stack.append((current.expression, digit))
+
+            elif isinstance(current, nodes.ParameterNode):
+                stack.append((current.value, index))
+
+            else:
+                raise TypeError(f"cannot unrank a {current.type}")
+
+        return "".join(out)
@@ -44,3 +44,4 @@ class Function(Enum):
     Any = "any"
     If = "if"
     Repeat = "repeat"
+    Unique = "unique"
@@ -1,9 +1,200 @@
-from typing import Any, Dict, List, cast
+from txtgen.sampling import AliasTable, Weight
+
+from array import array
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+import mmap
+import os
+import struct
+import sys
+
+# Default suffix of the line index of a word list.
+INDEX_SUFFIX = ".idx"
+
+# Line offsets are stored as little-endian, unsigned 64-bit integers.
+OFFSET = struct.Struct("<Q")
+LINE_SPAN = struct.Struct("<2Q")
+
+# Number of offsets buffered while building an index.
+INDEX_CHUNK = 1 << 16
+
+
+class Weighted:
+    """
+    A context value associating every value with a relative weight, e.g. `Weighted({"John": 3, "Mary": 1})`.
+    Placeholders bound to a weighted value pick values proportionally to their weight.
+    """
+
+    __slots__ = ("weights",)
+
+    def __init__(self, weights: Mapping[Any, Weight]) -> None:
+        """
+        Constructor.
+        Args:
+            weights (Mapping[Any, Weight]): The weight of every value.
+        """
+        self.weights = dict(weights)
+
+    def __repr__(self) -> str:
+        return f"Weighted({self.weights!r})"
+
+
+def _map(path: str) -> Union[mmap.mmap, bytes]:
+    with open(path, "rb") as infile:
+        # Empty files cannot be mapped.
+        if not os.fstat(infile.fileno()).st_size:
+            return b""
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_offsets(outfile: BinaryIO, offsets: array) -> None:
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    outfile.write(offsets.tobytes())
+
+
+class WordList(Sequence[str]):
+    """
+    A context value holding the lines of a newline-delimited text file, e.g. `WordList("cities.txt")`. Placeholders
+    bound to a word list pick a line at random.
+
+    The file and its line index are memory-mapped rather than loaded: picking a line reads only that line, and every
+    process reading the same file shares its pages through the OS page cache. Word lists are pickled by path, so they
+    can be shipped to worker processes cheaply.
+    """
+
+    __slots__ = ("path", "index_path", "_text", "_index", "_length")
+
+    def __init__(self, path: str, index_path: str = None) -> None:
+        """
+        Constructor.
+        Args:
+            path (str): The path of the text file, encoded in UTF-8.
+            index_path (Optional[str]): The path of the line index built by `build_index`. Defaults to the path of the
+                text file followed by `.idx`. The index is built if it does not exist.
+        """
+        self.path = os.path.abspath(path)
+        self.index_path = os.path.abspath(index_path or path + INDEX_SUFFIX)
+
+        if not os.path.exists(self.index_path):
+            WordList.build_index(self.path, self.index_path)
+
+        self._text = _map(self.path)
+        self._index = _map(self.index_path)
+
+        # The index holds the start offset of every line, followed by the size of the file.
+        n_offsets, remainder = divmod(len(self._index), OFFSET.size)
+        if (
+            remainder
+            or not n_offsets
+            or OFFSET.unpack_from(self._index, len(self._index) - OFFSET.size)[0]
+            != len(self._text)
+        ):
+            raise ValueError(
+                f"index {self.index_path} does not match {self.path}: rebuild it with WordList.build_index"
+            )
+
+        self._length = n_offsets - 1
+
+    @staticmethod
+    def build_index(path: str, index_path: str = None) -> str:
+        """
+        Builds the line index of a text file, in a single pass over the file.
+        Args:
+            path (str): The path of the text file.
+            index_path (Optional[str]): The path of the index to write. Defaults to the path of the text file followed
+                by `.idx`.
+
+        Returns:
+            The path of the index.
+        """
+        index_path = index_path or path + INDEX_SUFFIX
+        size = os.path.getsize(path)
+
+        with open(path, "rb") as infile, open(index_path, "wb") as outfile:
+            offsets = array("Q", [0] if size else [])
+            position = 0
+
+            for line in infile:
+                position += len(line)
+                if position < size:
+                    offsets.append(position)
+
+                if len(offsets) >= INDEX_CHUNK:
+                    _write_offsets(outfile, offsets)
+                    offsets = array("Q")
+
+            offsets.append(size)
+            _write_offsets(outfile, offsets)
+
+        return index_path
+
+    def __reduce__(self) -> Tuple[type, Tuple[str, str]]:
+        # Memory maps cannot be pickled: other processes map the files again.
+        return WordList, (self.path, self.index_path)
+
+    def __repr__(self) -> str:
+        return f"WordList({self.path!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, WordList):
+            return NotImplemented  # pragma: nocover
+
+        return self.path == other.path and self.index_path == other.index_path
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.index_path))
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        ...  # pragma: nocover
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]:
+        ...  # pragma: nocover
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        """
+        Reads a line.
+        Args:
+            index (Union[int, slice]): The index of the line.
+
+        Returns:
+            The line, without its line break.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("word list index out of range")
+
+        start, end = LINE_SPAN.unpack_from(self._index, index * OFFSET.size)
+        return self._text[start:end].decode("utf-8").rstrip("\r\n")
 
 
 class Context:
     """
     Context is a small wrapper around a dict that allows to fetch values from nested keys in a single call.
+
+    Resolved keys are cached: every key is split, looked up and stringified once, on first access. The cache is reset
+    when `ctx` is replaced; call `invalidate` after mutating the dict in place.
     """
 
     def __init__(self, ctx_dict: Dict[str, Any] = None) -> None:
@@ -14,25 +205,140 @@ class Context:
         """
         self.ctx = ctx_dict if ctx_dict is not None else {}
 
-    def get(self, key: str) -> List[str]:
+    @property
+    def ctx(self) -> Dict[str, Any]:
         """
-        Fetches a (possibly nested) key from the context.
-        Args:
-            key (str): The key to fetch.
+        The context dictionary.
+        """
+        return self._ctx
 
-        Returns:
-            A list of values corresponding to the key.
+    @ctx.setter
+    def ctx(self, ctx_dict: Dict[str, Any]) -> None:
+        self._ctx = ctx_dict
+        self.invalidate()
+
+    def invalidate(self) -> None:
         """
+        Clears the resolved keys.
+        """
+        self._cache: Dict[str, Tuple[Sequence[str], Optional[AliasTable]]] = {}
+
+    def _resolve(self, key: str) -> Tuple[Sequence[str], Optional[AliasTable]]:
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
         split_path = key.split(".")
 
-        current_val: Any = self.ctx
+        current_val: Any = self._ctx
         for path_segment in split_path:
             current_val = current_val[path_segment]
 
-        if not isinstance(current_val, list):
-            current_val = [str(current_val)]
+        table = None
+        values: Sequence[str]
+
+        if isinstance(current_val, WordList):
+            # Word lists are read line by line, never loaded.
+            values = current_val
+
+        elif isinstance(current_val, Weighted):
+            values = tuple(str(item) for item in current_val.weights)
+            if values:
+                table = AliasTable(list(current_val.weights.values()))
+
+        elif not isinstance(current_val, list):
+            values = (str(current_val),)
 
         else:
-            current_val = [str(item) for item in current_val]
+            values = tuple(str(item) for item in current_val)
+
+        self._cache[key] = (values, table)
+        return values, table
+
+    def get(self, key: str) -> Sequence[str]:
+        """
+        Fetches a (possibly nested) key from the context.
+        Args:
+            key (str): The key to fetch.
+
+        Returns:
+            The values corresponding to the key.
+        """
+        return self._resolve(key)[0]
+
+    def get_table(self, key: str) -> Optional[AliasTable]:
+        """
+        Fetches the alias table sampling the values of a key, if the key holds weighted values.
+        Args:
+            key (str): The key to fetch.
+
+        Returns:
+            The alias table, or None if the values of the key are picked uniformly.
+        """
+        return self._resolve(key)[1]
+
+
+ContextLike = Union[Dict[str, Any], Context, None]
+
+
+def as_context(ctx: ContextLike) -> Optional[Context]:
+    """
+    Wraps a context dictionary in a Context. Context objects are returned as-is so that their resolved keys can be
+    reused across calls.
+    Args:
+        ctx (ContextLike): A context dictionary or a Context.
+
+    Returns:
+        The context, or None if the context is empty.
+    """
+    if isinstance(ctx, Context):
+        return ctx
+
+    return Context(ctx) if ctx else None
+
+
+def _freeze(value: Any) -> Hashable:
+    # Keys follow `Context._resolve`: values are keyed by the text they generate.
+    if isinstance(value, dict):
+        # Nested dicts are both walked by key path and rendered whole, in key order.
+        return (
+            dict,
+            str(value),
+            tuple((key, _freeze(item)) for key, item in value.items()),
+        )
+
+    if isinstance(value, list):
+        return list, tuple(str(item) for item in value)
+
+    if isinstance(value, Weighted):
+        return Weighted, tuple(
+            (str(item), type(weight), weight) for item, weight in value.weights.items()
+        )
+
+    if isinstance(value, WordList):
+        return WordList, value
+
+    # Any other value (tuples included) is a single value: `1` and `True` do not generate the same text.
+    return str, str(value)
+
+
+def context_key(ctx: ContextLike) -> Hashable:
+    """
+    Builds a key identifying the content of a context, e.g. to cache the grammars bound to it.
+    Args:
+        ctx (ContextLike): A context dictionary or a Context.
+
+    Returns:
+        A key equal for contexts generating the same values. Contexts whose key cannot be hashed are keyed by
+            identity.
+    """
+    ctx_dict = ctx.ctx if isinstance(ctx, Context) else ctx
+    if not ctx_dict:
+        return None
 
-        return cast(List[str], current_val)
+    # The context itself is only walked by key path: the order of its keys does not matter.
+    try:
+        return frozenset((key, _freeze(item)) for key, item in ctx_dict.items())
+    except TypeError:
+        return id, id(ctx_dict)
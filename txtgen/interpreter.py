@@ -1,15 +1,23 @@
 from txtgen import nodes
 from txtgen.context import Context
-from txtgen.optimizer import optimize
+from txtgen.optimizer import optimize, optimize_lazily
 from txtgen.parser import DescentParser
 
 
-def make(src: str, bind_ctx: dict = None) -> nodes.Grammar:
+def make(
+    src: str,
+    bind_ctx: dict = None,
+    rng: nodes.RandomSource = None,
+    lazy: bool = False,
+) -> nodes.Grammar:
     """
     Parse & optimize a grammar from source code.
     Args:
         src (str): The grammar source.
         bind_ctx (Optional[dict]): The context to bind to the grammar.
+        rng (RandomSource): Default random source of the grammar - a random.Random or a seed.
+        lazy (bool): Only parse the grammar, and optimize every entity (with the entities it references) the first
+            time it is used. Errors in an entity, such as undefined references, are raised on first use.
 
     Returns:
         An optimized grammar object.
@@ -17,4 +25,6 @@ def make(src: str, bind_ctx: dict = None) -> nodes.Grammar:
     ctx = Context(bind_ctx) if bind_ctx else None
 
     p = DescentParser(src)
-    return optimize(p.grammar(), ctx)
+    grammar = (optimize_lazily if lazy else optimize)(p.grammar(), ctx)
+    grammar.rng = nodes.make_rng(rng) if rng is not None else None
+    return grammar
@@ -1,10 +1,120 @@
 from txtgen.constants import PUNCTUATION
-from txtgen.context import Context
-
-from typing import Any, Dict, List, Optional, Tuple, Sequence, cast
+from txtgen.context import Context, ContextLike, WordList, as_context, context_key
+from txtgen.sampling import AliasTable, FeistelPermutation, Weight
+
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Sequence,
+    Set,
+    TYPE_CHECKING,
+    Union,
+    cast,
+)
+
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
 
 import random
 
+if TYPE_CHECKING:
+    from txtgen.combinatorics import OutputSpace  # pragma: nocover
+    from txtgen.optimizer import BindingTemplate  # pragma: nocover
+
+
+RandomSource = Union[random.Random, int, str, bytes, None]
+
+# Number of bound grammars kept by `Grammar.bind`, most recently used first.
+BIND_CACHE_SIZE = 128
+
+# The module-level functions of `random` share a hidden `random.Random` instance, so the module itself can stand in
+# for one. Using it as the default keeps `random.seed()` working for callers that do not pass their own source.
+DEFAULT_RNG = cast(random.Random, random)
+
+# Receives output fragments when streaming: `list.append`, `TextIOBase.write`...
+Write = Callable[[str], Any]
+
+# Mirrors the two branches drawn by OptionalNode.generate: index 0 skips the expression, index 1 evaluates it.
+OPTIONAL_BRANCHES = (False, True)
+
+
+def make_rng(source: RandomSource = None) -> random.Random:
+    """
+    Resolves a random source to a random number generator.
+    Args:
+        source (RandomSource): A random number generator, a seed, or None for the global generator.
+
+    Returns:
+        The random number generator.
+    """
+    if source is None or source is DEFAULT_RNG:
+        return DEFAULT_RNG
+
+    if isinstance(source, random.Random):
+        return source
+
+    return random.Random(source)
+
+
+class StrippedWriter:
+    """
+    Forwards fragments to another writer, dropping the leading and trailing whitespace of the whole stream - the
+    streaming equivalent of `str.strip`.
+    """
+
+    def __init__(self, write: Write) -> None:
+        """
+        Constructor.
+        Args:
+            write (Write): The writer receiving the stripped fragments.
+        """
+        self._write = write
+        self._started = False
+        self._pending = ""
+
+    def __call__(self, fragment: str) -> None:
+        if not self._started:
+            fragment = fragment.lstrip()
+            if not fragment:
+                return
+            self._started = True
+
+        body = fragment.rstrip()
+        if not body:
+            # Whitespace is held back until we know it is not trailing.
+            self._pending += fragment
+            return
+
+        if self._pending:
+            self._write(self._pending)
+            self._pending = ""
+
+        self._write(body)
+        if len(body) != len(fragment):
+            self._pending = fragment[len(body) :]
+
+
+def spaced(value: str) -> str:
+    """
+    Prepends a space to a value, unless it is punctuation. Spaces values without allocating nodes, the same way
+    `sub_punctuation` does.
+    Args:
+        value (str): The value.
+
+    Returns:
+        The spaced value.
+    """
+    return value if value in PUNCTUATION else " " + value
+
 
 def sub_punctuation(node: "LiteralNode") -> "Node":
     """
@@ -20,13 +130,16 @@ def sub_punctuation(node: "LiteralNode") -> "Node":
     return node
 
 
-def exec_condition(node: "ConditionNode", ctx: Context = None) -> "Optional[Node]":
+def exec_condition(
+    node: "ConditionNode", ctx: Context = None, rng: random.Random = DEFAULT_RNG
+) -> "Optional[Node]":
     """
     Tries to execute a condition node with information gathered from context and replace said node by its evaluated
     value.
     Args:
         node (ConditionNode): The node to evaluate.
         ctx (Context): The context object.
+        rng (random.Random): The random number generator.
 
     Returns:
         The processed node.
@@ -34,7 +147,7 @@ def exec_condition(node: "ConditionNode", ctx: Context = None) -> "Optional[Node
     try:
         (left_cond, right_cond) = node.condition
         assert left_cond is not None and right_cond is not None
-        if left_cond.generate(ctx) != right_cond.generate(ctx):
+        if left_cond.generate(ctx, rng) != right_cond.generate(ctx, rng):
             return node.else_expression
         return node.expression
 
@@ -45,34 +158,80 @@ def exec_condition(node: "ConditionNode", ctx: Context = None) -> "Optional[Node
 class Node:
     """
     The base node.
+
+    Nodes declare their fields in `__slots__` to stay compact: optimized grammars can hold millions of them.
     """
 
+    __slots__ = ()
+
+    # The name of the node class, set on every subclass.
+    type: ClassVar[str] = "Node"
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.type = cls.__name__
+
     def __init__(self) -> None:
         """
         Constructor.
         """
-        self.type = self.__class__.__name__
 
     def generate(self, *args, **kwargs) -> str:
         """ Generate returns the value of the node. """
         raise NotImplementedError  # pragma: nocover
 
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        """
+        Streams the value of the node to a writer, fragment by fragment, without building intermediate strings.
+        Draws the same random choices as `generate`.
+        Args:
+            write (Write): The writer receiving the fragments.
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
+        """
+        write(self.generate(ctx, rng))
+
 
 class Grammar(Node):
     """ Represents a context-free grammar. """
 
+    __slots__ = (
+        "entities",
+        "macros",
+        "rng",
+        "_output_space",
+        "_binding_template",
+        "_bindings",
+    )
+
     def __init__(
-        self, entities: Dict[str, "EntityNode"], macros: Dict[str, "MacroNode"]
+        self,
+        entities: MutableMapping[str, "EntityNode"],
+        macros: Dict[str, "MacroNode"],
+        rng: RandomSource = None,
     ) -> None:
         """
         Grammar constructor.
         Args:
-            entities (Dict[str, EntityNode]): Entities defined in the grammar.
+            entities (MutableMapping[str, EntityNode]): Entities defined in the grammar.
             macros (Dict[str, MacroNode]): Macros defined in the grammar.
+            rng (RandomSource): Default random source of the grammar. Uses the global generator if not set.
         """
         super().__init__()
         self.entities = entities
         self.macros = macros
+        self.rng: Optional[random.Random] = make_rng(rng) if rng is not None else None
+
+        # Derivation counts of the grammar, computed on first use.
+        self._output_space: Optional["OutputSpace"] = None
+
+        # Binding template of the grammar, prepared on first use, and the grammars bound from it by context key.
+        self._binding_template: Optional["BindingTemplate"] = None
+        self._bindings: "OrderedDict[Hashable, Tuple[ContextLike, Grammar]]" = (
+            OrderedDict()
+        )
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Grammar):
@@ -80,18 +239,290 @@ class Grammar(Node):
 
         return self.entities == other.entities and self.macros == other.macros
 
-    def generate(self, entity_name: str, ctx: dict = None) -> str:  # type: ignore
+    def dump(self, path: str, source: str = None) -> None:
+        """
+        Writes the grammar to a compact binary file, which loads much faster than the grammar is built from source.
+        Args:
+            path (str): The path of the file to write.
+            source (Optional[str]): The source the grammar was built from. Recorded so that `load` can reject the
+                file once the source changes.
+        """
+        from txtgen import serialization
+
+        serialization.dump(self, path, source)
+
+    @staticmethod
+    def load(path: str, source: str = None, rng: RandomSource = None) -> "Grammar":
+        """
+        Reads a grammar written by `dump`.
+        Args:
+            path (str): The path of the file to read.
+            source (Optional[str]): If set, the file is rejected unless it was built from this source.
+            rng (RandomSource): Default random source of the grammar.
+
+        Returns:
+            The grammar.
+        """
+        from txtgen import serialization
+
+        return serialization.load(path, source, rng)
+
+    def bind(self, ctx: ContextLike) -> "Grammar":
+        """
+        Specializes the grammar for a context: every placeholder of the optimized grammar bound by the context is
+        resolved, along with the conditions and alternatives depending on it. This includes the placeholders of
+        expanded macro bodies, which building the grammar with a context leaves to generation time. Only the parts of
+        the grammar depending on the context are copied: the grammar is parsed and optimized once, and bound to as
+        many contexts as needed. The last bound grammars are cached by context content.
+        Args:
+            ctx (ContextLike): The context to bind.
+
+        Returns:
+            The bound grammar, or the grammar itself if the context is empty. The grammar must not be modified while
+            grammars bound from it are in use.
+        """
+        key = context_key(ctx)
+        if key is None:
+            return self
+
+        cached = self._bindings.get(key)
+        if cached is not None:
+            self._bindings.move_to_end(key)
+            return cached[1]
+
+        if self._binding_template is None:
+            from txtgen.optimizer import BindingTemplate
+
+            self._binding_template = BindingTemplate(self)
+
+        bound = self._binding_template.bind(cast(Context, as_context(ctx)))
+
+        # The context is kept along with the bound grammar: contexts keyed by identity must stay alive.
+        self._bindings[key] = (ctx, bound)
+        if len(self._bindings) > BIND_CACHE_SIZE:
+            self._bindings.popitem(last=False)
+
+        return bound
+
+    def prune(self, roots: Sequence[str]) -> "Grammar":
+        """
+        Removes the entities and macros that cannot be reached from some root entities, to keep only the parts of a
+        large grammar that are generated.
+        Args:
+            roots (Sequence[str]): The names of the entities to keep, along with everything they reference.
+
+        Returns:
+            The grammar itself, pruned in place.
+        """
+        from txtgen.optimizer import prune
+
+        # The cached bindings and counts may hold removed entities.
+        self._output_space = None
+        self._binding_template = None
+        self._bindings.clear()
+
+        return prune(self, roots)
+
+    def _space(self) -> "OutputSpace":
+        if self._output_space is None:
+            from txtgen.combinatorics import OutputSpace
+
+            self._output_space = OutputSpace()
+        return self._output_space
+
+    def count(self, entity_name: str) -> int:
+        """
+        Counts the distinct derivations of an entity: the number of different outcomes of the random choices made
+        while generating it. The context must be bound when building the grammar.
+        Args:
+            entity_name (str): The name of the entity.
+
+        Returns:
+            The number of derivations. Raises ValueError if the entity is recursive (its output space is infinite)
+            or depends on the generation context.
+        """
+        return self._space().count(self.entities[entity_name])
+
+    def unrank(self, entity_name: str, index: int) -> str:
+        """
+        Builds a specific derivation of an entity, in time proportional to its output. Derivations are numbered in
+        a fixed order, so that disjoint ranges of indices can be generated independently.
+        Args:
+            entity_name (str): The name of the entity.
+            index (int): The index of the derivation, between 0 and `count(entity_name) - 1`.
+
+        Returns:
+            The derivation.
+        """
+        return self._space().unrank(self.entities[entity_name], index).strip()
+
+    def enumerate(self, entity_name: str, start: int = 0) -> Iterator[str]:
+        """
+        Lazily enumerates every derivation of an entity, in the order of their indices (see `unrank`). Only the
+        current derivation is held in memory, and the enumeration can be resumed from any index. The context must be
+        bound when building the grammar.
+        Args:
+            entity_name (str): The name of the entity to enumerate.
+            start (int): The index of the first derivation to generate.
+
+        Returns:
+            An iterator over the derivations.
+        """
+        if start < 0:
+            raise ValueError("the start index must not be negative")
+
+        space = self._space()
+        entity = self.entities[entity_name]
+        total = space.count(entity)
+
+        return (space.unrank(entity, index).strip() for index in range(start, total))
+
+    def generate_unique(
+        self,
+        entity_name: str,
+        n: int,
+        lazy: bool = False,
+        rng: RandomSource = None,
+    ) -> Union[List[str], Iterator[str]]:
+        """
+        Generates distinct values for a specific entity, by sampling its derivations without replacement. Derivations
+        are drawn in the order of a random permutation of their indices, so that every new value costs the same,
+        however close `n` gets to the number of derivations. Derivations producing an already generated text are
+        skipped. The context must be bound when building the grammar.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of distinct values to generate.
+            lazy (bool): Return an iterator generating values on demand instead of a list.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the grammar.
+
+        Returns:
+            The generated entities. Raises ValueError if the entity has less than `n` distinct values.
+        """
+        space = self._space()
+        entity = self.entities[entity_name]
+
+        total = space.count(entity)
+        if n > total:
+            raise ValueError(
+                f"cannot generate {n} distinct values: {entity_name} has {total} derivations"
+            )
+
+        permutation = FeistelPermutation(
+            total, make_rng(rng if rng is not None else self.rng)
+        )
+
+        def generations() -> Iterator[str]:
+            seen: Set[str] = set()
+            if n <= 0:
+                return
+
+            for index in permutation:
+                value = space.unrank(entity, index).strip()
+                if value in seen:
+                    continue
+
+                seen.add(value)
+                yield value
+                if len(seen) == n:
+                    return
+
+            raise ValueError(
+                f"cannot generate {n} distinct values: {entity_name} has {len(seen)}"
+            )
+
+        return generations() if lazy else list(generations())
+
+    def generate(  # type: ignore
+        self, entity_name: str, ctx: ContextLike = None, rng: RandomSource = None
+    ) -> str:
         """
         Generates a value for a specific entity.
         Args:
             entity_name (str): The name of the entity to generate.
-            ctx (Optional[dict]): The generation context.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the grammar.
 
         Returns:
             The generated entity.
         """
-        new_context = Context(ctx) if ctx else None
-        return self.entities[entity_name].generate(ctx=new_context).strip()
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+        return self.entities[entity_name].generate(new_context, generator).strip()
+
+    def generate_many(
+        self,
+        entity_name: str,
+        n: int,
+        ctx: ContextLike = None,
+        lazy: bool = False,
+        rng: RandomSource = None,
+    ) -> Union[List[str], Iterator[str]]:
+        """
+        Generates a batch of values for a specific entity. The entity lookup and the generation context are set up
+        once for the whole batch.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            ctx (ContextLike): The generation context.
+            lazy (bool): Return an iterator generating values on demand instead of a list.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the grammar.
+
+        Returns:
+            The generated entities.
+        """
+        entity = self.entities[entity_name]
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+
+        generations = (
+            entity.generate(new_context, generator).strip() for _ in range(n)
+        )
+        return generations if lazy else list(generations)
+
+    def emit(  # type: ignore
+        self,
+        entity_name: str,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+    ) -> None:
+        """
+        Streams a value for a specific entity to a writer.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            write (Write): The writer receiving the fragments.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the grammar.
+        """
+        self.write_many(entity_name, 1, write, ctx, rng, separator="")
+
+    def write_many(
+        self,
+        entity_name: str,
+        n: int,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+        separator: str = "\n",
+    ) -> None:
+        """
+        Streams a batch of values for a specific entity to a writer, each value followed by a separator.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            write (Write): The writer receiving the fragments.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the grammar.
+            separator (str): Written after every value.
+        """
+        entity = self.entities[entity_name]
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+
+        for _ in range(n):
+            entity.emit(StrippedWriter(write), new_context, generator)
+            if separator:
+                write(separator)
 
 
 class ConditionNode(Node):
@@ -101,6 +532,8 @@ class ConditionNode(Node):
     `else_expression` otherwise.
     """
 
+    __slots__ = ("condition", "expression", "else_expression")
+
     def __init__(
         self,
         condition: Tuple[Optional[Node], Optional[Node]],
@@ -129,21 +562,35 @@ class ConditionNode(Node):
             and self.else_expression == other.else_expression
         )
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Evaluate the condition & evaluate the appropriate expression.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The generated expression.
         """
-        out_node = exec_condition(self, ctx)
+        out_node = exec_condition(self, ctx, rng)
 
         if out_node is self:
             raise RuntimeError("Could not execute conditions.")
 
-        return out_node.generate(ctx) if out_node else ""
+        return out_node.generate(ctx, rng) if out_node else ""
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        out_node = exec_condition(self, ctx, rng)
+
+        if out_node is self:
+            raise RuntimeError("Could not execute conditions.")
+
+        if out_node:
+            out_node.emit(write, ctx, rng)
 
 
 class LiteralNode(Node):
@@ -151,6 +598,8 @@ class LiteralNode(Node):
     LiteralNode represents a literal string in the generation graph.
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, value: str) -> None:
         """
         Constructor.
@@ -166,17 +615,25 @@ class LiteralNode(Node):
 
         return self.value == other.value
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Generates by returning the literal value.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The literal value.
         """
         return self.value
 
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        write(self.value)
+
 
 class PlaceholderNode(Node):
     """
@@ -184,6 +641,8 @@ class PlaceholderNode(Node):
     compile time or at runtime.
     """
 
+    __slots__ = ("key",)
+
     def __init__(self, key: str) -> None:
         """
         Constructor.
@@ -199,11 +658,14 @@ class PlaceholderNode(Node):
 
         return self.key == other.key
 
-    def generate(self, ctx: Context = None):  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Substitutes the placeholder.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             A randomly selected value from the corresponding context key.
@@ -223,7 +685,10 @@ class PlaceholderNode(Node):
         if not val:
             return ""
 
-        return sub_punctuation(LiteralNode(random.choice(val))).generate()
+        table = ctx.get_table(self.key)
+        pick = val[table.sample(rng)] if table is not None else rng.choice(val)
+
+        return spaced(pick)
 
 
 class ReferenceNode(Node):
@@ -232,6 +697,8 @@ class ReferenceNode(Node):
     References another entity.
     """
 
+    __slots__ = ("key",)
+
     def __init__(self, key: str) -> None:
         """
         Constructor.
@@ -253,6 +720,8 @@ class ParameterNode(Node):
     Holds parameter values in macros.
     """
 
+    __slots__ = ("name", "value")
+
     def __init__(self, name: str, value: Node = None) -> None:
         """
         Constructor.
@@ -270,18 +739,27 @@ class ParameterNode(Node):
 
         return self.name == other.name and self.value == other.value
 
-    def generate(self, ctx: Context = None):  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Evaluates the value set for the parameter.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The evaluated parameter - if value is set.
         """
         if self.value is None:
             return ""
-        return self.value.generate(ctx=ctx)
+        return self.value.generate(ctx, rng)
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        if self.value is not None:
+            self.value.emit(write, ctx, rng)
 
 
 class MacroNode(Node):
@@ -289,6 +767,8 @@ class MacroNode(Node):
     Holds a macro definition.
     """
 
+    __slots__ = ("name", "params", "children")
+
     def __init__(
         self,
         name: str,
@@ -324,6 +804,8 @@ class MacroReferenceNode(Node):
     References an existing macro. Used in entity definitions.
     """
 
+    __slots__ = ("key",)
+
     def __init__(self, key: str) -> None:
         """
         Constructor.
@@ -345,6 +827,8 @@ class EntityNode(Node):
     Represents a top-level entity that can be generated by the grammar.
     """
 
+    __slots__ = ("name", "macro", "children")
+
     def __init__(
         self,
         name: str,
@@ -373,11 +857,14 @@ class EntityNode(Node):
             and self.children == other.children
         )
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Generates the entity.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The evaluated entity.
@@ -386,51 +873,246 @@ class EntityNode(Node):
             filter(
                 lambda o: bool,
                 (
-                    next_node.generate(ctx=ctx)
+                    next_node.generate(ctx, rng)
                     for next_node in self.children
                     if next_node is not None
                 ),
             )
         )
 
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        for next_node in self.children:
+            if next_node is not None:
+                next_node.emit(write, ctx, rng)
+
 
 class AnyNode(Node):
     """
-    The Any node returns _one_ of its children - at random - on every generation.
+    The Any node returns _one_ of its children - at random - on every generation. Children are picked uniformly,
+    unless weights are set.
     """
 
-    def __init__(self, children: Sequence[Optional[Node]]) -> None:
+    __slots__ = ("children", "weights", "table")
+
+    def __init__(
+        self,
+        children: Sequence[Optional[Node]],
+        weights: Sequence[Weight] = None,
+        table: AliasTable = None,
+    ) -> None:
         """
         Constructor.
         Args:
             children (Sequence[Optional[Node]]): The node body.
+            weights (Optional[Sequence[Weight]]): The relative weight of every child.
+            table (Optional[AliasTable]): Precomputed alias table for the weights. Built on first use if not set.
         """
         super().__init__()
         self.children = children
+        self.weights = weights
+        self.table = table
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, AnyNode):
             return NotImplemented  # pragma: nocover
 
-        return self.children == other.children
+        return self.children == other.children and self.weights == other.weights
+
+    def pick(self, rng: random.Random = DEFAULT_RNG) -> Node:
+        """
+        Draws a child.
+        Args:
+            rng (random.Random): The random number generator.
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+        Returns:
+            The drawn child.
+        """
+        if self.weights is None:
+            pick = rng.choice(self.children)
+        else:
+            if self.table is None:
+                self.table = AliasTable(self.weights)
+            pick = self.children[self.table.sample(rng)]
+
+        assert pick is not None
+        return pick
+
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Randomly selects and evaluates a child.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The evaluated node.
         """
-        pick = random.choice(self.children)
-        assert pick is not None
-        return pick.generate(ctx=ctx)
+        return self.pick(rng).generate(ctx, rng)
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        self.pick(rng).emit(write, ctx, rng)
+
+
+class ValueTableNode(Node):
+    """
+    Picks one of many literal values at random, like an AnyNode of literals. The values are spaced like literals, and
+    stored back to back in a single string indexed by an offset array: a table of a million values holds a handful of
+    objects instead of millions of nodes, and picking a value is a single draw and a slice.
+    """
+
+    __slots__ = ("text", "offsets", "table")
+
+    def __init__(self, values: Sequence[str], table: AliasTable = None) -> None:
+        """
+        Constructor.
+        Args:
+            values (Sequence[str]): The values, unspaced.
+            table (Optional[AliasTable]): Alias table sampling the values. Values are picked uniformly if not set.
+        """
+        super().__init__()
+        spaced_values = [spaced(value) for value in values]
+
+        self.text = "".join(spaced_values)
+        self.offsets = array("I" if len(self.text) <= 0xFFFFFFFF else "Q", [0])
+        self.offsets.extend(accumulate(map(len, spaced_values)))
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        """
+        Fetches a value.
+        Args:
+            index (int): The index of the value.
+
+        Returns:
+            The spaced value.
+        """
+        return self.text[self.offsets[index] : self.offsets[index + 1]]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ValueTableNode):
+            return NotImplemented  # pragma: nocover
+
+        return (
+            self.text == other.text
+            and self.offsets == other.offsets
+            and self.table == other.table
+        )
+
+    def pick(self, rng: random.Random = DEFAULT_RNG) -> str:
+        """
+        Draws a value. Draws the same random numbers as an AnyNode of the same values.
+        Args:
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The spaced value.
+        """
+        if self.table is None:
+            index = rng.randrange(len(self.offsets) - 1)
+        else:
+            index = self.table.sample(rng)
+
+        return self.text[self.offsets[index] : self.offsets[index + 1]]
+
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
+        """
+        Randomly selects a value.
+        Args:
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The spaced value.
+        """
+        return self.pick(rng)
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        write(self.pick(rng))
+
+
+class WordListNode(Node):
+    """
+    Picks a line of a word list at random. Lines are read from the memory-mapped file when picked: the word list is
+    never loaded.
+    """
+
+    __slots__ = ("words",)
+
+    def __init__(self, words: WordList) -> None:
+        """
+        Constructor.
+        Args:
+            words (WordList): The word list.
+        """
+        super().__init__()
+        self.words = words
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, WordListNode):
+            return NotImplemented  # pragma: nocover
+
+        return self.words == other.words
+
+    def __getitem__(self, index: int) -> str:
+        """
+        Fetches a line.
+        Args:
+            index (int): The index of the line.
+
+        Returns:
+            The spaced line.
+        """
+        return spaced(self.words[index])
+
+    def pick(self, rng: random.Random = DEFAULT_RNG) -> str:
+        """
+        Draws a line. Draws the same random numbers as a placeholder bound to the word list at runtime.
+        Args:
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The spaced line.
+        """
+        return self[rng.randrange(len(self.words))]
+
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
+        """
+        Randomly selects a line.
+        Args:
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The spaced line.
+        """
+        return self.pick(rng)
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        write(self.pick(rng))
 
 
 class OptionalNode(Node):
     """ Optionally evaluates an expression at random. """
 
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Optional[Node]) -> None:
         """
         Constructor.
@@ -446,27 +1128,38 @@ class OptionalNode(Node):
 
         return other.expression == self.expression
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Evaluates the internal expression or returns an empty string.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The evaluated expression.
         """
         # I use lambdas here as to delay the traversal of the optional node's expression until after
         # the random selection is done
-        return random.choice(
-            [lambda: "", lambda: cast(Node, self.expression).generate(ctx=ctx)]
+        return rng.choice(
+            [lambda: "", lambda: cast(Node, self.expression).generate(ctx, rng)]
         )()
 
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        if rng.choice(OPTIONAL_BRANCHES):
+            cast(Node, self.expression).emit(write, ctx, rng)
+
 
 class ListNode(Node):
     """
     ListNode represents a list of consecutive values.
     """
 
+    __slots__ = ("children",)
+
     def __init__(self, children: Sequence[Node]) -> None:
         """
         Constructor.
@@ -482,11 +1175,14 @@ class ListNode(Node):
 
         return self.children == other.children
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
         """
         Successively evaluates all the children of the node.
         Args:
             ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
 
         Returns:
             The evaluated expression.
@@ -495,17 +1191,26 @@ class ListNode(Node):
             filter(
                 lambda o: bool,
                 (
-                    next_node.generate(ctx=ctx)
+                    next_node.generate(ctx, rng)
                     for next_node in self.children
                     if next_node is not None
                 ),
             )
         )
 
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        for next_node in self.children:
+            if next_node is not None:
+                next_node.emit(write, ctx, rng)
+
 
 class RepeatNode(Node):
     """ RepeatNode repeats its body n times. """
 
+    __slots__ = ("n_repeat", "expression")
+
     def __init__(self, n_repeat: int, expression: Node) -> None:
         super().__init__()
         self.n_repeat = n_repeat
@@ -517,9 +1222,72 @@ class RepeatNode(Node):
 
         return self.n_repeat == other.n_repeat and self.expression == other.expression
 
-    def generate(self, ctx: Context = None) -> str:  # type: ignore
-        body = ""
-        for i in range(self.n_repeat):
-            body += self.expression.generate(ctx=ctx)
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
+        return "".join(
+            [self.expression.generate(ctx, rng) for _ in range(self.n_repeat)]
+        )
+
+    def emit(
+        self, write: Write, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> None:
+        for _ in range(self.n_repeat):
+            self.expression.emit(write, ctx, rng)
+
+
+class UniqueNode(Node):
+    """
+    UniqueNode generates its body without replacement: no derivation of the body repeats until all of them have been
+    generated, after which a new round starts in a new random order. The body must have a finite output space that
+    does not depend on the generation context (see `Grammar.count`).
+    """
+
+    __slots__ = ("children", "_space", "_permutation", "_position")
+
+    def __init__(self, children: Sequence[Node]) -> None:
+        """
+        Constructor.
+        Args:
+            children (Sequence[Node]): The body of the node.
+        """
+        super().__init__()
+        self.children = children
+
+        # Sampling state, set up on first use.
+        self._space: Optional["OutputSpace"] = None
+        self._permutation: Optional[FeistelPermutation] = None
+        self._position = 0
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, UniqueNode):
+            return NotImplemented  # pragma: nocover
+
+        return self.children == other.children
+
+    def generate(  # type: ignore
+        self, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
+        """
+        Evaluates the next derivation of the body, in the random order of the current round.
+        Args:
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator. Only drawn from when a round starts.
+
+        Returns:
+            The evaluated expression.
+        """
+        if self._space is None:
+            from txtgen.combinatorics import OutputSpace
+
+            self._space = OutputSpace()
+
+        permutation = self._permutation
+        if permutation is None or self._position == len(permutation):
+            permutation = FeistelPermutation(self._space.count(self), rng)
+            self._permutation = permutation
+            self._position = 0
 
-        return body
+        index = permutation[self._position]
+        self._position += 1
+        return self._space.unrank(self, index)
@@ -1,22 +1,371 @@
-from copy import deepcopy
+from collections import ChainMap
+from copy import copy
 
 from txtgen import nodes
-from txtgen.context import Context
+from txtgen.context import Context, WordList
+from txtgen.sampling import AliasTable
 
-from typing import cast, Dict, Optional, Union
+from typing import (
+    cast,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
-import re
+NodesWithChildren = Union[nodes.EntityNode, nodes.AnyNode, nodes.ListNode]
 
+Visitor = TypeVar("Visitor", bound=Callable[..., Any])
 
-NodesWithChildren = Union[nodes.EntityNode, nodes.AnyNode, nodes.ListNode]
 
+def get_children(node: nodes.Node) -> Sequence[Optional[nodes.Node]]:
+    """
+    Lists the nodes walked below a node, in generation order.
+    Args:
+        node (nodes.Node): The parent node.
+
+    Returns:
+        The child nodes.
+    """
+    if node.type in {"EntityNode", "AnyNode", "ListNode", "UniqueNode"}:
+        return cast(NodesWithChildren, node).children
+
+    if node.type == "ConditionNode":
+        node = cast(nodes.ConditionNode, node)
+        return (*node.condition, node.expression, node.else_expression)
+
+    if node.type == "OptionalNode" or node.type == "RepeatNode":
+        return (cast(nodes.OptionalNode, node).expression,)
+
+    if node.type == "ParameterNode":
+        return (cast(nodes.ParameterNode, node).value,)
+
+    return ()
+
+
+def set_children(node: nodes.Node, children: Sequence[Optional[nodes.Node]]) -> None:
+    """
+    Replaces the nodes walked below a node. Removed (None) children are dropped from child lists.
+    Args:
+        node (nodes.Node): The parent node.
+        children (Sequence[Optional[nodes.Node]]): The new children, as listed by `get_children`.
+    """
+    if node.type == "AnyNode" and cast(nodes.AnyNode, node).weights is not None:
+        node = cast(nodes.AnyNode, node)
+        assert node.weights is not None
+
+        # Weights are kept aligned with the children that survive.
+        node.weights = [
+            weight for child, weight in zip(children, node.weights) if child is not None
+        ]
+        node.children = [child for child in children if child is not None]
+
+    elif node.type in {"EntityNode", "AnyNode", "ListNode", "UniqueNode"}:
+        cast(NodesWithChildren, node).children = [
+            child for child in children if child is not None
+        ]
+
+    elif node.type == "ConditionNode":
+        node = cast(nodes.ConditionNode, node)
+        node.condition = (children[0], children[1])
+        node.expression, node.else_expression = children[2], children[3]
+
+    elif node.type == "OptionalNode" or node.type == "RepeatNode":
+        cast(nodes.OptionalNode, node).expression = children[0]
+
+    elif node.type == "ParameterNode":
+        cast(nodes.ParameterNode, node).value = children[0]
+
+
+def walk_graph(
+    node: nodes.Node,
+    visit: Callable[[nodes.Node], Optional[nodes.Node]],
+    walked: Dict[int, Optional[nodes.Node]],
+    walked_nodes: List[nodes.Node],
+) -> Optional[nodes.Node]:
+    """
+    Rewrites a node graph bottom-up: every node is visited once its children have been replaced by their visited
+    version.
+
+    The walk is iterative and memoized: every node is visited once, no matter how many parents share it, and deep
+    graphs do not hit the recursion limit. A node being walked stands for itself, which resolves cycles (recursive
+    entities).
+    Args:
+        node (nodes.Node): The starting node.
+        visit (Callable[[nodes.Node], Optional[nodes.Node]]): Rewrites a single node.
+        walked (Dict[int, Optional[nodes.Node]]): The visited version of every walked node, by id. Shared across
+            calls to reuse the nodes already walked.
+        walked_nodes (List[nodes.Node]): Keeps the walked nodes alive, so that their ids cannot be reused.
+
+    Returns:
+        The visited node.
+    """
+    keep = walked_nodes.append
+
+    # Frames hold a node and, once it has been expanded, the children to replace by their visited version.
+    stack: List[Tuple[nodes.Node, Optional[Sequence[Optional[nodes.Node]]]]] = [
+        (node, None)
+    ]
+
+    while stack:
+        current, children = stack.pop()
+        key = id(current)
+
+        if children is None:
+            if key in walked:
+                continue
+
+            keep(current)
+            children = get_children(current)
+
+            if children:
+                # Until its children are walked, a node stands for itself.
+                walked[key] = current
+                stack.append((current, children))
+                stack.extend(
+                    [(child, None) for child in reversed(children) if child is not None]
+                )
+                continue
+
+        else:
+            set_children(
+                current,
+                [
+                    walked[id(child)] if child is not None else None
+                    for child in children
+                ],
+            )
+
+        walked[key] = visit(current)
+
+    return walked[id(node)]
+
+
+class MacroTemplate:
+    """
+    A macro body prepared for expansion. Expanding the macro only copies the nodes leading to one of its parameters
+    or to a `unique` node: the rest of the body is shared by every expansion.
+    """
+
+    def __init__(self, macro: nodes.MacroNode) -> None:
+        """
+        Constructor.
+        Args:
+            macro (nodes.MacroNode): The macro definition.
+        """
+        self.name = macro.name
+        self.children = macro.children
+
+        self._slots = {id(param): i for i, param in enumerate(macro.params)}
+        self._names = [param.name for param in macro.params]
+
+        # Nodes of the body leading to a parameter, children before parents.
+        self._spine: List[nodes.Node] = []
+
+        leads_to_param: Dict[int, bool] = {}
+        stack: List[Tuple[nodes.Node, bool]] = [
+            (child, False) for child in macro.children if child is not None
+        ]
 
-def camelcase(name: str) -> str:
-    s1 = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
-    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
+        while stack:
+            current, expanded = stack.pop()
+            key = id(current)
 
+            if not expanded:
+                if key in leads_to_param:
+                    continue
 
-class Optimizer:
+                # Entities referenced by the body never hold its parameters.
+                if key in self._slots or isinstance(current, nodes.EntityNode):
+                    leads_to_param[key] = key in self._slots
+                    if leads_to_param[key]:
+                        self._spine.append(current)
+                    continue
+
+                leads_to_param[key] = False
+                stack.append((current, True))
+                stack.extend(
+                    (child, False)
+                    for child in get_children(current)
+                    if child is not None
+                )
+                continue
+
+            # Unique nodes hold the state of their draws: every expansion gets its own.
+            if isinstance(current, nodes.UniqueNode) or any(
+                leads_to_param[id(child)]
+                for child in get_children(current)
+                if child is not None
+            ):
+                leads_to_param[key] = True
+                self._spine.append(current)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def expand(
+        self, args: Sequence[Optional[nodes.Node]]
+    ) -> List[Optional[nodes.Node]]:
+        """
+        Binds the macro parameters.
+        Args:
+            args (Sequence[Optional[nodes.Node]]): The value of every parameter.
+
+        Returns:
+            The macro body, with its parameters bound.
+        """
+        copies: Dict[int, nodes.Node] = {}
+
+        for node in self._spine:
+            slot = self._slots.get(id(node))
+
+            if slot is not None:
+                copies[id(node)] = nodes.ParameterNode(self._names[slot], args[slot])
+            else:
+                node_copy = (
+                    nodes.UniqueNode(node.children)
+                    if isinstance(node, nodes.UniqueNode)
+                    else copy(node)
+                )
+                set_children(
+                    node_copy,
+                    [
+                        copies.get(id(child), child) if child is not None else None
+                        for child in get_children(node)
+                    ],
+                )
+                copies[id(node)] = node_copy
+
+        return [
+            copies.get(id(child), child) if child is not None else None
+            for child in self.children
+        ]
+
+
+def visits(*node_types: Type[nodes.Node]) -> Callable[[Visitor], Visitor]:
+    """
+    Registers a method of a pass as the visitor of some node classes.
+    Args:
+        *node_types (Type[nodes.Node]): The node classes handled by the method.
+
+    Returns:
+        The decorator.
+    """
+
+    def register(method: Visitor) -> Visitor:
+        setattr(method, "visits", node_types)
+        return method
+
+    return register
+
+
+class Pass:
+    """
+    Base class of the passes rewriting a node graph bottom-up.
+
+    Visitors are registered against node classes with `visits`. The dispatch table is built once per pass class, and
+    nodes without a visitor are left as they are.
+    """
+
+    # Name of the visitor method of every node class.
+    dispatch: ClassVar[Dict[type, str]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        dispatch = dict(cls.dispatch)
+        for name, attribute in vars(cls).items():
+            method = getattr(attribute, "__func__", attribute)
+            for node_type in getattr(method, "visits", ()):
+                dispatch[node_type] = name
+        cls.dispatch = dispatch
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        # Visited node of every walked node, by id. Walked nodes are kept alive so their ids cannot be reused.
+        self._walked: Dict[int, Optional[nodes.Node]] = {}
+        self._walked_nodes: List[nodes.Node] = []
+
+        # Visitors are looked up by name, so that subclasses can override them without registering them again.
+        self._visitors: Dict[type, Optional[Callable[[Any], Optional[nodes.Node]]]] = {
+            node_type: getattr(self, name) for node_type, name in self.dispatch.items()
+        }
+
+    def skip(self, skipped: Sequence[nodes.Node]) -> None:
+        """
+        Excludes nodes from the walk: they are left as they are, along with everything below them.
+        Args:
+            skipped (Sequence[nodes.Node]): The nodes to leave.
+        """
+        for node in skipped:
+            self._walked[id(node)] = node
+            self._walked_nodes.append(node)
+
+    def walk(self, node: Optional[nodes.Node]) -> Optional[nodes.Node]:
+        """
+        Walks a node graph, or every entity of a grammar, and visits every node once.
+        Args:
+            node (Optional[nodes.Node]): The starting node.
+
+        Returns:
+            The visited node.
+        """
+        if node is None:
+            return None
+
+        if isinstance(node, nodes.Grammar):
+            new_entities = cast(Dict[str, nodes.EntityNode], {})
+            for entity_name, entity in node.entities.items():
+                new_node = self.walk(entity)
+
+                if new_node is not None:
+                    new_entities[entity_name] = cast(nodes.EntityNode, new_node)
+
+            node.entities = new_entities
+            return node
+
+        return walk_graph(node, self.visit, self._walked, self._walked_nodes)
+
+    def visit(self, node: nodes.Node) -> Optional[nodes.Node]:
+        """
+        Visits a single node, once its children are visited.
+        Args:
+            node (nodes.Node): The node to visit.
+
+        Returns:
+            The visited node.
+        """
+        try:
+            visitor = self._visitors[type(node)]
+        except KeyError:
+            # Subclasses of the registered node classes share their visitor.
+            visitor = next(
+                (
+                    self._visitors[base]
+                    for base in type(node).__mro__
+                    if base in self._visitors
+                ),
+                None,
+            )
+            self._visitors[type(node)] = visitor
+
+        return visitor(node) if visitor is not None else node
+
+
+class Optimizer(Pass):
     """
     The Optimizer traverses the generation graph and makes as many assumptions as possible to shorten the graph
     (and thus improve performance).
@@ -24,38 +373,70 @@ class Optimizer:
 
     def __init__(
         self,
-        entities: Dict[str, nodes.EntityNode],
+        entities: MutableMapping[str, nodes.EntityNode],
         macros: Dict[str, nodes.MacroNode],
         ctx: Context = None,
     ) -> None:
         """
         Constructor.
         Args:
-            entities (Dict[str, nodes.EntityNode]: The defined entities.
+            entities (MutableMapping[str, nodes.EntityNode]: The defined entities.
             macros (Dict[str, nodes.MacroNode]: The defined macros.
             ctx (Optional[Context]): The generation context.
         """
+        super().__init__()
 
         self._entities = entities
         self._macros = macros
         self._ctx = ctx
 
+        # Expansion template of every macro, prepared on first use.
+        self._templates: Dict[str, MacroTemplate] = {}
+
+        # Value table of every multi-valued context key, shared by all the placeholders of the key.
+        self._value_tables: Dict[str, nodes.ValueTableNode] = {}
+
     @staticmethod
+    @visits(nodes.AnyNode)
     def visit_any_node(node: nodes.AnyNode) -> Optional[nodes.Node]:
         """
         Optimizations:
+            - Drops the branches that can never be picked (zero weight), and removes the node if no branch that can
+                be picked is left: the removed branches generated nothing.
             - Replaces the AnyNode by its first child it has only one.
+            - Drops the weights if they are all equal, precomputes their alias table otherwise.
         Args:
             node (nodes.AnyNode): The node to replace.
 
         Returns:
             The replaced node.
         """
+        if node.weights is not None:
+            # Removed branches took their weights with them: the weights are checked again from the ones left.
+            if not all(node.weights):
+                kept = [
+                    (child, weight)
+                    for child, weight in zip(node.children, node.weights)
+                    if weight
+                ]
+                node.children = [child for child, _ in kept]
+                node.weights = [weight for _, weight in kept]
+
+            if not node.children:
+                return None
+
+            if len(set(node.weights)) == 1:
+                node.weights = None
+                node.table = None
+            elif node.table is None or node.table.weights != tuple(node.weights):
+                node.table = AliasTable(node.weights)
+
         if len(node.children) == 1:
             return node.children[0]
 
         return node
 
+    @visits(nodes.ConditionNode)
     def visit_condition_node(self, node: nodes.ConditionNode) -> Optional[nodes.Node]:
         """
         Optimizations:
@@ -69,6 +450,7 @@ class Optimizer:
         """
         return nodes.exec_condition(node, self._ctx)
 
+    @visits(nodes.MacroNode)
     def visit_macro_node(self, node: nodes.MacroNode) -> nodes.MacroNode:
         """
         Optimizations:
@@ -82,10 +464,9 @@ class Optimizer:
 
         # Add the macro's params to current context & traverse the macro body to replace ReferenceNodes to params by
         # the actual param node.
-        new_entities = {
-            **self._entities,
-            **{p.name: cast(nodes.EntityNode, p) for p in node.params},
-        }
+        new_entities = ChainMap(
+            {p.name: cast(nodes.EntityNode, p) for p in node.params}, self._entities
+        )
 
         optimizer = Optimizer(new_entities, self._macros)
 
@@ -94,6 +475,7 @@ class Optimizer:
         return node
 
     @staticmethod
+    @visits(nodes.OptionalNode)
     def visit_optional_node(node: nodes.OptionalNode) -> Optional[nodes.OptionalNode]:
         """
         Optimizations:
@@ -109,6 +491,7 @@ class Optimizer:
 
         return node
 
+    @visits(nodes.EntityNode)
     def visit_entity_node(self, node: nodes.EntityNode) -> nodes.EntityNode:
         """
         Optimizations:
@@ -120,20 +503,21 @@ class Optimizer:
             The replaced node.
         """
         if node.macro is not None:
-            macro_copy = deepcopy(self._macros[node.macro.key])
-
-            if len(macro_copy.params) != len(node.children):
-                diff = abs(len(macro_copy.params) - len(node.children))
-                raise SyntaxError(f"Macro {macro_copy.name} missing {diff} parameters.")
+            template = self._templates.get(node.macro.key)
+            if template is None:
+                template = MacroTemplate(self._macros[node.macro.key])
+                self._templates[node.macro.key] = template
 
-            for i, param in enumerate(macro_copy.params):
-                param.value = node.children[i]
+            if len(template) != len(node.children):
+                diff = abs(len(template) - len(node.children))
+                raise SyntaxError(f"Macro {template.name} missing {diff} parameters.")
 
-            node.children = macro_copy.children
+            node.children = template.expand(node.children)
             node.macro = None  # TODO: Support a list of macros
 
         return node
 
+    @visits(nodes.ReferenceNode)
     def visit_reference_node(self, node: nodes.ReferenceNode) -> nodes.EntityNode:
         """
         Optimizations:
@@ -150,6 +534,7 @@ class Optimizer:
         return self._entities[node.key]
 
     @staticmethod
+    @visits(nodes.LiteralNode)
     def visit_literal_node(node: nodes.LiteralNode) -> Optional[nodes.Node]:
         """
         Optimizations:
@@ -165,6 +550,7 @@ class Optimizer:
             return None
         return nodes.sub_punctuation(node)
 
+    @visits(nodes.PlaceholderNode)
     def visit_placeholder_node(
         self, node: nodes.PlaceholderNode
     ) -> Optional[nodes.Node]:
@@ -173,7 +559,11 @@ class Optimizer:
             - If placeholder is defined in bound context, and placeholder key has a single value, replaces the
                 placeholder by a LiteralNode having that value.
             - If placeholder is defined in bound context and placeholder key has multiple values, replaces the
-                placeholder by an AnyNode of LiteralNodes corresponding to the context values.
+                placeholder by a ValueTableNode holding the context values.
+            - If placeholder is defined in bound context and placeholder key holds a word list, replaces the
+                placeholder by a WordListNode reading the word list.
+            - If placeholder is defined in bound context and placeholder key has no values, removes the placeholder.
+            - Drops the weighted values that can never be picked (zero weight) before applying the rules above.
         Args:
             node (nodes.PlaceholderNode): The placeholder to replace.
 
@@ -188,19 +578,35 @@ class Optimizer:
         # depth-first
         try:
             values = self._ctx.get(node.key)
+            table = self._ctx.get_table(node.key)
         except KeyError:
             return node
 
+        if table is not None and not all(table.weights):
+            # Values that can never be picked (zero weight) are dropped, like the branches of any nodes.
+            kept = [
+                (value, weight)
+                for value, weight in zip(values, table.weights)
+                if weight
+            ]
+            values = [value for value, _ in kept]
+            table = AliasTable([weight for _, weight in kept])
+
+        if not values:
+            return None
+
+        if isinstance(values, WordList):
+            return nodes.WordListNode(values)
+
         if len(values) == 1:
-            if values[0] is None:
-                return None
             return self.visit_literal_node(nodes.LiteralNode(values[0]))
 
-        return nodes.AnyNode(
-            [self.visit_literal_node(nodes.LiteralNode(val)) for val in values]
-        )
+        if node.key not in self._value_tables:
+            self._value_tables[node.key] = nodes.ValueTableNode(values, table)
+        return self._value_tables[node.key]
 
     @staticmethod
+    @visits(nodes.RepeatNode)
     def visit_repeat_node(node: nodes.RepeatNode) -> nodes.Node:
         """
         Optimizations:
@@ -216,6 +622,8 @@ class Optimizer:
     def walk(self, node: Optional[nodes.Node]) -> Optional[nodes.Node]:
         """
         Walks the whole tree and applies the optimizations as it goes.
+
+        Every node is optimized once, no matter how many parents share it (see `walk_graph`).
         Args:
             node (nodes.Node): The starting node.
 
@@ -223,57 +631,498 @@ class Optimizer:
             The optimized node.
         """
 
-        if node is None:
-            return None
-
-        if node.type == "Grammar":
-            node = cast(nodes.Grammar, node)
-
+        if isinstance(node, nodes.Grammar):
+            # Macros are optimized first, so that entities expand optimized bodies.
             for macro_name, macro in node.macros.items():
                 new_macro = self.walk(macro)
                 assert new_macro is not None
                 node.macros[macro_name] = cast(nodes.MacroNode, new_macro)
 
-            new_entities = cast(Dict[str, nodes.EntityNode], {})
-            for entity_name, entity in node.entities.items():
-                new_node = self.walk(entity)
+        return super().walk(node)
 
-                if new_node is not None:
-                    new_entities[entity_name] = cast(nodes.EntityNode, new_node)
 
-            node.entities = new_entities
+class ConstantFolder(Pass):
+    """
+    Folds the parts of an optimized graph that depend neither on randomness nor on the generation context:
+        - Flattens nested lists into their parent list or entity, unless they have other parents.
+        - Merges adjacent literals into a single literal.
+        - Replaces constant lists, parameters, conditions and repeats by a single literal.
+        - Inlines constant entities where they are referenced.
 
-        elif node.type in {"EntityNode", "AnyNode", "ListNode", "UniqueNode"}:
-            node = cast(NodesWithChildren, node)
-            node.children = list(
-                filter(
-                    lambda x: x is not None,
-                    [self.walk(child) for child in node.children],
-                )
-            )
+    Folding never changes the random draws made by a generation.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        super().__init__()
+
+        # Folded value of every constant entity, by id.
+        self._constant_entities: Dict[int, nodes.LiteralNode] = {}
+
+        # Number of parents of every node, by id. Lists with several parents (e.g. the body of a repeat, which the
+        # repeat references n times) are not flattened: copying them into every parent would expand the graph.
+        self._parents: Dict[int, int] = {}
+        self._counted: Set[int] = set()
+
+    def _count_parents(self, roots: Sequence[nodes.Node]) -> None:
+        stack = [node for node in roots if id(node) not in self._counted]
+
+        while stack:
+            node = stack.pop()
+            if id(node) in self._counted:
+                continue
+            self._counted.add(id(node))
+
+            for child in get_children(node):
+                if child is not None:
+                    self._parents[id(child)] = self._parents.get(id(child), 0) + 1
+
+                    # Nodes excluded from the walk are never folded: their children are left as they are.
+                    if id(child) not in self._walked:
+                        stack.append(child)
+
+    def walk(self, node: Optional[nodes.Node]) -> Optional[nodes.Node]:
+        """
+        Folds a node graph, or every entity of a grammar.
+        Args:
+            node (Optional[nodes.Node]): The starting node.
+
+        Returns:
+            The folded node.
+        """
+        if isinstance(node, nodes.Grammar):
+            self._count_parents(list(node.entities.values()))
+        elif node is not None:
+            self._count_parents([node])
+
+        return super().walk(node)
+
+    def visit(self, node: nodes.Node) -> Optional[nodes.Node]:
+        """
+        Folds a single node. A node replaced by one of its descendants hands its parents over to it.
+        Args:
+            node (nodes.Node): The node to fold.
+
+        Returns:
+            The folded node.
+        """
+        folded = super().visit(node)
+
+        if folded is not None and folded is not node:
+            parents = self._parents.get(id(node), 1)
+            self._parents[id(folded)] = self._parents.get(id(folded), 1) - 1 + parents
+
+        return folded
+
+    def _flatten(self, children: Sequence[Optional[nodes.Node]]) -> List[nodes.Node]:
+        flat: List[nodes.Node] = []
+        pending: List[nodes.LiteralNode] = []
 
-        elif node.type == "ConditionNode":
-            node = cast(nodes.ConditionNode, node)
+        def flush() -> None:
+            if len(pending) == 1:
+                flat.append(pending[0])
+            elif pending:
+                flat.append(nodes.LiteralNode("".join(p.value for p in pending)))
+            pending.clear()
 
-            node.condition = (
-                self.walk(node.condition[0]),
-                self.walk(node.condition[1]),
+        for child in children:
+            # Children are folded first: the lists met here are already flat. Shared lists are left in place.
+            items = (
+                child.children
+                if isinstance(child, nodes.ListNode)
+                and self._parents.get(id(child), 1) == 1
+                else (child,)
             )
-            node.expression = self.walk(node.expression)
-            node.else_expression = self.walk(node.else_expression)
 
-        elif node.type == "OptionalNode" or node.type == "RepeatNode":
-            node = cast(nodes.OptionalNode, node)
-            node.expression = self.walk(node.expression)
+            for item in items:
+                if item is None:
+                    continue
+
+                if isinstance(item, nodes.EntityNode):
+                    item = self._constant_entities.get(id(item), item)
+
+                if isinstance(item, nodes.LiteralNode):
+                    if item.value:
+                        pending.append(item)
+                    continue
+
+                flush()
+                flat.append(item)
+
+        flush()
+        return flat
+
+    @visits(nodes.EntityNode)
+    def visit_entity_node(self, node: nodes.EntityNode) -> nodes.EntityNode:
+        """
+        Folds:
+            - Flattens the body of the entity, and records the entity as constant if its body folds to a literal.
+              The entity itself stays in place, so that it can still be generated by name.
+        Args:
+            node (nodes.EntityNode): The entity to fold.
+
+        Returns:
+            The folded node.
+        """
+        node.children = self._flatten(node.children)
+
+        if not node.children:
+            self._constant_entities[id(node)] = nodes.LiteralNode("")
+        elif len(node.children) == 1 and isinstance(
+            node.children[0], nodes.LiteralNode
+        ):
+            self._constant_entities[id(node)] = node.children[0]
+
+        return node
+
+    @visits(nodes.ListNode)
+    def visit_list_node(self, node: nodes.ListNode) -> nodes.Node:
+        """
+        Folds:
+            - Flattens the list, and replaces it by its only child (or an empty literal) if it has less than two.
+        Args:
+            node (nodes.ListNode): The list to fold.
+
+        Returns:
+            The folded node.
+        """
+        children = self._flatten(node.children)
+
+        if not children:
+            return nodes.LiteralNode("")
+        if len(children) == 1:
+            return children[0]
 
-        visit_name = f"visit_{camelcase(node.type)}"
+        node.children = children
+        return node
+
+    @staticmethod
+    @visits(nodes.ParameterNode)
+    def visit_parameter_node(node: nodes.ParameterNode) -> nodes.Node:
+        """
+        Folds:
+            - Replaces the parameter by its value.
+        Args:
+            node (nodes.ParameterNode): The parameter to fold.
+
+        Returns:
+            The folded node.
+        """
+        return node.value if node.value is not None else nodes.LiteralNode("")
+
+    @staticmethod
+    @visits(nodes.ConditionNode)
+    def visit_condition_node(node: nodes.ConditionNode) -> nodes.Node:
+        """
+        Folds:
+            - Replaces a condition between two literals by the branch it selects.
+        Args:
+            node (nodes.ConditionNode): The condition to fold.
+
+        Returns:
+            The folded node.
+        """
+        left, right = node.condition
+        if not isinstance(left, nodes.LiteralNode) or not isinstance(
+            right, nodes.LiteralNode
+        ):
+            return node
 
-        if hasattr(self, visit_name) and callable(getattr(self, visit_name)):
-            node = getattr(self, visit_name)(node)
+        if left.value == right.value:
+            branch = node.expression
+        else:
+            branch = node.else_expression
+        return branch if branch is not None else nodes.LiteralNode("")
+
+    @staticmethod
+    @visits(nodes.RepeatNode)
+    def visit_repeat_node(node: nodes.RepeatNode) -> nodes.Node:
+        """
+        Folds:
+            - Replaces the repetition of a literal by a single literal.
+        Args:
+            node (nodes.RepeatNode): The repetition to fold.
+
+        Returns:
+            The folded node.
+        """
+        if isinstance(node.expression, nodes.LiteralNode):
+            return nodes.LiteralNode(node.expression.value * node.n_repeat)
 
         return node
 
 
+# Nodes with more children than this are keyed by a digest of their children rather than by the children themselves,
+# so that the key of a wide list (an unrolled repeat, say) does not hold a copy of the list.
+MAX_KEY_WIDTH = 32
+
+
+class Interner(Pass):
+    """
+    Hash-conses an optimized graph: structurally equal subtrees are replaced by a single shared node, so that a
+    subtree written in many places (or copied by a macro) exists once in memory.
+
+    Entities are never merged, even when their bodies are equal: they are distinct by name.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        super().__init__()
+
+        # The canonical node of every structure met so far.
+        self._canonical: Dict[Tuple[Any, ...], nodes.Node] = {}
+
+    @staticmethod
+    def key(node: nodes.Node) -> Optional[Tuple[Any, ...]]:
+        """
+        Describes the structure of a node whose children are already canonical: two such nodes are equal if and only
+        if their keys are equal.
+        Args:
+            node (nodes.Node): The node.
+
+        Returns:
+            The structural key of the node, or None if the node must not be merged. The keys of nodes with more than
+            MAX_KEY_WIDTH children are digests: equal nodes have equal keys, but equal keys must be confirmed with
+            `same`.
+        """
+        if isinstance(node, nodes.LiteralNode):
+            return (node.type, node.value)
+
+        if isinstance(node, nodes.PlaceholderNode):
+            return (node.type, node.key)
+
+        if isinstance(node, nodes.AnyNode):
+            # Integer and float weights compare equal but are not sampled alike.
+            weights = (
+                None
+                if node.weights is None
+                else tuple((type(weight), weight) for weight in node.weights)
+            )
+            if len(node.children) > MAX_KEY_WIDTH:
+                return (node.type, hash(weights), *Interner.digest(node.children))
+            return (node.type, weights, *map(id, node.children))
+
+        if isinstance(node, nodes.RepeatNode):
+            return (node.type, node.n_repeat, id(node.expression))
+
+        if isinstance(node, (nodes.ListNode, nodes.OptionalNode, nodes.ConditionNode)):
+            children = get_children(node)
+            if len(children) > MAX_KEY_WIDTH:
+                return (node.type, *Interner.digest(children))
+            return (node.type, *map(id, children))
+
+        return None
+
+    @visits(
+        nodes.LiteralNode,
+        nodes.PlaceholderNode,
+        nodes.AnyNode,
+        nodes.RepeatNode,
+        nodes.ListNode,
+        nodes.OptionalNode,
+        nodes.ConditionNode,
+    )
+    def canonical(self, node: nodes.Node) -> nodes.Node:
+        """
+        Replaces a node by its canonical version, once its children are canonical.
+        Args:
+            node (nodes.Node): The node to intern.
+
+        Returns:
+            The canonical node.
+        """
+        key = self.key(node)
+        if key is None:
+            return node
+
+        canonical = self._canonical.setdefault(key, node)
+        if len(get_children(node)) > MAX_KEY_WIDTH and not self.same(canonical, node):
+            # Digest collision: the node is kept as it is.
+            return node
+        return canonical
+
+    @staticmethod
+    def digest(children: Sequence[Optional[nodes.Node]]) -> Tuple[int, int]:
+        """
+        Summarizes a sequence of canonical children in constant space.
+        Args:
+            children (Sequence[Optional[nodes.Node]]): The children.
+
+        Returns:
+            The number of children and a hash of their identities.
+        """
+        return len(children), hash(tuple(map(id, children)))
+
+    @staticmethod
+    def same(node: nodes.Node, other: nodes.Node) -> bool:
+        """
+        Checks that two nodes with canonical children and equal keys have the same structure.
+        Args:
+            node (nodes.Node): The first node.
+            other (nodes.Node): The second node.
+
+        Returns:
+            Whether the nodes can be merged.
+        """
+        if node is other:
+            return True
+
+        children, other_children = get_children(node), get_children(other)
+        if len(children) != len(other_children) or any(
+            child is not other_child
+            for child, other_child in zip(children, other_children)
+        ):
+            return False
+
+        if isinstance(node, nodes.AnyNode) and isinstance(other, nodes.AnyNode):
+            if node.weights is None or other.weights is None:
+                return node.weights is other.weights
+            return [(type(weight), weight) for weight in node.weights] == [
+                (type(weight), weight) for weight in other.weights
+            ]
+
+        return True
+
+
+class Specializer(Pass):
+    """
+    Binds a context to the context-dependent sites of an optimized graph: placeholders, and the conditions and
+    alternatives depending on them. Applies the same optimizations as building the grammar with that context bound.
+    """
+
+    def __init__(self, ctx: Context) -> None:
+        """
+        Constructor.
+        Args:
+            ctx (Context): The context to bind.
+        """
+        super().__init__()
+        self._optimizer = Optimizer({}, {}, ctx)
+
+    @visits(nodes.PlaceholderNode)
+    def visit_placeholder_node(
+        self, node: nodes.PlaceholderNode
+    ) -> Optional[nodes.Node]:
+        return self._optimizer.visit_placeholder_node(node)
+
+    @visits(nodes.ConditionNode)
+    def visit_condition_node(self, node: nodes.ConditionNode) -> Optional[nodes.Node]:
+        return self._optimizer.visit_condition_node(node)
+
+    @visits(nodes.AnyNode)
+    def visit_any_node(self, node: nodes.AnyNode) -> Optional[nodes.Node]:
+        return self._optimizer.visit_any_node(node)
+
+    @visits(nodes.OptionalNode)
+    def visit_optional_node(self, node: nodes.OptionalNode) -> Optional[nodes.Node]:
+        return self._optimizer.visit_optional_node(node)
+
+
+class BindingTemplate:
+    """
+    An optimized grammar prepared for binding contexts. Binding a context only copies the nodes leading to a
+    context-dependent site (a placeholder, a condition) and specializes them: the rest of the grammar is shared by
+    every binding, and the grammar itself is never modified.
+
+    Unique nodes are copied as well, so that bindings do not share their sampling state.
+    """
+
+    def __init__(self, grammar: nodes.Grammar) -> None:
+        """
+        Constructor.
+        Args:
+            grammar (nodes.Grammar): The optimized grammar, built without a context.
+        """
+        self.grammar = grammar
+
+        # Parents of every reachable node, by id.
+        parents: Dict[int, List[nodes.Node]] = {}
+        reachable: Dict[int, nodes.Node] = {}
+        sites: List[nodes.Node] = []
+
+        stack: List[nodes.Node] = list(grammar.entities.values())
+        while stack:
+            current = stack.pop()
+            if id(current) in reachable:
+                continue
+
+            reachable[id(current)] = current
+            if isinstance(
+                current, (nodes.PlaceholderNode, nodes.ConditionNode, nodes.UniqueNode)
+            ):
+                sites.append(current)
+
+            for child in get_children(current):
+                if child is not None:
+                    parents.setdefault(id(child), []).append(current)
+                    stack.append(child)
+
+        # Nodes leading to a site, the sites included.
+        spine: Dict[int, nodes.Node] = {id(site): site for site in sites}
+        pending = list(sites)
+        while pending:
+            for parent in parents.get(id(pending.pop()), ()):
+                if id(parent) not in spine:
+                    spine[id(parent)] = parent
+                    pending.append(parent)
+
+        self._spine = list(spine.values())
+
+        # Shared nodes directly below the spine, and shared entities: binding stops there.
+        self._frontier = [
+            child
+            for node in self._spine
+            for child in get_children(node)
+            if child is not None and id(child) not in spine
+        ] + [entity for entity in grammar.entities.values() if id(entity) not in spine]
+
+    def bind(self, ctx: Context) -> nodes.Grammar:
+        """
+        Binds a context.
+        Args:
+            ctx (Context): The context to bind.
+
+        Returns:
+            The specialized grammar.
+        """
+        copies: Dict[int, nodes.Node] = {}
+
+        # Copies are allocated before their children are set, which resolves cycles (recursive entities).
+        for node in self._spine:
+            if isinstance(node, nodes.UniqueNode):
+                copies[id(node)] = nodes.UniqueNode(node.children)
+            else:
+                copies[id(node)] = copy(node)
+
+        for node in self._spine:
+            set_children(
+                copies[id(node)],
+                [
+                    copies.get(id(child), child) if child is not None else None
+                    for child in get_children(node)
+                ],
+            )
+
+        grammar = nodes.Grammar(
+            {
+                name: cast(nodes.EntityNode, copies.get(id(entity), entity))
+                for name, entity in self.grammar.entities.items()
+            },
+            self.grammar.macros,
+            self.grammar.rng,
+        )
+
+        for specialization in (Specializer(ctx), ConstantFolder()):
+            specialization.skip(self._frontier)
+            specialization.walk(grammar)
+
+        return grammar
+
+
 def optimize(grammar: nodes.Grammar, bind_ctx: Context = None) -> nodes.Grammar:
     """
     Optimizes a grammar with a given context.
@@ -285,4 +1134,265 @@ def optimize(grammar: nodes.Grammar, bind_ctx: Context = None) -> nodes.Grammar:
         Optimized grammar.
     """
     optimizer = Optimizer(grammar.entities, grammar.macros, bind_ctx)
-    return cast(nodes.Grammar, optimizer.walk(grammar))
+    folded = ConstantFolder().walk(optimizer.walk(grammar))
+    return cast(nodes.Grammar, Interner().walk(folded))
+
+
+class LazyEntities(MutableMapping[str, nodes.EntityNode]):
+    """
+    The entities of a parsed grammar, optimized on first access. Accessing an entity optimizes it along with the
+    entities and macros it references, transitively: the parts of the grammar that are never generated are never
+    optimized. Optimized entities are cached, and generate exactly like the entities of a grammar optimized up front.
+    """
+
+    def __init__(
+        self,
+        entities: Mapping[str, nodes.EntityNode],
+        macros: Dict[str, nodes.MacroNode],
+        ctx: Context = None,
+    ) -> None:
+        """
+        Constructor.
+        Args:
+            entities (Mapping[str, nodes.EntityNode]): The parsed entities.
+            macros (Dict[str, nodes.MacroNode]): The parsed macros. Optimized in place as they are used.
+            ctx (Optional[Context]): The context to bind.
+        """
+        self._entities = dict(entities)
+        self._macros = macros
+
+        # Name of every entity, by id: references resolve to entity nodes, which name the entities to optimize next.
+        self._names = {id(entity): name for name, entity in entities.items()}
+
+        # Names of the entities and macros already walked by the optimizer, and the entities fully optimized.
+        self._optimized: Set[str] = set()
+        self._optimized_macros: Set[str] = set()
+        self._ready: Dict[str, nodes.EntityNode] = {}
+
+        # Entities referenced by every walked entity, by name.
+        self._references: Dict[str, List[str]] = {}
+
+        # Error raised by the walk of every entity and macro that failed. Walks rewrite nodes in place and are
+        # memoized, so a failed walk cannot be retried: the error is raised again instead.
+        self._errors: Dict[str, Exception] = {}
+        self._macro_errors: Dict[str, Exception] = {}
+
+        # The passes are shared by every entity, so that the nodes shared between entities are optimized once. Their
+        # tables hold every node they walked: they are dropped once every entity is optimized.
+        self._optimizer: Optional[Optimizer] = Optimizer(self._entities, macros, ctx)
+        self._folder: Optional[ConstantFolder] = ConstantFolder()
+        self._interner: Optional[Interner] = Interner()
+
+    def __reduce__(self) -> Tuple[type, Tuple[List[Tuple[str, nodes.EntityNode]]]]:
+        # The passes memoize nodes by id: copies (and pickles shipped to other processes) hold optimized entities.
+        return dict, (list(self.items()),)
+
+    def __getitem__(self, name: str) -> nodes.EntityNode:
+        entity = self._ready.get(name)
+        if entity is None:
+            entity = self._optimize(name)
+        return entity
+
+    def __setitem__(self, name: str, entity: nodes.EntityNode) -> None:
+        if name in self._entities:
+            del self[name]
+
+        self._entities[name] = entity
+        self._names[id(entity)] = name
+        self._optimized.add(name)
+        self._ready[name] = entity
+
+    def __delitem__(self, name: str) -> None:
+        del self._names[id(self._entities.pop(name))]
+        self._ready.pop(name, None)
+        self._release()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entities
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entities)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def peek(self, name: str) -> nodes.EntityNode:
+        """
+        Looks up an entity without optimizing it.
+        Args:
+            name (str): The name of the entity.
+
+        Returns:
+            The entity, as parsed if it was not optimized yet.
+        """
+        return self._entities[name]
+
+    def _release(self) -> None:
+        if len(self._ready) == len(self._entities):
+            self._optimizer = None
+            self._folder = None
+            self._interner = None
+            self._references = {}
+
+    def _optimize(self, name: str) -> nodes.EntityNode:
+        assert self._optimizer is not None
+        assert self._folder is not None and self._interner is not None
+
+        entity = self._entities[name]
+        pending = [name]
+
+        while pending:
+            current_name = pending.pop()
+            if current_name in self._errors:
+                raise self._errors[current_name]
+            if current_name in self._optimized:
+                continue
+
+            current = self._entities[current_name]
+            try:
+                if current.macro is not None:
+                    self._optimize_macro(current.macro.key)
+                self._optimizer.walk(current)
+            except Exception as error:
+                self._errors[current_name] = error
+                raise
+
+            self._optimized.add(current_name)
+            self._references[current_name] = self._referenced(current)
+            pending.extend(self._references[current_name])
+
+        # Entities walked by an earlier access may reach an entity whose walk failed since.
+        self._check(name)
+
+        folded = cast(nodes.EntityNode, self._interner.walk(self._folder.walk(entity)))
+        self._ready[name] = folded
+        self._release()
+        return folded
+
+    def _referenced(self, entity: nodes.EntityNode) -> List[str]:
+        # References were resolved to the entities they name, which must be optimized as well.
+        names = []
+        seen = {id(entity)}
+        stack = list(get_children(entity))
+
+        while stack:
+            node = stack.pop()
+            if node is None or id(node) in seen:
+                continue
+            seen.add(id(node))
+
+            if isinstance(node, nodes.EntityNode):
+                if id(node) in self._names:
+                    names.append(self._names[id(node)])
+                continue
+
+            stack.extend(get_children(node))
+
+        return names
+
+    def _check(self, name: str) -> None:
+        seen = {name}
+        stack = [name]
+
+        while stack:
+            current_name = stack.pop()
+            if current_name in self._errors:
+                raise self._errors[current_name]
+
+            for referenced in self._references.get(current_name, ()):
+                if referenced not in seen:
+                    seen.add(referenced)
+                    stack.append(referenced)
+
+    def _optimize_macro(self, name: str) -> None:
+        if name in self._macro_errors:
+            raise self._macro_errors[name]
+
+        if name in self._optimized_macros or name not in self._macros:
+            # Undefined macros are reported by the optimizer.
+            return
+
+        assert self._optimizer is not None
+        try:
+            walked = self._optimizer.walk(self._macros[name])
+        except Exception as error:
+            self._macro_errors[name] = error
+            raise
+
+        self._optimized_macros.add(name)
+        self._macros[name] = cast(nodes.MacroNode, walked)
+
+
+def optimize_lazily(grammar: nodes.Grammar, bind_ctx: Context = None) -> nodes.Grammar:
+    """
+    Prepares a parsed grammar to be optimized one entity at a time, on first use (see `LazyEntities`).
+    Args:
+        grammar (nodes.Grammar): Grammar to optimize.
+        bind_ctx (Optional[Context]): Context to bind.
+
+    Returns:
+        The grammar, with lazily optimized entities.
+    """
+    grammar.entities = LazyEntities(grammar.entities, grammar.macros, bind_ctx)
+    return grammar
+
+
+def prune(grammar: nodes.Grammar, roots: Sequence[str]) -> nodes.Grammar:
+    """
+    Removes the entities and macros that cannot be reached from some root entities. Lazily optimized entities are not
+    optimized by pruning.
+    Args:
+        grammar (nodes.Grammar): The grammar to prune, in place.
+        roots (Sequence[str]): The names of the entities to keep, along with everything they reference.
+
+    Returns:
+        The pruned grammar.
+    """
+    entities = grammar.entities
+    if isinstance(entities, LazyEntities):
+        lookup: Callable[[str], nodes.EntityNode] = entities.peek
+    else:
+        lookup = entities.__getitem__
+
+    for name in roots:
+        if name not in entities:
+            raise NameError(f'entity "{name}" is not defined')
+
+    names = {id(lookup(name)): name for name in entities}
+    reached_entities: Set[str] = set()
+    reached_macros: Set[str] = set()
+
+    seen: Set[int] = set()
+    stack: List[Optional[nodes.Node]] = [lookup(name) for name in roots]
+
+    while stack:
+        node = stack.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        if isinstance(node, nodes.ReferenceNode):
+            # References to macro parameters name no entity.
+            if node.key in entities:
+                stack.append(lookup(node.key))
+            continue
+
+        if isinstance(node, nodes.MacroNode):
+            stack.extend(node.children)
+            continue
+
+        if isinstance(node, nodes.EntityNode):
+            if id(node) in names:
+                reached_entities.add(names[id(node)])
+            if node.macro is not None and node.macro.key in grammar.macros:
+                reached_macros.add(node.macro.key)
+                stack.append(grammar.macros[node.macro.key])
+
+        stack.extend(get_children(node))
+
+    for name in [name for name in entities if name not in reached_entities]:
+        del entities[name]
+    for name in [name for name in grammar.macros if name not in reached_macros]:
+        del grammar.macros[name]
+
+    return grammar
@@ -0,0 +1,135 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from txtgen.context import ContextLike
+from txtgen.vm import Generator
+
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Set
+
+import os
+import random
+
+
+# Set once per worker process by the pool initializer, so the grammar is only shipped once per worker.
+_worker_generator: Optional[Generator] = None
+_worker_ctx: ContextLike = None
+
+
+def shard_seed(seed: int, shard: int) -> str:
+    """
+    Derives the seed of a shard from the seed of the run.
+    Args:
+        seed (int): The seed of the run.
+        shard (int): The index of the shard.
+
+    Returns:
+        The shard seed.
+    """
+    # String seeds are hashed with SHA-512 by random.Random, so neighbouring shards get unrelated streams.
+    return f"{seed}:{shard}"
+
+
+def _initialize_worker(generator: Generator, ctx: ContextLike) -> None:
+    global _worker_generator, _worker_ctx
+    _worker_generator = generator
+    _worker_ctx = ctx
+
+
+def _generate_shard(entity_name: str, n: int, seed: str) -> List[str]:
+    assert _worker_generator is not None
+    return _worker_generator.generate_many(  # type: ignore
+        entity_name, n, _worker_ctx, rng=seed
+    )
+
+
+def generate_parallel(
+    generator: Generator,
+    entity_name: str,
+    n: int,
+    ctx: ContextLike = None,
+    seed: int = None,
+    workers: int = None,
+    shard_size: int = 1000,
+    ordered: bool = True,
+) -> Iterator[str]:
+    """
+    Generates values for an entity in a pool of worker processes.
+
+    The work is split in shards of `shard_size` values, each generated with a seed derived from `seed` and the index of
+    the shard. The combined output therefore only depends on `seed` and `shard_size`, not on the number of workers.
+    Args:
+        generator (Generator): The grammar or compiled program to generate from.
+        entity_name (str): The name of the entity to generate.
+        n (int): The number of values to generate.
+        ctx (ContextLike): The generation context.
+        seed (Optional[int]): The seed of the run. A random seed is picked if not set.
+        workers (Optional[int]): The number of worker processes. Defaults to the number of CPUs.
+        shard_size (int): The number of values generated per task.
+        ordered (bool): Yield values in shard order. Otherwise, shards are yielded as soon as they complete.
+
+    Returns:
+        An iterator over the generated values.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be positive")
+
+    run_seed = seed if seed is not None else random.SystemRandom().getrandbits(64)
+    n_workers = workers or os.cpu_count() or 1
+
+    return _generate_shards(
+        generator, entity_name, n, ctx, run_seed, n_workers, shard_size, ordered
+    )
+
+
+def _generate_shards(
+    generator: Generator,
+    entity_name: str,
+    n: int,
+    ctx: ContextLike,
+    seed: int,
+    n_workers: int,
+    shard_size: int,
+    ordered: bool,
+) -> Iterator[str]:
+    n_shards = -(-n // shard_size)
+    next_shard = 0
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_initialize_worker,
+        initargs=(generator, ctx),
+    ) as executor:
+        # Keep a bounded number of shards in flight so memory stays flat regardless of `n`.
+        window = 2 * n_workers
+        pending: Deque[Future] = deque()
+
+        def submit() -> None:
+            nonlocal next_shard
+            size = min(shard_size, n - next_shard * shard_size)
+            pending.append(
+                executor.submit(
+                    _generate_shard, entity_name, size, shard_seed(seed, next_shard)
+                )
+            )
+            next_shard += 1
+
+        while next_shard < n_shards and len(pending) < window:
+            submit()
+
+        if ordered:
+            while pending:
+                shard = pending.popleft().result()
+                if next_shard < n_shards:
+                    submit()
+                yield from shard
+
+        else:
+            running: Set[Future] = set(pending)
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    if next_shard < n_shards:
+                        submit()
+                        running.add(pending[-1])
+                    yield from future.result()
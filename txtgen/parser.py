@@ -148,13 +148,11 @@ class DescentParser:
                 repeat = self.repeat()
                 return repeat
 
-            children = []
-
-            while not self._accept(TokenType.ParenClose):
-                children.append(self.expression())
-
             if fn_type == Function.Any:
-                return nodes.AnyNode(children)
+                return self.any()
+
+            if fn_type == Function.Unique:
+                return self.unique()
 
         children = []
         while not self._accept(TokenType.ParenClose):
@@ -162,6 +160,35 @@ class DescentParser:
 
         return nodes.ListNode(children)
 
+    def any(self) -> nodes.AnyNode:
+        children = []
+        weights = []
+
+        while not self._accept(TokenType.ParenClose):
+            # Children can be prefixed by an integer weight, and default to a weight of 1.
+            if self._accept(TokenType.Integer):
+                assert self.current_token is not None
+                weights.append(cast(int, self.current_token.value))
+            else:
+                weights.append(1)
+
+            children.append(self.expression())
+
+        if all(weight == 1 for weight in weights):
+            return nodes.AnyNode(children)
+
+        if sum(weights) == 0:
+            raise SyntaxError("Expected at least one positive weight in any")
+
+        return nodes.AnyNode(children, weights)
+
+    def unique(self) -> nodes.UniqueNode:
+        children = []
+        while not self._accept(TokenType.ParenClose):
+            children.append(self.expression())
+
+        return nodes.UniqueNode(children)
+
     def repeat(self) -> nodes.RepeatNode:
         self._expect(TokenType.Integer)
         assert self.current_token is not None
@@ -0,0 +1,175 @@
+from typing import Iterator, List, Sequence, Union, cast
+
+import hashlib
+import random
+
+
+Weight = Union[int, float]
+
+
+class AliasTable:
+    """
+    Walker's alias table: samples index `i` with probability `weights[i] / sum(weights)` in constant time, regardless
+    of the number of weights or of how skewed they are.
+
+    Integer weights are sampled exactly, with a single call to `randrange`. Other weights use a single call to
+    `random`.
+    """
+
+    __slots__ = ("weights", "exact", "total", "thresholds", "aliases")
+
+    def __init__(self, weights: Sequence[Weight]) -> None:
+        """
+        Constructor.
+        Args:
+            weights (Sequence[Weight]): The relative weight of every index.
+        """
+        if not weights:
+            raise ValueError("cannot sample from an empty set of weights")
+
+        if any(weight < 0 for weight in weights):
+            raise ValueError("weights must not be negative")
+
+        weight_sum = sum(weights)
+        if weight_sum <= 0:
+            raise ValueError("at least one weight must be positive")
+
+        n = len(weights)
+        self.weights = tuple(weights)
+        self.exact = all(isinstance(weight, int) for weight in weights)
+
+        # Every column of the table holds `total` units of probability: its own share, topped up by an alias.
+        # Integer weights are scaled by `n` instead of divided by their sum, so the arithmetic stays exact.
+        if self.exact:
+            self.total: Weight = weight_sum
+            scaled: List[Weight] = [weight * n for weight in weights]
+        else:
+            self.total = 1.0
+            scaled = [weight * n / weight_sum for weight in weights]
+
+        self.thresholds: List[Weight] = [self.total] * n
+        self.aliases = list(range(n))
+
+        small = [i for i, weight in enumerate(scaled) if weight < self.total]
+        large = [i for i, weight in enumerate(scaled) if weight >= self.total]
+
+        while small and large:
+            under, over = small.pop(), large.pop()
+
+            self.thresholds[under] = scaled[under]
+            self.aliases[under] = over
+
+            scaled[over] -= self.total - scaled[under]
+            if scaled[over] < self.total:
+                small.append(over)
+            else:
+                large.append(over)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, AliasTable):
+            return NotImplemented  # pragma: nocover
+
+        return self.weights == other.weights
+
+    def __repr__(self) -> str:
+        return f"AliasTable({list(self.weights)!r})"
+
+    def sample(self, rng: random.Random) -> int:
+        """
+        Draws an index.
+        Args:
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The drawn index.
+        """
+        n = len(self.thresholds)
+
+        if self.exact:
+            total = cast(int, self.total)
+            column, remainder = divmod(rng.randrange(n * total), total)
+            threshold: Weight = remainder
+        else:
+            draw = rng.random() * n
+            column = int(draw)
+            threshold = draw - column
+
+        if threshold < self.thresholds[column]:
+            return column
+        return self.aliases[column]
+
+
+class FeistelPermutation:
+    """
+    A random permutation of `range(n)`, computed index by index: `permutation[i]` costs a few hash evaluations and no
+    memory, however large `n` is. Walking the permutation in order samples `range(n)` without replacement.
+
+    The permutation is a keyed Feistel network over the smallest power of four above `n`, a bijection on that domain.
+    Indices falling outside of `range(n)` are fed back into the network (cycle walking) until they fall inside, which
+    keeps the bijection and takes less than four rounds on average.
+    """
+
+    __slots__ = ("n", "half_bits", "half_mask", "keys")
+
+    ROUNDS = 4
+
+    def __init__(self, n: int, rng: random.Random) -> None:
+        """
+        Constructor.
+        Args:
+            n (int): The number of indices to permute.
+            rng (random.Random): The random number generator drawing the permutation key.
+        """
+        if n < 1:
+            raise ValueError("cannot permute an empty range")
+
+        self.n = n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        self.keys = [
+            rng.getrandbits(64).to_bytes(8, "little") for _ in range(self.ROUNDS)
+        ]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _round(self, key: bytes, value: int) -> int:
+        size = (self.half_bits + 7) // 8
+        digest = hashlib.blake2b(
+            value.to_bytes(size, "little"), key=key, digest_size=min(size, 64)
+        ).digest()
+
+        # Halves wider than a single digest are extended by hashing the digest again.
+        while len(digest) < size:
+            digest += hashlib.blake2b(digest, key=key).digest()
+
+        return int.from_bytes(digest[:size], "little") & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(key, right)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, index: int) -> int:
+        """
+        Looks up the image of an index.
+        Args:
+            index (int): The index, between 0 and `n - 1`.
+
+        Returns:
+            The permuted index.
+        """
+        if not 0 <= index < self.n:
+            raise IndexError(f"index {index} out of range for {self.n} indices")
+
+        value = self._encrypt(index)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        return (self[index] for index in range(self.n))
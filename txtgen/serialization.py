@@ -0,0 +1,470 @@
+from txtgen import nodes
+from txtgen.context import WordList
+from txtgen.sampling import AliasTable, Weight
+
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import gc
+import hashlib
+import struct
+import sys
+import zlib
+
+MAGIC = b"TXTG"
+
+# Bumped whenever the layout changes: artifacts written by another version are rejected.
+FORMAT_VERSION = 1
+
+# Magic, format version, reserved, source digest, payload length, payload CRC-32.
+HEADER = struct.Struct("<4sHH32sII")
+
+# Encodes a missing node (e.g. an optional `else` branch).
+NONE = 0xFFFFFFFF
+
+# Node tags, one per node class.
+LITERAL = 1
+PLACEHOLDER = 2
+REFERENCE = 3
+PARAMETER = 4
+MACRO = 5
+MACRO_REFERENCE = 6
+ENTITY = 7
+ANY = 8
+OPTIONAL = 9
+LIST = 10
+REPEAT = 11
+CONDITION = 12
+UNIQUE = 13
+VALUE_TABLE = 14
+WORD_LIST = 15
+
+NODE_TYPES: Dict[int, Type[nodes.Node]] = {
+    LITERAL: nodes.LiteralNode,
+    PLACEHOLDER: nodes.PlaceholderNode,
+    REFERENCE: nodes.ReferenceNode,
+    PARAMETER: nodes.ParameterNode,
+    MACRO: nodes.MacroNode,
+    MACRO_REFERENCE: nodes.MacroReferenceNode,
+    ENTITY: nodes.EntityNode,
+    ANY: nodes.AnyNode,
+    OPTIONAL: nodes.OptionalNode,
+    LIST: nodes.ListNode,
+    REPEAT: nodes.RepeatNode,
+    CONDITION: nodes.ConditionNode,
+    UNIQUE: nodes.UniqueNode,
+    VALUE_TABLE: nodes.ValueTableNode,
+    WORD_LIST: nodes.WordListNode,
+}
+
+NODE_TAGS = {node_type: tag for tag, node_type in NODE_TYPES.items()}
+
+# Weight kinds of an AnyNode or a ValueTableNode.
+UNWEIGHTED = 0
+INT_WEIGHTS = 1
+FLOAT_WEIGHTS = 2
+
+
+def source_digest(src: str) -> bytes:
+    """
+    Computes the digest identifying the source of a grammar.
+    Args:
+        src (str): The grammar source.
+
+    Returns:
+        The SHA-256 digest of the source.
+    """
+    return hashlib.sha256(src.encode("utf-8")).digest()
+
+
+def _words(data: bytes) -> array:
+    words = array("I")
+    assert words.itemsize == 4
+    words.frombytes(data)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+class _Encoder:
+    """
+    Flattens a generation graph to an array of 32-bit words. Nodes are numbered in the order they are first reached,
+    so shared sub-nodes (and recursive entities) are written once and referenced by index.
+    """
+
+    def __init__(self) -> None:
+        self.strings: Dict[str, int] = {}
+        self.indices: Dict[int, int] = {}
+        self.pending: List[nodes.Node] = []
+        self.offsets: List[int] = []
+        self.words: List[int] = []
+
+    def string(self, value: str) -> int:
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        return self.strings[value]
+
+    def node(self, node: Optional[nodes.Node]) -> int:
+        if node is None:
+            return NONE
+
+        if id(node) not in self.indices:
+            self.indices[id(node)] = len(self.pending)
+            self.pending.append(node)
+        return self.indices[id(node)]
+
+    def node_list(self, children: Sequence[Optional[nodes.Node]]) -> List[int]:
+        return [len(children), *(self.node(child) for child in children)]
+
+    def weights(self, weights: Sequence[Weight]) -> Tuple[int, List[int]]:
+        # Weights go through the string table: it round-trips big integers and floats exactly.
+        kind = (
+            INT_WEIGHTS if all(isinstance(w, int) for w in weights) else FLOAT_WEIGHTS
+        )
+        return kind, [self.string(repr(weight)) for weight in weights]
+
+    def record(self, node: nodes.Node) -> List[int]:
+        try:
+            tag = NODE_TAGS[type(node)]
+        except KeyError:
+            raise TypeError(f"cannot serialize node of type {node.type}")
+
+        if isinstance(
+            node, (nodes.PlaceholderNode, nodes.ReferenceNode, nodes.MacroReferenceNode)
+        ):
+            return [tag, self.string(node.key)]
+
+        if isinstance(node, nodes.LiteralNode):
+            return [tag, self.string(node.value)]
+
+        if isinstance(node, nodes.ParameterNode):
+            return [tag, self.string(node.name), self.node(node.value)]
+
+        if isinstance(node, nodes.MacroNode):
+            return [
+                tag,
+                self.string(node.name),
+                *self.node_list(node.params),
+                *self.node_list(node.children),
+            ]
+
+        if isinstance(node, nodes.EntityNode):
+            return [
+                tag,
+                self.string(node.name),
+                self.node(node.macro),
+                *self.node_list(node.children),
+            ]
+
+        if isinstance(node, nodes.AnyNode):
+            if node.weights is None:
+                return [tag, UNWEIGHTED, *self.node_list(node.children)]
+
+            kind, weights = self.weights(node.weights)
+            return [tag, kind, *self.node_list(node.children), *weights]
+
+        if isinstance(node, nodes.ValueTableNode):
+            # The text is stored whole, followed by the end offset of every value.
+            record = [tag, UNWEIGHTED, self.string(node.text), len(node)]
+            record.extend(node.offsets[1:])
+            if node.table is not None:
+                record[1], weights = self.weights(node.table.weights)
+                record.extend(weights)
+            return record
+
+        if isinstance(node, nodes.WordListNode):
+            # Word lists are referenced by path: the files must be readable where the grammar is loaded.
+            return [
+                tag,
+                self.string(node.words.path),
+                self.string(node.words.index_path),
+            ]
+
+        if isinstance(node, nodes.OptionalNode):
+            return [tag, self.node(node.expression)]
+
+        if isinstance(node, (nodes.ListNode, nodes.UniqueNode)):
+            return [tag, *self.node_list(node.children)]
+
+        if isinstance(node, nodes.RepeatNode):
+            return [tag, node.n_repeat, self.node(node.expression)]
+
+        assert isinstance(node, nodes.ConditionNode)
+        left, right = node.condition
+        return [
+            tag,
+            self.node(left),
+            self.node(right),
+            self.node(node.expression),
+            self.node(node.else_expression),
+        ]
+
+    def encode(self, grammar: nodes.Grammar) -> bytes:
+        roots = [
+            *(
+                (self.string(name), self.node(entity))
+                for name, entity in grammar.entities.items()
+            ),
+            *(
+                (self.string(name), self.node(macro))
+                for name, macro in grammar.macros.items()
+            ),
+        ]
+
+        # Records are written in index order; encoding a record may append new nodes to the queue.
+        position = 0
+        while position < len(self.pending):
+            self.offsets.append(len(self.words))
+            self.words.extend(self.record(self.pending[position]))
+            position += 1
+
+        blob = bytearray()
+        string_offsets = [0]
+        for value in self.strings:
+            blob += value.encode("utf-8")
+            string_offsets.append(len(blob))
+
+        # Everything but the string blob is a flat, aligned array of 32-bit words.
+        counts = [
+            len(self.strings),
+            len(self.offsets),
+            len(self.words),
+            len(grammar.entities),
+            len(grammar.macros),
+        ]
+        words = array("I", counts + string_offsets + self.offsets + self.words)
+        for name, index in roots:
+            words.extend((name, index))
+
+        if sys.byteorder == "big":
+            words.byteswap()
+        return words.tobytes() + bytes(blob)
+
+
+class _Decoder:
+    """
+    Rebuilds a generation graph from its flattened form. Nodes are allocated first and filled in a second pass, so
+    references between them (including cycles) resolve to the shared instances.
+    """
+
+    def __init__(self, payload: bytes) -> None:
+        n_strings, n_nodes, n_words, n_entities, n_macros = _words(payload[:20])
+
+        n_header_words = (
+            5 + (n_strings + 1) + n_nodes + n_words + 2 * (n_entities + n_macros)
+        )
+        words = _words(payload[: 4 * n_header_words])
+        blob = payload[4 * n_header_words :]
+
+        cursor = 5
+        string_offsets = words[cursor : cursor + n_strings + 1]
+        cursor += n_strings + 1
+        self.strings = [
+            blob[string_offsets[i] : string_offsets[i + 1]].decode("utf-8")
+            for i in range(n_strings)
+        ]
+
+        self.offsets = words[cursor : cursor + n_nodes]
+        cursor += n_nodes
+        self.words = words[cursor : cursor + n_words]
+        cursor += n_words
+
+        self.roots = [
+            (self.strings[words[i]], words[i + 1])
+            for i in range(cursor, cursor + 2 * (n_entities + n_macros), 2)
+        ]
+        self.n_entities = n_entities
+
+        node_types = [NODE_TYPES[self.words[offset]] for offset in self.offsets]
+        self.nodes = [node_type.__new__(node_type) for node_type in node_types]
+
+    def node(self, index: int) -> Optional[nodes.Node]:
+        return None if index == NONE else self.nodes[index]
+
+    def children(self, cursor: int) -> Tuple[List[Optional[nodes.Node]], int]:
+        count = self.words[cursor]
+        all_nodes = self.nodes
+        children = [
+            None if index == NONE else all_nodes[index]
+            for index in self.words[cursor + 1 : cursor + 1 + count]
+        ]
+        return children, cursor + 1 + count
+
+    def weights(self, kind: int, indices: Sequence[int]) -> List[Weight]:
+        parse = int if kind == INT_WEIGHTS else float
+        return [parse(self.strings[i]) for i in indices]
+
+    def fill(self, node: nodes.Node, cursor: int) -> None:
+        words, strings = self.words, self.strings
+        tag = words[cursor]
+        cursor += 1
+
+        if tag in (PLACEHOLDER, REFERENCE, MACRO_REFERENCE):
+            node.key = strings[words[cursor]]  # type: ignore
+
+        elif tag == LITERAL:
+            node.value = strings[words[cursor]]  # type: ignore
+
+        elif tag == PARAMETER:
+            node.name = strings[words[cursor]]  # type: ignore
+            node.value = self.node(words[cursor + 1])  # type: ignore
+
+        elif tag == MACRO:
+            node.name = strings[words[cursor]]  # type: ignore
+            node.params, cursor = self.children(cursor + 1)  # type: ignore
+            node.children, _ = self.children(cursor)  # type: ignore
+
+        elif tag == ENTITY:
+            node.name = strings[words[cursor]]  # type: ignore
+            node.macro = self.node(words[cursor + 1])  # type: ignore
+            node.children, _ = self.children(cursor + 2)  # type: ignore
+
+        elif tag == ANY:
+            kind = words[cursor]
+            node.children, cursor = self.children(cursor + 1)  # type: ignore
+            node.weights = None  # type: ignore
+            node.table = None  # type: ignore
+
+            if kind != UNWEIGHTED:
+                count = len(node.children)  # type: ignore
+                node.weights = self.weights(kind, words[cursor : cursor + count])  # type: ignore
+
+        elif tag == VALUE_TABLE:
+            kind = words[cursor]
+            node.text = strings[words[cursor + 1]]  # type: ignore
+
+            count = words[cursor + 2]
+            cursor += 3
+            node.offsets = array(words.typecode, [0])  # type: ignore
+            node.offsets.extend(words[cursor : cursor + count])  # type: ignore
+            node.table = None  # type: ignore
+
+            if kind != UNWEIGHTED:
+                weights = self.weights(kind, words[cursor + count : cursor + 2 * count])
+                node.table = AliasTable(weights)  # type: ignore
+
+        elif tag == WORD_LIST:
+            path, index_path = strings[words[cursor]], strings[words[cursor + 1]]
+            node.__init__(WordList(path, index_path))  # type: ignore
+
+        elif tag == OPTIONAL:
+            node.expression = self.node(words[cursor])  # type: ignore
+
+        elif tag == LIST:
+            node.children, _ = self.children(cursor)  # type: ignore
+
+        elif tag == UNIQUE:
+            # Also resets the sampling state.
+            node.__init__(self.children(cursor)[0])  # type: ignore
+
+        elif tag == REPEAT:
+            node.n_repeat = words[cursor]  # type: ignore
+            node.expression = self.node(words[cursor + 1])  # type: ignore
+
+        else:
+            node.condition = (self.node(words[cursor]), self.node(words[cursor + 1]))  # type: ignore
+            node.expression = self.node(words[cursor + 2])  # type: ignore
+            node.else_expression = self.node(words[cursor + 3])  # type: ignore
+
+    def decode(self, rng: nodes.RandomSource = None) -> nodes.Grammar:
+        for node, offset in zip(self.nodes, self.offsets):
+            self.fill(node, offset)
+
+        entities = {
+            name: self.nodes[index] for name, index in self.roots[: self.n_entities]
+        }
+        macros = {
+            name: self.nodes[index] for name, index in self.roots[self.n_entities :]
+        }
+        return nodes.Grammar(entities, macros, rng)  # type: ignore
+
+
+def dumps(grammar: nodes.Grammar, source: str = None) -> bytes:
+    """
+    Serializes an optimized grammar.
+    Args:
+        grammar (nodes.Grammar): The grammar to serialize.
+        source (Optional[str]): The source the grammar was built from. Recorded so that `loads` can reject the
+            artifact once the source changes.
+
+    Returns:
+        The serialized grammar.
+    """
+    payload = _Encoder().encode(grammar)
+    digest = source_digest(source) if source is not None else bytes(32)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, digest, len(payload), zlib.crc32(payload)
+    )
+    return header + payload
+
+
+def loads(
+    data: bytes, source: str = None, rng: nodes.RandomSource = None
+) -> nodes.Grammar:
+    """
+    Deserializes a grammar serialized by `dumps`.
+    Args:
+        data (bytes): The serialized grammar.
+        source (Optional[str]): If set, the artifact is rejected unless it was built from this source.
+        rng (RandomSource): Default random source of the grammar.
+
+    Returns:
+        The grammar.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("truncated grammar artifact")
+
+    magic, version, _, digest, length, checksum = HEADER.unpack_from(data)
+
+    if magic != MAGIC:
+        raise ValueError("not a grammar artifact")
+
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"unsupported grammar artifact version {version} (expected {FORMAT_VERSION})"
+        )
+
+    if source is not None and digest != source_digest(source):
+        raise ValueError("grammar artifact is stale: it was built from another source")
+
+    payload = data[HEADER.size : HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise ValueError("corrupted grammar artifact")
+
+    # The decoder only allocates: pausing the cyclic garbage collector avoids repeated full collections.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _Decoder(payload).decode(rng)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def dump(grammar: nodes.Grammar, path: str, source: str = None) -> None:
+    """
+    Writes an optimized grammar to a file.
+    Args:
+        grammar (nodes.Grammar): The grammar to serialize.
+        path (str): The path of the file to write.
+        source (Optional[str]): The source the grammar was built from.
+    """
+    with open(path, "wb") as outfile:
+        outfile.write(dumps(grammar, source))
+
+
+def load(
+    path: str, source: str = None, rng: nodes.RandomSource = None
+) -> nodes.Grammar:
+    """
+    Reads a grammar written by `dump`.
+    Args:
+        path (str): The path of the file to read.
+        source (Optional[str]): If set, the artifact is rejected unless it was built from this source.
+        rng (RandomSource): Default random source of the grammar.
+
+    Returns:
+        The grammar.
+    """
+    with open(path, "rb") as infile:
+        return loads(infile.read(), source, rng)
@@ -0,0 +1,70 @@
+from txtgen.context import ContextLike
+from txtgen.nodes import RandomSource, Write, make_rng
+from txtgen.vm import Generator
+
+from typing import List, TextIO, Union
+
+
+Output = Union[TextIO, bytearray]
+
+
+def writer_for(out: Output, encoding: str = "utf-8") -> Write:
+    """
+    Builds a writer appending fragments to a text stream or a bytearray.
+    Args:
+        out (Output): The text stream or bytearray to write to.
+        encoding (str): The encoding used when writing to a bytearray.
+
+    Returns:
+        The writer.
+    """
+    if isinstance(out, bytearray):
+        extend = out.extend
+        return lambda fragment: extend(fragment.encode(encoding))
+
+    return out.write
+
+
+def dump(
+    generator: Generator,
+    entity_name: str,
+    n: int,
+    out: Union[str, Output],
+    ctx: ContextLike = None,
+    rng: RandomSource = None,
+    chunk_size: int = 1024,
+    encoding: str = "utf-8",
+) -> None:
+    """
+    Writes values for an entity as newline-delimited text. Fragments are buffered and written in bulk, one write per
+    chunk of values.
+    Args:
+        generator (Generator): The grammar or compiled program to generate from.
+        entity_name (str): The name of the entity to generate.
+        n (int): The number of values to generate.
+        out (Union[str, Output]): The path of the file to write, or a text stream or bytearray.
+        ctx (ContextLike): The generation context.
+        rng (RandomSource): Random source for the run. Defaults to the random source of the generator.
+        chunk_size (int): The number of values buffered between two writes.
+        encoding (str): The encoding of the output file or bytearray.
+    """
+    if isinstance(out, str):
+        with open(out, "w", encoding=encoding, newline="\n") as outfile:
+            dump(generator, entity_name, n, outfile, ctx, rng, chunk_size, encoding)
+        return
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+    write = writer_for(out, encoding)
+
+    # Resolve the random source once so that seeded runs continue the same stream across chunks.
+    generator_rng = make_rng(rng if rng is not None else generator.rng)
+
+    buffer: List[str] = []
+    for start in range(0, n, chunk_size):
+        generator.write_many(
+            entity_name, min(chunk_size, n - start), buffer.append, ctx, generator_rng
+        )
+        write("".join(buffer))
+        buffer.clear()
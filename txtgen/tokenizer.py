@@ -1,5 +1,5 @@
 from txtgen.constants import Function, TokenType
-from typing import Any, Iterator, Tuple, Union, List
+from typing import Any, Iterator, Tuple
 
 
 class Token:
@@ -24,7 +24,7 @@ class Token:
         Returns:
             The token value.
         """
-        return self._value or self.type.value
+        return self._value if self._value is not None else self.type.value
 
     def __str__(self) -> str:
         return f"<{self.type.name} value='{self.value or self.type.value}'>"
@@ -51,61 +51,87 @@ def validate_alpha(char: str) -> bool:
     return char.isalpha() or char == "_" or char == "."
 
 
-def extract_string(input_string: Union[str, List[str]]) -> Tuple[str, List[str]]:
+def extract_string(input_string: str, start: int = 0) -> Tuple[str, int]:
     """
-    Recursively extracts a string from a stream.
+    Extracts a string from a stream.
     Args:
         input_string (str): The input string.
+        start (int): The position of the first character of the string.
 
     Returns:
-        Head & tail, head being the extracted string, tail being what is left to process.
+        The extracted string, and the position of the first character that is left to process.
     """
-    head, *tail = input_string
+    if start >= len(input_string):
+        raise SyntaxError("Unexpected EOF.")
 
-    if len(tail) != 0 and validate_alpha(tail[0]):
-        body, next_tail = extract_string(tail)
-        return "".join([head, body]), next_tail
+    end = start + 1
+    while end < len(input_string) and validate_alpha(input_string[end]):
+        end += 1
 
     # Alphanum chain has stopped.
-    return head, tail
+    return input_string[start:end], end
 
 
-def extract_integer(input_string: Union[str, List[str]]) -> Tuple[str, List[str]]:
+def extract_integer(input_string: str, start: int = 0) -> Tuple[str, int]:
     """
-    Recursively extracts a number from a stream.
+    Extracts a number from a stream.
     Args:
         input_string (str): The input string.
+        start (int): The position of the first digit of the number.
 
     Returns:
-        Head & tail, head being the extracted number, tail being what is left to process
+        The extracted number, and the position of the first character that is left to process.
     """
-    head, *tail = input_string
-    if len(tail) != 0 and tail[0].isdigit():
-        body, next_tail = extract_integer(tail)
-        return "".join([head, body]), next_tail
+    if start >= len(input_string):
+        raise SyntaxError("Unexpected EOF.")
 
-    return head, tail
+    end = start + 1
+    while end < len(input_string) and input_string[end].isdigit():
+        end += 1
 
+    return input_string[start:end], end
 
-def extract_literal(input_string: Union[List[str], Any]) -> Tuple[str, List[str]]:
+
+def extract_literal(input_string: str, start: int = 0) -> Tuple[str, int]:
     """
-    Recursively extracts a literal from a stream.
+    Extracts a literal from a stream.
     Args:
         input_string (str): The input string.
+        start (int): The position of the first character of the literal (after the opening double-quote).
 
     Returns:
-        Head & tail, head being the extracted literal, tail being what is left to process.
+        The extracted literal, and the position of the first character that is left to process.
     """
-    head, *tail = input_string
+    if start >= len(input_string):
+        raise SyntaxError("Unexpected EOF.")
+
+    end = input_string.find('"', start + 1)
+    if end == -1:
+        return input_string[start:], len(input_string)
+
+    return input_string[start:end], end + 1  # Skip closing double-quote
+
 
-    if len(tail) >= 1 and tail[0] != '"':
-        body, next_tail = extract_literal(tail)
-        return "".join([head, body]), next_tail
+SINGLE_CHAR_TOKENS = {
+    ")": TokenType.ParenClose,
+    "=": TokenType.Equal,
+    "(": TokenType.ParenOpen,
+    "<": TokenType.AngleOpen,
+    ">": TokenType.AngleClose,
+    "[": TokenType.BracketOpen,
+    "]": TokenType.BracketClose,
+}
 
-    return head, tail[1:]  # Skip closing double-quote
+KEYWORDS = {
+    "grammar": TokenType.Grammar,
+    "entity": TokenType.Entity,
+    "macro": TokenType.Macro,
+}
 
+FUNCTIONS = {fn.value: fn for fn in Function}
 
-def tokenize(input_string: Union[str, List[str]]) -> Iterator[Token]:
+
+def tokenize(input_string: str) -> Iterator[Token]:
     """
     Generates a token stream from source code.
     Args:
@@ -114,73 +140,46 @@ def tokenize(input_string: Union[str, List[str]]) -> Iterator[Token]:
     Returns:
         A token iterator.
     """
-    if not input_string:
-        return
+    position = 0
+    length = len(input_string)
 
-    head, *tail = input_string
+    while position < length:
+        head = input_string[position]
 
-    if head == ")":
-        yield Token(TokenType.ParenClose)
+        if head in SINGLE_CHAR_TOKENS:
+            yield Token(SINGLE_CHAR_TOKENS[head])
+            position += 1
 
-    elif head == "=":
-        yield Token(TokenType.Equal)
+        elif head.isspace() or head == ",":
+            # We want to ignore whitespace & commas in enumerations
+            position += 1
 
-    elif head == "(":
-        yield Token(TokenType.ParenOpen)
+        elif head == "$":
+            body, position = extract_string(input_string, position + 1)
+            yield Token(TokenType.Placeholder, body)
 
-    elif head == "<":
-        yield Token(TokenType.AngleOpen)
+        elif head.isdigit():
+            body, position = extract_integer(input_string, position)
+            if "." not in body:
+                yield Token(TokenType.Integer, int(body))
+            else:
+                raise SyntaxError("Floats are not supported yet.")
 
-    elif head == ">":
-        yield Token(TokenType.AngleClose)
+        elif validate_alpha(head):
+            body, position = extract_string(input_string, position)
 
-    elif head == "[":
-        yield Token(TokenType.BracketOpen)
+            if body in KEYWORDS:
+                yield Token(KEYWORDS[body])
 
-    elif head == "]":
-        yield Token(TokenType.BracketClose)
+            elif body in FUNCTIONS:
+                yield Token(TokenType.Function, FUNCTIONS[body])
 
-    elif head.isspace() or head == ",":
-        # We want to ignore whitespace & commas in enumerations
-        pass
+            else:
+                yield Token(TokenType.Symbol, body)
 
-    elif head == "$":
-        body, tail = extract_string(tail)
-        yield Token(TokenType.Placeholder, body)
+        elif head == '"':
+            body, position = extract_literal(input_string, position + 1)
+            yield Token(TokenType.Literal, body)
 
-    elif head.isdigit():
-        body, tail = extract_integer(input_string)
-        if "." not in body:
-            yield Token(TokenType.Integer, int(body))
         else:
-            raise SyntaxError("Floats are not supported yet.")
-
-    elif validate_alpha(head):
-        body, tail = extract_string(input_string)
-
-        if body == "grammar":
-            yield Token(TokenType.Grammar)
-
-        elif body == "entity":
-            yield Token(TokenType.Entity)
-
-        elif body == "macro":
-            yield Token(TokenType.Macro)
-
-        elif body in ["any", "if", "repeat"]:
-            for enum_itm in [Function.Any, Function.If, Function.Repeat]:
-                if body == enum_itm.value:
-                    yield Token(TokenType.Function, enum_itm)
-                    break
-
-        else:
-            yield Token(TokenType.Symbol, body)
-
-    elif head == '"':
-        body, tail = extract_literal(tail)
-        yield Token(TokenType.Literal, body)
-
-    else:
-        raise SyntaxError(f"Unknown Token: '{head}'")
-
-    yield from tokenize(tail)
+            raise SyntaxError(f"Unknown Token: '{head}'")
@@ -0,0 +1,443 @@
+from txtgen import nodes
+from txtgen.codegen import CompiledGrammar
+from txtgen.context import Context, ContextLike, as_context
+from txtgen.nodes import DEFAULT_RNG, RandomSource, StrippedWriter, Write, make_rng
+from txtgen.optimizer import get_children
+from txtgen.sampling import AliasTable
+
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import random
+
+# Opcodes are plain ints rather than an Enum: the dispatch loop compares them on every instruction.
+HALT = 0
+EMIT = 1
+PICK = 2
+MAYBE = 3
+JUMP = 4
+CALL = 5
+RETURN = 6
+EVAL = 7
+PICK_WEIGHTED = 8
+REPEAT = 9
+LOOP = 10
+
+OPCODE_NAMES = {
+    HALT: "HALT",
+    EMIT: "EMIT",
+    PICK: "PICK",
+    MAYBE: "MAYBE",
+    JUMP: "JUMP",
+    CALL: "CALL",
+    RETURN: "RETURN",
+    EVAL: "EVAL",
+    PICK_WEIGHTED: "PICK_WEIGHTED",
+    REPEAT: "REPEAT",
+    LOOP: "LOOP",
+}
+
+# Nodes compiled once, as a subroutine, when they have several parents. Literals and delegated nodes are a single
+# instruction and are always inlined.
+SUBROUTINE_NODES = (
+    nodes.ListNode,
+    nodes.AnyNode,
+    nodes.OptionalNode,
+    nodes.RepeatNode,
+    nodes.ParameterNode,
+)
+
+Instruction = Tuple[int, Any]
+
+
+class Program:
+    """
+    A grammar lowered to a flat instruction array, executed by a single dispatch loop.
+    """
+
+    def __init__(
+        self,
+        code: List[Instruction],
+        entry_points: Dict[str, int],
+        rng: RandomSource = None,
+    ) -> None:
+        """
+        Constructor.
+        Args:
+            code (List[Instruction]): The instruction array.
+            entry_points (Dict[str, int]): Address of the first instruction of every entity.
+            rng (RandomSource): Default random source of the program. Uses the global generator if not set.
+        """
+        self.code = code
+        self.entry_points = entry_points
+        self.rng: Optional[random.Random] = make_rng(rng) if rng is not None else None
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    def disassemble(self) -> str:
+        """
+        Renders the program in a human-readable form.
+        Returns:
+            One line per instruction.
+        """
+        labels = {address: name for name, address in self.entry_points.items()}
+        lines = []
+
+        for address, (op, arg) in enumerate(self.code):
+            label = f"{labels[address]}:" if address in labels else ""
+            operand = "" if arg is None else repr(arg)
+            lines.append(f"{label:<16}{address:>6} {OPCODE_NAMES[op]:<8}{operand}")
+
+        return "\n".join(lines)
+
+    def run(
+        self, address: int, ctx: Context = None, rng: random.Random = DEFAULT_RNG
+    ) -> str:
+        """
+        Executes the program from a given address until the matching RETURN.
+        Args:
+            address (int): The address to start from.
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
+
+        Returns:
+            The raw (unstripped) output.
+        """
+        out: List[str] = []
+        self.execute(address, out.append, ctx, rng)
+        return "".join(out)
+
+    def execute(
+        self,
+        address: int,
+        emit: Write,
+        ctx: Context = None,
+        rng: random.Random = DEFAULT_RNG,
+    ) -> None:
+        """
+        Executes the program from a given address until the matching RETURN, streaming the output to a writer.
+        Args:
+            address (int): The address to start from.
+            emit (Write): The writer receiving the output fragments.
+            ctx (Optional[Context]): The generation context.
+            rng (random.Random): The random number generator.
+        """
+        code = self.code
+        choice = rng.choice
+
+        # Address 0 always holds HALT: returning to it stops the loop.
+        stack = [0]
+        # Remaining iterations of every running repeat, innermost last.
+        counters: List[int] = []
+        pc = address
+
+        while True:
+            op, arg = code[pc]
+            pc += 1
+
+            if op == EMIT:
+                emit(arg)
+            elif op == PICK:
+                pc = choice(arg)
+            elif op == JUMP:
+                pc = arg
+            elif op == MAYBE:
+                if not choice(nodes.OPTIONAL_BRANCHES):
+                    pc = arg
+            elif op == CALL:
+                stack.append(pc)
+                pc = arg
+            elif op == RETURN:
+                pc = stack.pop()
+            elif op == EVAL:
+                arg.emit(emit, ctx, rng)
+            elif op == PICK_WEIGHTED:
+                targets, table = arg
+                pc = targets[table.sample(rng)]
+            elif op == REPEAT:
+                counters.append(arg)
+            elif op == LOOP:
+                counters[-1] -= 1
+                if counters[-1]:
+                    pc = arg
+                else:
+                    counters.pop()
+            else:
+                break
+
+    def generate(
+        self, entity_name: str, ctx: ContextLike = None, rng: RandomSource = None
+    ) -> str:
+        """
+        Generates a value for a specific entity.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the program.
+
+        Returns:
+            The generated entity.
+        """
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+        return self.run(self.entry_points[entity_name], new_context, generator).strip()
+
+    def generate_many(
+        self,
+        entity_name: str,
+        n: int,
+        ctx: ContextLike = None,
+        lazy: bool = False,
+        rng: RandomSource = None,
+    ) -> Union[List[str], Iterator[str]]:
+        """
+        Generates a batch of values for a specific entity.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            ctx (ContextLike): The generation context.
+            lazy (bool): Return an iterator generating values on demand instead of a list.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the program.
+
+        Returns:
+            The generated entities.
+        """
+        address = self.entry_points[entity_name]
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+
+        generations = (
+            self.run(address, new_context, generator).strip() for _ in range(n)
+        )
+        return generations if lazy else list(generations)
+
+    def emit(
+        self,
+        entity_name: str,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+    ) -> None:
+        """
+        Streams a value for a specific entity to a writer.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            write (Write): The writer receiving the fragments.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for this call. Defaults to the random source of the program.
+        """
+        self.write_many(entity_name, 1, write, ctx, rng, separator="")
+
+    def write_many(
+        self,
+        entity_name: str,
+        n: int,
+        write: Write,
+        ctx: ContextLike = None,
+        rng: RandomSource = None,
+        separator: str = "\n",
+    ) -> None:
+        """
+        Streams a batch of values for a specific entity to a writer, each value followed by a separator.
+        Args:
+            entity_name (str): The name of the entity to generate.
+            n (int): The number of values to generate.
+            write (Write): The writer receiving the fragments.
+            ctx (ContextLike): The generation context.
+            rng (RandomSource): Random source for the batch. Defaults to the random source of the program.
+            separator (str): Written after every value.
+        """
+        address = self.entry_points[entity_name]
+        new_context = as_context(ctx)
+        generator = make_rng(rng if rng is not None else self.rng)
+
+        for _ in range(n):
+            self.execute(address, StrippedWriter(write), new_context, generator)
+            if separator:
+                write(separator)
+
+
+class Compiler:
+    """
+    Lowers an optimized generation graph to a flat instruction array. Entities, and nodes with several parents, are
+    compiled once as subroutines; repeats are compiled as counted loops.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self.code: List[Instruction] = [(HALT, None)]
+
+        # Address of every compiled subroutine, by id of its node.
+        self._addresses: Dict[int, int] = {}
+        self._pending: List[nodes.Node] = []
+        self._calls: List[Tuple[int, nodes.Node]] = []
+
+        # Number of parents of every node, by id: nodes with several parents are compiled once, as a subroutine.
+        self._references: Counter = Counter()
+        self._counted: Set[int] = set()
+
+    def _emit(self, op: int, arg: Any = None) -> int:
+        self.code.append((op, arg))
+        return len(self.code) - 1
+
+    def _patch(self, address: int, arg: Any) -> None:
+        self.code[address] = (self.code[address][0], arg)
+
+    def count_references(self, roots: Iterable[nodes.Node]) -> None:
+        """
+        Counts the parents of every node reachable from a set of roots, so that shared nodes are compiled once.
+        Args:
+            roots (Iterable[nodes.Node]): The roots of the graph, usually the entities of the grammar.
+        """
+        stack = [node for node in roots if id(node) not in self._counted]
+
+        while stack:
+            node = stack.pop()
+            if id(node) in self._counted:
+                continue
+
+            self._counted.add(id(node))
+            if isinstance(node, SUBROUTINE_NODES + (nodes.EntityNode,)):
+                for child in get_children(node):
+                    if child is not None:
+                        self._references[id(child)] += 1
+                        stack.append(child)
+
+    def compile_node(self, node: Optional[nodes.Node]) -> None:
+        """
+        Appends the instructions generating a node to the program, or a call to its subroutine.
+        Args:
+            node (Optional[nodes.Node]): The node to compile.
+        """
+        if node is None:
+            return
+
+        if isinstance(node, nodes.EntityNode) or (
+            isinstance(node, SUBROUTINE_NODES) and self._references[id(node)] > 1
+        ):
+            # Subroutines are compiled once, their address is patched in once known.
+            self._calls.append((self._emit(CALL), node))
+            self._pending.append(node)
+        else:
+            self.compile_body(node)
+
+    def compile_body(self, node: nodes.Node) -> None:
+        """
+        Appends the instructions generating a node to the program, inlining its body.
+        Args:
+            node (nodes.Node): The node to compile.
+        """
+        if isinstance(node, nodes.LiteralNode):
+            if node.value:
+                self._emit(EMIT, node.value)
+
+        elif isinstance(node, (nodes.EntityNode, nodes.ListNode)):
+            for child in node.children:
+                self.compile_node(child)
+
+        elif isinstance(node, nodes.AnyNode):
+            pick = self._emit(PICK if node.weights is None else PICK_WEIGHTED)
+            targets, jumps = [], []
+
+            for branch in node.children:
+                targets.append(len(self.code))
+                self.compile_node(branch)
+                jumps.append(self._emit(JUMP))
+
+            for jump in jumps:
+                self._patch(jump, len(self.code))
+
+            # The choice table of every node is built here, once, and shared by every generation of the program.
+            if node.weights is None:
+                self._patch(pick, tuple(targets))
+            else:
+                table = node.table
+                if table is None or table.weights != tuple(node.weights):
+                    table = AliasTable(node.weights)
+                self._patch(pick, (tuple(targets), table))
+
+        elif isinstance(node, nodes.OptionalNode):
+            maybe = self._emit(MAYBE)
+            self.compile_node(node.expression)
+            self._patch(maybe, len(self.code))
+
+        elif isinstance(node, nodes.RepeatNode):
+            if node.n_repeat == 1:
+                self.compile_node(node.expression)
+            elif node.n_repeat > 1:
+                self._emit(REPEAT, node.n_repeat)
+                body = len(self.code)
+                self.compile_node(node.expression)
+                self._emit(LOOP, body)
+
+        elif isinstance(node, nodes.ParameterNode):
+            self.compile_node(node.value)
+
+        elif isinstance(
+            node,
+            (
+                nodes.PlaceholderNode,
+                nodes.ConditionNode,
+                nodes.UniqueNode,
+                nodes.ValueTableNode,
+                nodes.WordListNode,
+            ),
+        ):
+            # Runtime lookups, stateful sampling, value tables and word lists are delegated to the tree walker.
+            self._emit(EVAL, node)
+
+        else:
+            raise TypeError(f"cannot compile node of type {node.type}")
+
+    def compile_entity(self, entity: nodes.EntityNode) -> int:
+        """
+        Compiles an entity as a subroutine, if it has not been compiled already.
+        Args:
+            entity (nodes.EntityNode): The entity to compile.
+
+        Returns:
+            The address of the entity.
+        """
+        self.count_references([entity])
+        if id(entity) not in self._addresses:
+            self._pending.append(entity)
+
+        while self._pending:
+            pending = self._pending.pop()
+            if id(pending) in self._addresses:
+                continue
+
+            self._addresses[id(pending)] = len(self.code)
+            self.compile_body(pending)
+            self._emit(RETURN)
+
+        for address, callee in self._calls:
+            self._patch(address, self._addresses[id(callee)])
+        self._calls = []
+
+        return self._addresses[id(entity)]
+
+
+def compile_grammar(grammar: nodes.Grammar) -> Program:
+    """
+    Compiles an optimized grammar to a flat program.
+    Args:
+        grammar (nodes.Grammar): The grammar to compile.
+
+    Returns:
+        The compiled program.
+    """
+    compiler = Compiler()
+    compiler.count_references(grammar.entities.values())
+    entry_points = {
+        name: compiler.compile_entity(entity)
+        for name, entity in grammar.entities.items()
+    }
+    return Program(compiler.code, entry_points, grammar.rng)
+
+
+# Anything exposing the generation API: an optimized grammar, a compiled program or a compiled module.
+Generator = Union[nodes.Grammar, Program, CompiledGrammar]